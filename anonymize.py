@@ -8,23 +8,55 @@ Użycie:
     # Anonimizacja tekstu z linii poleceń:
     python anonymize.py "Jan Kowalski mieszka w Warszawie"
     
-    # Anonimizacja pliku:
+    # Anonimizacja pliku (strumieniowo, paczki ograniczone budżetem tokenów):
     python anonymize.py -i input.txt -o output.txt
     
     # Anonimizacja ze standardowego wejścia:
     echo "Mój PESEL to 90010112345" | python anonymize.py
     
+    # Anonimizacja dużego pliku w wielu procesach:
+    python anonymize.py -i input.txt -o output.txt --workers 8
+    
+    # Słownik (gazetteer) jako dodatkowy przebieg lub zamiast modelu:
+    python anonymize.py -i input.txt --gazetteer prepass
+    python anonymize.py -i input.txt --gazetteer only
+    
+    # Trwały cache wyników dla powtarzających się zdań:
+    python anonymize.py -i input.txt --cache-db resources/cache/sentences.sqlite
+    
+    # Pomijanie modelu dla zdań bez danych osobowych (klasyfikator z triage.py):
+    python anonymize.py -i input.txt --triage resources/triage/triage.pkl --triage-recall 0.995
+    
     # Użycie własnego modelu:
     python anonymize.py -m models/my_model "Tekst do anonimizacji"
+    
+    # Inferencja na CPU z dynamiczną kwantyzacją int8 (skwantyzowany model jest zapisywany obok):
+    python anonymize.py -i input.txt --quantize int8
+    
+    # Inferencja przez ONNX Runtime (po eksporcie: python onnx_backend.py -m model.pt):
+    python anonymize.py -i input.txt --backend onnx
+    
+    # Inferencja w bf16 (autocast), gdy CPU obsługuje instrukcje bf16 (inaczej fp32):
+    python anonymize.py -i input.txt --precision auto
+    
+    # Szybki start z modelu slim (po konwersji: python slim_model.py -m model.pt):
+    python anonymize.py -m resources/model/final-model.slim -i input.txt
 """
 
 import argparse
+import contextlib
 import sys
 import os
 import time
-from typing import Optional, Dict, List, Tuple
+from typing import Callable, Optional, Dict, List, Tuple, Iterable, Iterator
 from pathlib import Path
 
+from gazetteer import Gazetteer
+from result_cache import DEFAULT_CACHE_ENTRIES, SentenceCache, file_fingerprint, file_stamp
+from rules import RuleEngine
+from segmenter import segment_text
+from triage import TriageClassifier
+
 # Domyślne etykiety zastępcze dla różnych typów danych
 DEFAULT_REPLACEMENTS = {
     "NAME": "[NAME]",
@@ -54,155 +86,1241 @@ DEFAULT_REPLACEMENTS = {
     "SECRET": "[SECRET]",
 }
 
+# Domyślny budżet tokenów subword na jedno wywołanie tagger.predict (z paddingiem)
+DEFAULT_TOKEN_BUDGET = 8192
 
-def load_model(model_path: str):
-    """Ładuje wytrenowany model NER."""
-    from flair.models import SequenceTagger
+# Przybliżony rozmiar porcji pliku wczytywanej naraz w trybie strumieniowym (w bajtach)
+DEFAULT_CHUNK_BYTES = 1 << 20
+
+# Rozmiar początku pliku przetwarzanego przez 1 workera przy pomiarze przyspieszenia (--scaling-baseline)
+SCALING_BASELINE_BYTES = 4 << 20
+
+# Maksymalna długość zdania (w tokenach subword) przetwarzanego jednym przebiegiem.
+# Dłuższe zdania są dzielone na nakładające się okna (limit HerBERT-a to 512)
+MAX_WINDOW_SUBWORDS = 400
+
+# Minimalna nakładka kolejnych okien (w tokenach subword)
+WINDOW_OVERLAP_SUBWORDS = 128
+
+# Szacunkowa liczba subwordów na token Flair (gdy tokenizer transformera jest niedostępny)
+SUBWORDS_PER_TOKEN_ESTIMATE = 2
+
+# Tryby kwantyzacji modelu obsługiwane przez load_model (tylko CPU)
+QUANTIZE_MODES = ['int8']
+
+# Backendy inferencji obsługiwane przez load_model
+BACKENDS = ['flair', 'onnx']
+
+# Precyzje inferencji (auto - bf16, gdy sprzęt je obsługuje, inaczej fp32)
+PRECISIONS = ['auto', 'fp32', 'bf16']
+
+# Flagi /proc/cpuinfo oznaczające sprzętowe mnożenie macierzy w bf16
+CPU_BF16_FLAGS = ('avx512_bf16', 'amx_bf16')
+
+
+def cpu_supports_bf16() -> bool:
+    """Sprawdza, czy procesor ma instrukcje bf16 (AVX512-BF16 lub AMX, tylko Linux)."""
+    try:
+        with open('/proc/cpuinfo', 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('flags'):
+                    return any(flag in line.split() for flag in CPU_BF16_FLAGS)
+    except OSError:
+        pass
+    return False
+
+
+def resolve_precision(precision: str = 'fp32', quantize: Optional[str] = None, backend: str = 'flair') -> str:
+    """
+    Wybiera precyzję inferencji dla bieżącego sprzętu.
     
+    Args:
+        precision: 'auto', 'fp32' lub 'bf16'
+        quantize: Tryb kwantyzacji modelu (model skwantyzowany działa w fp32)
+        backend: Backend inferencji (bf16 tylko dla 'flair')
+    
+    Returns:
+        str: 'bf16' lub 'fp32' - bf16 tylko wtedy, gdy urządzenie je obsługuje
+    """
+    if precision == 'fp32':
+        return 'fp32'
+    if quantize is not None or backend != 'flair':
+        if precision == 'bf16':
+            print("⚠️  bf16 nie jest obsługiwane z kwantyzacją ani backendem onnx - używam fp32")
+        return 'fp32'
+    
+    import flair
+    import torch
+    
+    if flair.device.type == 'cuda':
+        supported = torch.cuda.is_bf16_supported()
+    else:
+        supported = cpu_supports_bf16()
+    if not supported and precision == 'bf16':
+        print(f"⚠️  Urządzenie {flair.device.type} nie obsługuje bf16 - używam fp32")
+    return 'bf16' if supported else 'fp32'
+
+
+def inference_precision(tagger) -> str:
+    """Zwraca precyzję, w której działa tagger ('fp32' lub 'bf16')."""
+    return getattr(tagger, 'inference_precision', 'fp32')
+
+
+def _precision_context(tagger):
+    """Kontekst autocast dla taggera w bf16 (dla fp32 - pusty kontekst)."""
+    if inference_precision(tagger) != 'bf16':
+        return contextlib.nullcontext()
+    import flair
+    import torch
+    
+    # Transformer i warstwy liniowe/LSTM liczą w bf16, dekodowanie CRF zostaje w fp32
+    return torch.autocast(device_type=flair.device.type, dtype=torch.bfloat16)
+
+
+def load_model(
+    model_path: str,
+    quantize: Optional[str] = None,
+    backend: str = 'flair',
+    precision: str = 'fp32',
+    started_at: Optional[float] = None
+):
+    """
+    Ładuje wytrenowany model NER.
+    
+    Czas startu (cold start) jest wypisywany po załadowaniu.
+    
+    Args:
+        model_path: Ścieżka do modelu (.pt lub katalog modelu slim)
+        quantize: Opcjonalny tryb kwantyzacji (np. 'int8') - model działa wtedy na CPU
+        backend: 'flair' (SequenceTagger) lub 'onnx' (OnnxTagger z katalogu
+            wyeksportowanego przez onnx_backend.py, obok modelu)
+        precision: Precyzja inferencji: 'fp32', 'bf16' lub 'auto' (bf16 tylko
+            na sprzęcie, który je obsługuje - inaczej fp32)
+        started_at: Opcjonalny początek startu (time.perf_counter) - gdy przed
+            ładowaniem wykonano inną pracę startową (np. odcisk modelu dla cache),
+            jej czas wlicza się do wypisanego czasu startu
+    """
     if not os.path.exists(model_path):
         print(f"❌ Błąd: Model nie znaleziony w '{model_path}'")
         print("   Najpierw wytrenuj model używając: python train.py")
         sys.exit(1)
     
-    print(f"📥 Ładowanie modelu z: {model_path}")
-    tagger = SequenceTagger.load(model_path)
+    start_time = started_at if started_at is not None else time.perf_counter()
+    if backend == 'onnx':
+        tagger = _load_onnx(model_path, quantize)
+    elif quantize is not None:
+        tagger = _load_quantized(model_path, quantize)
+    else:
+        print(f"📥 Ładowanie modelu z: {model_path}")
+        tagger = _load_tagger(model_path)
+        tagger.inference_precision = resolve_precision(precision)
+        if tagger.inference_precision != 'fp32':
+            print(f"⚙️  Precyzja inferencji: {tagger.inference_precision} (autocast)")
+        print("✅ Model załadowany pomyślnie")
+    print(f"⏱️  Start modelu: {(time.perf_counter() - start_time) * 1000:.0f} ms")
+    return tagger
+
+
+def _load_tagger(model_path: str):
+    """Wczytuje SequenceTagger z pełnego checkpointu (.pt) lub z katalogu modelu slim."""
+    from slim_model import is_slim_checkpoint, load_slim
+    
+    if is_slim_checkpoint(model_path):
+        return load_slim(model_path)
+    
+    from flair.models import SequenceTagger
+    
+    return SequenceTagger.load(model_path)
+
+
+def _load_onnx(model_path: str, quantize: Optional[str] = None):
+    """Ładuje model wyeksportowany do ONNX (katalog <model>.onnx/ obok modelu Flair)."""
+    from onnx_backend import OnnxTagger, onnx_dir_for
+    
+    if quantize is not None:
+        print("❌ Błąd: Kwantyzacja nie jest obsługiwana dla backendu onnx")
+        sys.exit(1)
+    
+    export_dir = onnx_dir_for(model_path)
+    if not export_dir.exists():
+        print(f"❌ Błąd: Brak eksportu ONNX w '{export_dir}'")
+        print(f"   Najpierw wyeksportuj model używając: python onnx_backend.py -m {model_path}")
+        sys.exit(1)
+    
+    print(f"📥 Ładowanie modelu ONNX z: {export_dir}")
+    tagger = OnnxTagger.load(export_dir)
     print("✅ Model załadowany pomyślnie")
     return tagger
 
 
+def _transformer_embeddings(tagger) -> List:
+    """Zwraca embeddingi transformera w taggerze (także wewnątrz StackedEmbeddings)."""
+    return [
+        module for module in tagger.embeddings.modules()
+        if hasattr(module, 'model') and hasattr(module, 'tokenizer')
+    ]
+
+
+def quantized_model_path(model_path: str, quantize: str) -> Path:
+    """Zwraca ścieżkę skwantyzowanej kopii modelu (obok oryginału, np. final-model.int8.pt)."""
+    path = Path(model_path)
+    return path.with_name(f"{path.stem}.{quantize}{path.suffix}")
+
+
+def _quantized_is_fresh(model_path: str, quantize: str) -> bool:
+    """Sprawdza, czy zapisana skwantyzowana kopia jest nowsza niż model."""
+    cached = quantized_model_path(model_path, quantize)
+    return cached.exists() and cached.stat().st_mtime >= os.path.getmtime(model_path)
+
+
+def quantize_model(tagger, quantize: str = 'int8'):
+    """
+    Kwantyzuje dynamicznie warstwy liniowe transformera.
+    
+    Wagi warstw nn.Linear są zapisywane w int8, a aktywacje kwantyzowane
+    w locie. Głowica taggera (LSTM, projekcja, CRF) zostaje w fp32.
+    Skwantyzowane operacje działają tylko na CPU, więc model jest tam przenoszony.
+    
+    Raises:
+        ValueError: Gdy tryb kwantyzacji nie jest obsługiwany
+    """
+    import flair
+    import torch
+    
+    if quantize not in QUANTIZE_MODES:
+        raise ValueError(f"Nieobsługiwany tryb kwantyzacji: {quantize} (dostępne: {', '.join(QUANTIZE_MODES)})")
+    
+    flair.device = torch.device('cpu')
+    tagger.to(flair.device)
+    for embedding in _transformer_embeddings(tagger):
+        embedding.model = torch.quantization.quantize_dynamic(
+            embedding.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return tagger
+
+
+def _load_quantized(model_path: str, quantize: str):
+    """
+    Ładuje model ze skwantyzowanym transformerem.
+    
+    Skwantyzowane moduły transformera są zapisywane obok modelu i używane
+    ponownie, dopóki plik modelu się nie zmieni - kwantyzacja odbywa się
+    tylko przy pierwszym uruchomieniu.
+    """
+    import flair
+    import torch
+    
+    cache_path = quantized_model_path(model_path, quantize)
+    
+    print(f"📥 Ładowanie modelu z: {model_path} (kwantyzacja {quantize}, CPU)")
+    flair.device = torch.device('cpu')
+    tagger = _load_tagger(model_path)
+    tagger.to(flair.device)
+    embeddings = _transformer_embeddings(tagger)
+    
+    if _quantized_is_fresh(model_path, quantize):
+        try:
+            modules = torch.load(cache_path, map_location='cpu', weights_only=False)
+        except TypeError:
+            # Starsze wersje PyTorch nie znają weights_only
+            modules = torch.load(cache_path, map_location='cpu')
+        if len(modules) == len(embeddings):
+            for embedding, module in zip(embeddings, modules):
+                embedding.model = module
+            print(f"✅ Wczytano skwantyzowany model z: {cache_path}")
+            return tagger
+    
+    print(f"⚙️  Kwantyzacja transformera ({quantize})...")
+    quantize_model(tagger, quantize)
+    torch.save([embedding.model for embedding in embeddings], cache_path)
+    print(f"✅ Model skwantyzowany i zapisany: {cache_path}")
+    return tagger
+
+
+def _collect_entities(sentence, inference_time: float) -> List[Dict]:
+    """Zbiera wykryte encje ze zdania Flair."""
+    entities = []
+    for entity in sentence.get_spans('ner'):
+        entities.append({
+            'text': entity.text,
+            'label': entity.tag,
+            'start': entity.start_position,
+            'end': entity.end_position,
+            'confidence': entity.score,
+            'inference_time_ms': inference_time * 1000
+        })
+    return entities
+
+
+def rewrite_spans(text: str, spans: Iterable[Tuple[int, int, str]]) -> str:
+    """
+    Podmienia fragmenty tekstu w jednym przejściu.
+
+    Wynik jest składany z listy wycinków oryginału i podmian, więc koszt jest
+    liniowy względem długości tekstu (nie rośnie z liczbą encji), a odstępy
+    i znaki nowej linii poza podmienianymi fragmentami zostają nienaruszone.
+
+    Args:
+        text: Tekst oryginalny
+        spans: Trójki (start, end, podmiana) z offsetami znakowymi w `text`;
+            fragment nachodzący na wcześniejszy (już podmieniony) jest pomijany
+
+    Returns:
+        str: Tekst z podmienionymi fragmentami
+    """
+    pieces = []
+    pos = 0
+    for start, end, replacement in sorted(spans, key=lambda span: (span[0], -span[1])):
+        if start < pos:
+            continue
+        pieces.append(text[pos:start])
+        pieces.append(replacement)
+        pos = end
+    pieces.append(text[pos:])
+    return ''.join(pieces)
+
+
+def _replace_entities(text: str, entities: List[Dict], replacements: Dict[str, str]) -> str:
+    """Zastępuje encje w tekście etykietami zastępczymi."""
+    return rewrite_spans(text, (
+        (entity['start'], entity['end'], replacements.get(entity['label'], f"[{entity['label']}]"))
+        for entity in entities
+    ))
+
+
+def _print_entities(entities: List[Dict]):
+    """Wyświetla wykryte encje."""
+    print("\n🔍 Wykryte encje:")
+    for e in entities:
+        print(f"   • '{e['text']}' → {e['label']} (pewność: {e['confidence']:.2%})")
+
+
+def _get_subword_tokenizer(tagger):
+    """Zwraca tokenizer transformera z embeddingów taggera (None gdy niedostępny)."""
+    return getattr(getattr(tagger, 'embeddings', None), 'tokenizer', None)
+
+
+def _count_subwords(sentences, tagger) -> List[int]:
+    """
+    Liczy tokeny subword (z tokenami specjalnymi) dla każdego zdania.
+
+    Używa tokenizera transformera z embeddingów taggera na tokenach Flair
+    (tak jak robią to embeddingi); gdy go brak, szacuje długość na podstawie
+    liczby tokenów Flair.
+    """
+    tokenizer = _get_subword_tokenizer(tagger)
+    if tokenizer is None:
+        return [len(s) * SUBWORDS_PER_TOKEN_ESTIMATE + 2 for s in sentences]
+    words = [[token.text for token in s.tokens] for s in sentences]
+    encoded = tokenizer(words, is_split_into_words=True, add_special_tokens=True, verbose=False)
+    return [len(ids) for ids in encoded['input_ids']]
+
+
+def _token_subwords(sentence, tagger) -> List[int]:
+    """Liczy tokeny subword dla każdego tokenu Flair w zdaniu (min. 1)."""
+    tokenizer = _get_subword_tokenizer(tagger)
+    if tokenizer is None:
+        return [SUBWORDS_PER_TOKEN_ESTIMATE] * len(sentence)
+    encoded = tokenizer([token.text for token in sentence.tokens], add_special_tokens=False, verbose=False)
+    return [max(1, len(ids)) for ids in encoded['input_ids']]
+
+
+def _window_ranges(token_lengths: List[int], window: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    Dzieli zdanie na nakładające się okna tokenów.
+
+    Każde okno ma najwyżej `window` tokenów subword (chyba że pojedynczy token
+    jest dłuższy), a kolejne okna nakładają się o co najmniej `overlap`
+    subwordów. Liczba okien rośnie liniowo z długością zdania.
+
+    Returns:
+        List[Tuple[int, int]]: Zakresy indeksów tokenów [start, end)
+    """
+    n = len(token_lengths)
+    ranges: List[Tuple[int, int]] = []
+    start = 0
+    while True:
+        end, size = start, 0
+        while end < n and (end == start or size + token_lengths[end] <= window):
+            size += token_lengths[end]
+            end += 1
+        ranges.append((start, end))
+        if end >= n:
+            return ranges
+
+        # Następne okno zaczyna się tak, by pokryć `overlap` subwordów poprzedniego
+        next_start, covered = end, 0
+        while next_start > start + 1 and covered < overlap:
+            next_start -= 1
+            covered += token_lengths[next_start]
+        start = next_start
+
+
+def _stitch_windows(sentence, windows: List[Tuple[int, int]], window_sentences):
+    """
+    Przenosi encje z okien na pełne zdanie.
+
+    Każde okno "posiada" tokeny od połowy nakładki z poprzednim oknem do
+    połowy nakładki z następnym, więc każdy token oceniany jest w oknie,
+    w którym ma najwięcej kontekstu. Encja jest brana z okna, które posiada
+    jej pierwszy token - może więc wystawać poza granicę posiadania i nie
+    ginie na styku okien. Encje nachodzące na już przyjęte są odrzucane,
+    dzięki czemu wynik jest deterministyczny.
+    """
+    from flair.data import Span
+
+    last_end = 0
+    for k, ((start, end), window_sentence) in enumerate(zip(windows, window_sentences)):
+        own_start = 0 if k == 0 else (start + windows[k - 1][1]) // 2
+        own_end = len(sentence) if k == len(windows) - 1 else (windows[k + 1][0] + end) // 2
+
+        for span in window_sentence.get_spans('ner'):
+            span_start = start + span.tokens[0].idx - 1
+            span_end = start + span.tokens[-1].idx
+            if not own_start <= span_start < own_end or span_start < last_end:
+                continue
+            Span(sentence.tokens[span_start:span_end]).add_label('ner', span.tag, span.score)
+            last_end = span_end
+
+
+def _make_batches(lengths: List[int], token_budget: int) -> List[List[int]]:
+    """
+    Grupuje indeksy zdań w paczki ograniczone budżetem tokenów.
+
+    Zdania są sortowane według długości, a koszt paczki liczony jest razem
+    z paddingiem (liczba zdań × najdłuższe zdanie), więc paczki zawierają
+    zdania podobnej długości i marnują mało obliczeń na padding.
+    Zdanie dłuższe niż budżet trafia do osobnej, jednoelementowej paczki.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for i in order:
+        # Kolejność rosnąca - bieżące zdanie jest najdłuższe w paczce
+        if current and (len(current) + 1) * lengths[i] > token_budget:
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _predict_batched(sentences, lengths: List[int], tagger, token_budget: int) -> List[float]:
+    """
+    Uruchamia tagger.predict na paczkach zdań.
+
+    Returns:
+        List[float]: Czas inferencji przypisany do każdego zdania
+        (czas paczki dzielony proporcjonalnie do długości zdań)
+    """
+    times = [0.0] * len(sentences)
+    for batch in _make_batches(lengths, token_budget):
+        batch_sentences = [sentences[i] for i in batch]
+        start_time = time.perf_counter()
+        with _precision_context(tagger):
+            tagger.predict(batch_sentences, mini_batch_size=len(batch_sentences))
+        elapsed = time.perf_counter() - start_time
+
+        batch_tokens = sum(lengths[i] for i in batch)
+        for i in batch:
+            times[i] = elapsed * lengths[i] / batch_tokens
+    return times
+
+
+def predict_sentences(sentences, tagger, token_budget: int = DEFAULT_TOKEN_BUDGET) -> List[float]:
+    """
+    Przewiduje etykiety NER dla zdań Flair (w miejscu, jak tagger.predict).
+
+    Zdania są przetwarzane w paczkach ograniczonych budżetem tokenów.
+    Zdania dłuższe niż okno transformera (MAX_WINDOW_SUBWORDS) są dzielone
+    na nakładające się okna, a wyniki okien są zszywane z powrotem na
+    pełne zdanie, więc nic nie jest obcinane.
+
+    Args:
+        sentences: Lista zdań Flair
+        tagger: Załadowany model NER
+        token_budget: Maksymalna liczba tokenów subword w jednej paczce
+
+    Returns:
+        List[float]: Czas inferencji przypisany do każdego zdania
+    """
+    from flair.data import Sentence
+
+    # Zdania bez tokenów nie trafiają do modelu
+    indices = [i for i, s in enumerate(sentences) if len(s) > 0]
+    times = [0.0] * len(sentences)
+    if not indices:
+        return times
+
+    lengths = _count_subwords([sentences[i] for i in indices], tagger)
+
+    # Pula zdań do predykcji: krótkie zdania wprost, długie jako okna
+    pool = []
+    pool_lengths: List[int] = []
+    pool_owner: List[int] = []
+    long_windows: Dict[int, Tuple[List[Tuple[int, int]], List[int]]] = {}
+    for i, length in zip(indices, lengths):
+        sentence = sentences[i]
+        if length <= MAX_WINDOW_SUBWORDS:
+            pool.append(sentence)
+            pool_lengths.append(length)
+            pool_owner.append(i)
+            continue
+
+        token_lengths = _token_subwords(sentence, tagger)
+        windows = _window_ranges(token_lengths, MAX_WINDOW_SUBWORDS - 2, WINDOW_OVERLAP_SUBWORDS)
+        long_windows[i] = (windows, [])
+        for start, end in windows:
+            long_windows[i][1].append(len(pool))
+            pool.append(Sentence([token.text for token in sentence.tokens[start:end]]))
+            pool_lengths.append(sum(token_lengths[start:end]) + 2)
+            pool_owner.append(i)
+
+    pool_times = _predict_batched(pool, pool_lengths, tagger, token_budget)
+    for owner, t in zip(pool_owner, pool_times):
+        times[owner] += t
+
+    for i, (windows, pool_indices) in long_windows.items():
+        _stitch_windows(sentences[i], windows, [pool[j] for j in pool_indices])
+    return times
+
+
+def _merge_entities(primary: List[Dict], secondary: List[Dict]) -> List[Dict]:
+    """
+    Łączy dwie listy encji. Encje z `secondary` nachodzące na którąkolwiek
+    encję z `primary` są odrzucane.
+
+    Returns:
+        List[Dict]: Encje posortowane według pozycji
+    """
+    merged = list(primary)
+    for entity in secondary:
+        if not any(entity['start'] < p['end'] and p['start'] < entity['end'] for p in primary):
+            merged.append(entity)
+    merged.sort(key=lambda e: e['start'])
+    return merged
+
+
+def _detect_entities(
+    texts: List[str],
+    tagger,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    rules: Optional[RuleEngine] = None,
+    gazetteer: Optional[Gazetteer] = None,
+    cache: Optional[SentenceCache] = None,
+    triage: Optional[TriageClassifier] = None
+) -> List[Tuple[List[Dict], float]]:
+    """
+    Wykrywa encje w tekstach.
+
+    Każdy tekst jest dzielony na zdania/akapity (segmenter), segmenty wszystkich
+    tekstów trafiają do wspólnych paczek inferencji, a pozycje encji są
+    przeliczane na offsety znakowe w oryginalnych tekstach.
+
+    Jeśli podano silnik reguł, jego encje zweryfikowane sumami kontrolnymi
+    (PESEL, konto, karta) mają pierwszeństwo przed encjami modelu, a segmenty
+    złożone wyłącznie z takich identyfikatorów w ogóle nie trafiają do modelu.
+    Reguły bez sumy kontrolnej (EMAIL, PHONE) tylko uzupełniają wynik modelu.
+
+    Jeśli podano gazetteer, jego dopasowania uzupełniają wynik tam, gdzie
+    ani reguły, ani model niczego nie znalazły (priorytet: reguły z sumą
+    kontrolną > model > EMAIL/PHONE > gazetteer). Przy tagger=None encje
+    pochodzą wyłącznie z reguł i słownika.
+
+    Identyczne segmenty trafiają do modelu tylko raz, a jeśli podano cache,
+    segmenty widziane wcześniej w ogóle go omijają. Klasyfikator triage
+    pomija model dla segmentów, które z dużą pewnością nie zawierają danych.
+
+    Returns:
+        List[Tuple[List[Dict], float]]: Dla każdego tekstu lista encji i czas inferencji
+    """
+    # (indeks tekstu, offset segmentu w tekście) dla każdego segmentu
+    owners: List[Tuple[int, int]] = []
+    segment_texts: List[str] = []
+    for i, text in enumerate(texts):
+        for start, end in segment_text(text):
+            owners.append((i, start))
+            segment_texts.append(text[start:end])
+
+    rule_entities: List[List[Dict]] = [
+        rules.detect(segment) if rules is not None else [] for segment in segment_texts
+    ]
+
+    gazetteer_entities: List[List[Dict]] = [
+        gazetteer.scan(segment) if gazetteer is not None else [] for segment in segment_texts
+    ]
+
+    segment_entities = [
+        (_merge_entities(found, gazetteer_entities[i]), 0.0) for i, found in enumerate(rule_entities)
+    ]
+
+    if tagger is not None:
+        from flair.data import Sentence
+
+        # Segmenty pokryte w całości przez reguły z sumą kontrolną pomijają model
+        model_indices = [
+            i for i, segment in enumerate(segment_texts)
+            if not RuleEngine.covers_text(segment, rule_entities[i])
+        ]
+        if triage is not None:
+            checked = len(model_indices)
+            model_indices = [i for i in model_indices if triage.may_contain_pii(segment_texts[i])]
+            triage.record(checked=checked, skipped=checked - len(model_indices))
+
+        occurrences: Dict[str, List[int]] = {}
+        for i in model_indices:
+            occurrences.setdefault(segment_texts[i], []).append(i)
+
+        model_results: Dict[str, Tuple[List[Dict], float]] = {}
+        to_predict: List[str] = []
+        for segment in occurrences:
+            cached = cache.get(segment) if cache is not None else None
+            if cached is not None:
+                model_results[segment] = (cached, 0.0)
+            else:
+                to_predict.append(segment)
+        if cache is not None:
+            cache.record(hits=len(model_indices) - len(to_predict), misses=len(to_predict))
+
+        sentences = [Sentence(segment) for segment in to_predict]
+        model_times = predict_sentences(sentences, tagger, token_budget)
+        for segment, sentence, inference_time in zip(to_predict, sentences, model_times):
+            model_results[segment] = (_collect_entities(sentence, inference_time), inference_time)
+        if cache is not None:
+            cache.put_many({segment: model_results[segment][0] for segment in to_predict})
+
+        for segment, indices in occurrences.items():
+            model_entities, inference_time = model_results[segment]
+            for k, i in enumerate(indices):
+                # Każde wystąpienie dostaje własne kopie encji (offsety są przesuwane niżej)
+                checked, other = RuleEngine.split_checksum(rule_entities[i])
+                found = _merge_entities(checked, [dict(e) for e in model_entities])
+                found = _merge_entities(found, other)
+                segment_entities[i] = (
+                    _merge_entities(found, gazetteer_entities[i]),
+                    inference_time if k == 0 else 0.0
+                )
+
+    results: List[Tuple[List[Dict], float]] = [([], 0.0) for _ in texts]
+    for (text_idx, offset), (found, inference_time) in zip(owners, segment_entities):
+        entities, total_time = results[text_idx]
+        for entity in found:
+            entity['start'] += offset
+            entity['end'] += offset
+            entities.append(entity)
+        results[text_idx] = (entities, total_time + inference_time)
+
+    for entities, total_time in results:
+        for entity in entities:
+            entity['inference_time_ms'] = total_time * 1000
+    return results
+
+
 def anonymize_text(
     text: str,
     tagger,
     replacements: Optional[Dict[str, str]] = None,
-    show_entities: bool = False
+    show_entities: bool = False,
+    rules: Optional[RuleEngine] = None,
+    gazetteer: Optional[Gazetteer] = None,
+    cache: Optional[SentenceCache] = None,
+    triage: Optional[TriageClassifier] = None
 ) -> Tuple[str, List[Dict], float]:
     """
     Anonimizuje tekst zastępując wykryte encje.
     
+    Tekst jest dzielony na zdania i akapity, które trafiają do modelu
+    wsadowo zamiast jako jedna długa sekwencja.
+    
     Args:
         text: Tekst do anonimizacji
-        tagger: Załadowany model NER
+        tagger: Załadowany model NER (None - tylko reguły i gazetteer)
         replacements: Słownik mapujący etykiety na tekst zastępczy
         show_entities: Czy wyświetlać wykryte encje
+        rules: Opcjonalny silnik reguł uruchamiany przed modelem
+        gazetteer: Opcjonalny słownik encji uzupełniający wynik modelu
+        cache: Opcjonalny cache wyników modelu dla zdań
+        triage: Opcjonalny klasyfikator pomijający model dla czystych zdań
     
     Returns:
         Tuple[str, List[Dict], float]: Zanonimizowany tekst, lista wykrytych encji i czas inferencji
     """
-    from flair.data import Sentence
-    
     if replacements is None:
         replacements = DEFAULT_REPLACEMENTS
     
-    # Przetwórz tekst przez model
-    sentence = Sentence(text)
-    
-    # Mierzenie czasu inferencji
-    start_time = time.perf_counter()
-    tagger.predict(sentence)
-    inference_time = time.perf_counter() - start_time
-    
-    # Zbierz wykryte encje
-    entities = []
-    for entity in sentence.get_spans('ner'):
-        entities.append({
-            'text': entity.text,
-            'label': entity.tag,
-            'start': entity.start_position,
-            'end': entity.end_position,
-            'confidence': entity.score,
-            'inference_time_ms': inference_time * 1000
-        })
+    entities, inference_time = _detect_entities(
+        [text], tagger, rules=rules, gazetteer=gazetteer, cache=cache, triage=triage
+    )[0]
     
     if show_entities and entities:
-        print("\n🔍 Wykryte encje:")
-        for e in entities:
-            print(f"   • '{e['text']}' → {e['label']} (pewność: {e['confidence']:.2%})")
+        _print_entities(entities)
     
-    # Zamień encje od końca (żeby nie przesunąć indeksów)
-    result = text
-    for entity in sorted(entities, key=lambda x: x['start'], reverse=True):
-        label = entity['label']
-        replacement = replacements.get(label, f"[{label}]")
-        result = result[:entity['start']] + replacement + result[entity['end']:]
+    result = _replace_entities(text, entities, replacements)
     
     return result, entities, inference_time
 
 
+def anonymize_texts(
+    texts: List[str],
+    tagger,
+    replacements: Optional[Dict[str, str]] = None,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    rules: Optional[RuleEngine] = None,
+    gazetteer: Optional[Gazetteer] = None,
+    cache: Optional[SentenceCache] = None,
+    triage: Optional[TriageClassifier] = None
+) -> List[Tuple[str, List[Dict], float]]:
+    """
+    Anonimizuje listę tekstów wsadowo.
+
+    Zdania wszystkich tekstów są grupowane w paczki ograniczone łączną liczbą
+    tokenów subword (z paddingiem) i przetwarzane jednym wywołaniem
+    tagger.predict na paczkę. Wyniki zwracane są w kolejności wejściowej.
+
+    Args:
+        texts: Lista tekstów do anonimizacji
+        tagger: Załadowany model NER (None - tylko reguły i gazetteer)
+        replacements: Słownik mapujący etykiety na tekst zastępczy
+        token_budget: Maksymalna liczba tokenów subword w jednej paczce
+        rules: Opcjonalny silnik reguł uruchamiany przed modelem
+        gazetteer: Opcjonalny słownik encji uzupełniający wynik modelu
+        cache: Opcjonalny cache wyników modelu dla zdań
+        triage: Opcjonalny klasyfikator pomijający model dla czystych zdań
+
+    Returns:
+        List[Tuple[str, List[Dict], float]]: Dla każdego tekstu to samo co anonymize_text
+    """
+    if replacements is None:
+        replacements = DEFAULT_REPLACEMENTS
+
+    results = []
+    for text, (entities, inference_time) in zip(texts, _detect_entities(
+        texts, tagger, token_budget, rules, gazetteer, cache, triage
+    )):
+        results.append((_replace_entities(text, entities, replacements), entities, inference_time))
+    return results
+
+
+def _read_line_chunks(f, chunk_bytes: int, progress=None, end: Optional[int] = None) -> Iterator[List[str]]:
+    """
+    Wczytuje plik binarny porcjami pełnych linii (ok. chunk_bytes bajtów na porcję).
+
+    Args:
+        f: Plik otwarty w trybie binarnym (ustawiony na początku zakresu)
+        chunk_bytes: Przybliżony rozmiar porcji w bajtach
+        progress: Opcjonalny pasek postępu (tqdm) aktualizowany liczbą bajtów
+        end: Opcjonalny bajt końca zakresu (musi wypadać na początku linii)
+
+    Yields:
+        List[str]: Zdekodowane linie (z zachowanymi znakami końca linii)
+    """
+    while True:
+        limit = chunk_bytes
+        if end is not None:
+            limit = min(limit, end - f.tell())
+        # readlines(hint) czyta o linię za dużo, gdy suma równa się dokładnie hint,
+        # więc porcja jest zbierana ręcznie, by nie wyjść poza koniec zakresu
+        raw_lines = []
+        size = 0
+        while size < limit:
+            raw = f.readline()
+            if not raw:
+                break
+            raw_lines.append(raw)
+            size += len(raw)
+        if not raw_lines:
+            return
+        if progress is not None:
+            progress.update(size)
+        yield [raw.decode('utf-8') for raw in raw_lines]
+
+
+def _new_counters() -> Dict:
+    """Tworzy liczniki bieżących statystyk anonimizacji pliku."""
+    return {
+        'total_lines': 0,
+        'total_chars': 0,
+        'total_entities': 0,
+        'entity_counts': {},
+        'total_inference_time': 0.0,
+        'cache_hits': 0,
+        'cache_misses': 0,
+        'triage_checked': 0,
+        'triage_skipped': 0,
+        'precision': None,
+    }
+
+
+def _anonymize_chunks(
+    chunks: Iterable[List[str]],
+    tagger,
+    replacements: Optional[Dict[str, str]],
+    token_budget: int,
+    counters: Dict,
+    rules: Optional[RuleEngine] = None,
+    gazetteer: Optional[Gazetteer] = None,
+    cache: Optional[SentenceCache] = None,
+    triage: Optional[TriageClassifier] = None
+) -> Iterator[List[str]]:
+    """
+    Anonimizuje strumień porcji linii, aktualizując liczniki na bieżąco.
+
+    Niepuste linie każdej porcji są anonimizowane wsadowo, puste przepisywane
+    bez zmian. W pamięci trzymana jest tylko bieżąca porcja.
+
+    Yields:
+        List[str]: Zanonimizowane linie porcji (w kolejności wejściowej)
+    """
+    entity_counts = counters['entity_counts']
+    for lines in chunks:
+        non_empty = [line for line in lines if line.strip()]
+        if cache is not None:
+            hits, misses = cache.hits, cache.misses
+        if triage is not None:
+            checked, skipped = triage.checked, triage.skipped
+        results = iter(anonymize_texts(
+            non_empty, tagger, replacements, token_budget, rules, gazetteer, cache, triage
+        ))
+        if cache is not None:
+            counters['cache_hits'] += cache.hits - hits
+            counters['cache_misses'] += cache.misses - misses
+        if triage is not None:
+            counters['triage_checked'] += triage.checked - checked
+            counters['triage_skipped'] += triage.skipped - skipped
+
+        anonymized_lines = []
+        for line in lines:
+            counters['total_lines'] += 1
+            counters['total_chars'] += len(line)
+            if line.strip():
+                anon_line, entities, inf_time = next(results)
+                anonymized_lines.append(anon_line)
+                counters['total_entities'] += len(entities)
+                counters['total_inference_time'] += inf_time
+
+                for e in entities:
+                    label = e['label']
+                    entity_counts[label] = entity_counts.get(label, 0) + 1
+            else:
+                anonymized_lines.append(line)
+        yield anonymized_lines
+
+
+def _merge_counters(target: Dict, other: Dict):
+    """Dodaje liczniki `other` do `target` (scalanie statystyk workerów)."""
+    for key in ('total_lines', 'total_chars', 'total_entities', 'total_inference_time',
+                'cache_hits', 'cache_misses', 'triage_checked', 'triage_skipped'):
+        target[key] += other[key]
+    for label, count in other['entity_counts'].items():
+        target['entity_counts'][label] = target['entity_counts'].get(label, 0) + count
+
+
+def _build_stats(input_path: str, output_path: str, counters: Dict) -> Dict:
+    """Buduje słownik statystyk anonimizacji pliku z liczników."""
+    total_lines = counters['total_lines']
+    total_inference_time = counters['total_inference_time']
+    stats = {
+        'input_file': input_path,
+        'output_file': output_path,
+        'total_lines': total_lines,
+        'total_entities': counters['total_entities'],
+        'entity_counts': counters['entity_counts'],
+        'total_inference_time_ms': total_inference_time * 1000,
+        'avg_inference_time_ms': (total_inference_time * 1000 / total_lines) if total_lines else 0
+    }
+    lookups = counters['cache_hits'] + counters['cache_misses']
+    if lookups:
+        stats['cache_hits'] = counters['cache_hits']
+        stats['cache_misses'] = counters['cache_misses']
+        stats['cache_hit_rate'] = counters['cache_hits'] / lookups
+    if counters['triage_checked']:
+        stats['triage_skipped'] = counters['triage_skipped']
+        stats['triage_skip_rate'] = counters['triage_skipped'] / counters['triage_checked']
+    if counters['precision']:
+        stats['precision'] = counters['precision']
+    return stats
+
+
+def _print_stats(stats: Dict, total_chars: int):
+    """Wyświetla statystyki anonimizacji pliku."""
+    print(f"\n📊 Statystyki anonimizacji:")
+    print(f"   • Przetworzono linii: {stats['total_lines']}")
+    print(f"   • Znalezionych encji: {stats['total_entities']}")
+    print(f"   • Całkowity czas inferencji: {stats['total_inference_time_ms']:.2f} ms")
+    print(f"   • Średni czas na linię: {stats['avg_inference_time_ms']:.2f} ms")
+    if stats['total_inference_time_ms'] > 0:
+        print(f"   • Przepustowość: {total_chars * 1000 / stats['total_inference_time_ms']:,.0f} znaków/s")
+    if 'cache_hit_rate' in stats:
+        print(f"   • Cache zdań: {stats['cache_hits']} trafień, {stats['cache_misses']} chybień "
+              f"({stats['cache_hit_rate']:.1%} trafień)")
+    if 'triage_skip_rate' in stats:
+        print(f"   • Triage: {stats['triage_skipped']} zdań pominęło model "
+              f"({stats['triage_skip_rate']:.1%})")
+    if 'precision' in stats:
+        print(f"   • Precyzja inferencji: {stats['precision']}")
+    if stats['entity_counts']:
+        print(f"   • Podział według typu:")
+        for label, count in sorted(stats['entity_counts'].items(), key=lambda x: -x[1]):
+            print(f"      - {label}: {count}")
+
+
 def anonymize_file(
     input_path: str,
     output_path: str,
     tagger,
     replacements: Optional[Dict[str, str]] = None,
-    show_stats: bool = True
+    show_stats: bool = True,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    rules: Optional[RuleEngine] = None,
+    gazetteer: Optional[Gazetteer] = None,
+    cache: Optional[SentenceCache] = None,
+    triage: Optional[TriageClassifier] = None,
+    resume: Optional[Dict] = None,
+    on_checkpoint: Optional[Callable[[Dict], None]] = None
 ) -> Dict:
     """
-    Anonimizuje plik tekstowy.
+    Anonimizuje plik tekstowy strumieniowo.
+    
+    Plik jest czytany porcjami po ok. chunk_bytes bajtów, każda porcja jest
+    anonimizowana wsadowo i od razu dopisywana do pliku wyjściowego, więc
+    zużycie pamięci nie zależy od rozmiaru pliku, a przerwane przetwarzanie
+    zostawia gotową część wyniku na dysku.
+    
+    Po każdej zapisanej porcji on_checkpoint dostaje punkt kontrolny
+    (input_offset, output_offset, counters) - przekazany jako resume wznawia
+    przetwarzanie od tego miejsca, a wynik zapisany za punktem jest odrzucany.
     
     Args:
         input_path: Ścieżka do pliku wejściowego
         output_path: Ścieżka do pliku wyjściowego
-        tagger: Załadowany model NER
+        tagger: Załadowany model NER (None - tylko reguły i gazetteer)
         replacements: Słownik mapujący etykiety na tekst zastępczy
         show_stats: Czy wyświetlać statystyki
+        token_budget: Maksymalna liczba tokenów subword w jednej paczce inferencji
+        chunk_bytes: Przybliżony rozmiar porcji wczytywanej z pliku (w bajtach)
+        rules: Opcjonalny silnik reguł uruchamiany przed modelem
+        gazetteer: Opcjonalny słownik encji uzupełniający wynik modelu
+        cache: Opcjonalny cache wyników modelu dla zdań
+        triage: Opcjonalny klasyfikator pomijający model dla czystych zdań
+        resume: Opcjonalny punkt kontrolny przerwanego przetwarzania
+        on_checkpoint: Opcjonalna funkcja wywoływana z punktem kontrolnym po każdej porcji
     
     Returns:
-        Dict: Statystyki anonimizacji
+        Dict: Statystyki anonimizacji (łącznie z częścią sprzed wznowienia)
     """
     from tqdm import tqdm
     
     print(f"📂 Przetwarzanie pliku: {input_path}")
     
-    with open(input_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    anonymized_lines = []
-    all_entities = []
-    entity_counts = {}
-    
-    total_inference_time = 0.0
+    counters = _new_counters()
+    input_offset = output_offset = 0
+    if resume is not None:
+        _merge_counters(counters, resume['counters'])
+        input_offset, output_offset = resume['input_offset'], resume['output_offset']
+        print(f"⚙️  Wznawianie od bajtu {input_offset}")
+    if tagger is not None:
+        counters['precision'] = inference_precision(tagger)
     
-    for line in tqdm(lines, desc="Anonimizacja", unit="linii"):
-        if line.strip():
-            anon_line, entities, inf_time = anonymize_text(line, tagger, replacements)
-            anonymized_lines.append(anon_line)
-            all_entities.extend(entities)
-            total_inference_time += inf_time
-            
-            for e in entities:
-                label = e['label']
-                entity_counts[label] = entity_counts.get(label, 0) + 1
-        else:
-            anonymized_lines.append(line)
+    with open(input_path, 'rb') as src, open(output_path, 'r+b' if resume is not None else 'wb') as dst, \
+            tqdm(total=os.path.getsize(input_path), initial=input_offset,
+                 desc="Anonimizacja", unit="B", unit_scale=True) as pbar:
+        src.seek(input_offset)
+        dst.truncate(output_offset)
+        dst.seek(output_offset)
+        chunks = _read_line_chunks(src, chunk_bytes, progress=pbar)
+        for anonymized_lines in _anonymize_chunks(
+            chunks, tagger, replacements, token_budget, counters, rules, gazetteer, cache, triage
+        ):
+            dst.write(''.join(anonymized_lines).encode('utf-8'))
+            dst.flush()
+            if on_checkpoint is not None:
+                # Punkt kontrolny nie może wyprzedzać danych zapisanych na dysku
+                os.fsync(dst.fileno())
+                on_checkpoint({'input_offset': src.tell(), 'output_offset': dst.tell(), 'counters': counters})
     
-    # Zapisz wynik
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.writelines(anonymized_lines)
-    
-    stats = {
-        'input_file': input_path,
-        'output_file': output_path,
-        'total_lines': len(lines),
-        'total_entities': len(all_entities),
-        'entity_counts': entity_counts,
-        'total_inference_time_ms': total_inference_time * 1000,
-        'avg_inference_time_ms': (total_inference_time * 1000 / len(lines)) if lines else 0
-    }
+    stats = _build_stats(input_path, output_path, counters)
     
     if show_stats:
-        print(f"\n📊 Statystyki anonimizacji:")
-        print(f"   • Przetworzono linii: {stats['total_lines']}")
-        print(f"   • Znalezionych encji: {stats['total_entities']}")
-        print(f"   • Całkowity czas inferencji: {stats['total_inference_time_ms']:.2f} ms")
-        print(f"   • Średni czas na linię: {stats['avg_inference_time_ms']:.2f} ms")
-        if entity_counts:
-            print(f"   • Podział według typu:")
-            for label, count in sorted(entity_counts.items(), key=lambda x: -x[1]):
-                print(f"      - {label}: {count}")
+        _print_stats(stats, counters['total_chars'])
     
     print(f"\n✅ Zapisano zanonimizowany plik: {output_path}")
     return stats
 
 
+def _shard_boundaries(input_path: str, shards: int) -> List[int]:
+    """
+    Dzieli plik na zakresy bajtów wyrównane do początków linii.
+
+    Returns:
+        List[int]: Posortowane offsety granic (pierwszy 0, ostatni = rozmiar pliku)
+    """
+    size = os.path.getsize(input_path)
+    boundaries = [0]
+    with open(input_path, 'rb') as f:
+        for k in range(1, shards):
+            f.seek(max(size * k // shards - 1, boundaries[-1]))
+            # Dosuń granicę do początku następnej linii
+            f.readline()
+            offset = f.tell()
+            if boundaries[-1] < offset < size:
+                boundaries.append(offset)
+    boundaries.append(size)
+    return boundaries
+
+
+def _anonymize_shard(
+    index: int,
+    input_path: str,
+    part_path: str,
+    start: int,
+    end: int,
+    model_path: Optional[str],
+    replacements: Optional[Dict[str, str]],
+    token_budget: int,
+    chunk_bytes: int,
+    num_threads: int,
+    rules: Optional[RuleEngine],
+    gazetteer: Optional[Gazetteer],
+    cache: Optional[SentenceCache],
+    triage: Optional[TriageClassifier],
+    quantize: Optional[str],
+    backend: str,
+    precision: str
+) -> Tuple[Dict, float]:
+    """
+    Anonimizuje zakres bajtów [start, end) pliku w osobnym procesie.
+
+    Każdy worker ładuje własny SequenceTagger (chyba że model_path=None)
+    i zapisuje wynik do pliku częściowego, który proces główny skleja we
+    właściwej kolejności.
+
+    Returns:
+        Tuple[Dict, float]: Liczniki statystyk i czas pracy workera (s)
+    """
+    from tqdm import tqdm
+
+    tagger = None
+    if model_path is not None:
+        import torch
+
+        # Ogranicz wątki, żeby workery nie walczyły o te same rdzenie
+        torch.set_num_threads(num_threads)
+        tagger = load_model(model_path, quantize, backend, precision)
+
+    worker_start = time.perf_counter()
+    counters = _new_counters()
+    if tagger is not None:
+        counters['precision'] = inference_precision(tagger)
+    with open(input_path, 'rb') as src, open(part_path, 'wb') as dst, \
+            tqdm(total=end - start, desc=f"Worker {index}", unit="B", unit_scale=True, position=index) as pbar:
+        src.seek(start)
+        chunks = _read_line_chunks(src, chunk_bytes, progress=pbar, end=end)
+        for anonymized_lines in _anonymize_chunks(
+            chunks, tagger, replacements, token_budget, counters, rules, gazetteer, cache, triage
+        ):
+            dst.write(''.join(anonymized_lines).encode('utf-8'))
+            dst.flush()
+    return counters, time.perf_counter() - worker_start
+
+
+def _measure_single_worker(
+    context,
+    input_path: str,
+    output_path: str,
+    model_path: Optional[str],
+    replacements: Optional[Dict[str, str]],
+    token_budget: int,
+    chunk_bytes: int,
+    rules: Optional[RuleEngine],
+    gazetteer: Optional[Gazetteer],
+    cache: Optional[SentenceCache],
+    triage: Optional[TriageClassifier],
+    quantize: Optional[str],
+    backend: str,
+    precision: str
+) -> Tuple[int, float]:
+    """
+    Mierzy przepustowość jednego workera (wszystkie wątki torch) na początku pliku.
+
+    Cache bez poziomu sqlite - wpisy z pomiaru nie mogą przyspieszyć właściwego przebiegu.
+
+    Returns:
+        Tuple[int, float]: Liczba przetworzonych bajtów i czas pracy workera (s)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    size = os.path.getsize(input_path)
+    end = size
+    if size > SCALING_BASELINE_BYTES:
+        with open(input_path, 'rb') as f:
+            f.seek(SCALING_BASELINE_BYTES - 1)
+            # Dosuń koniec do początku następnej linii
+            f.readline()
+            end = f.tell()
+    if cache is not None:
+        cache = SentenceCache(cache.model_hash, cache.max_entries)
+
+    print(f"⚙️  Pomiar 1 workera na {end} B pliku (--scaling-baseline)")
+    part_path = f"{output_path}.baseline"
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            _, worker_time = executor.submit(
+                _anonymize_shard, 0, input_path, part_path, 0, end,
+                model_path, replacements, token_budget, chunk_bytes, os.cpu_count() or 1, rules, gazetteer, cache,
+                triage, quantize, backend, precision
+            ).result()
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    return end, worker_time
+
+
+def anonymize_file_parallel(
+    input_path: str,
+    output_path: str,
+    model_path: Optional[str],
+    workers: int,
+    replacements: Optional[Dict[str, str]] = None,
+    show_stats: bool = True,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    rules: Optional[RuleEngine] = None,
+    gazetteer: Optional[Gazetteer] = None,
+    cache: Optional[SentenceCache] = None,
+    triage: Optional[TriageClassifier] = None,
+    quantize: Optional[str] = None,
+    backend: str = 'flair',
+    precision: str = 'fp32',
+    scaling_baseline: bool = False
+) -> Dict:
+    """
+    Anonimizuje plik tekstowy równolegle w wielu procesach.
+
+    Plik dzielony jest na `workers` zakresów bajtów wyrównanych do linii,
+    każdy zakres przetwarza osobny proces z własnym modelem (jak anonymize_file),
+    a wyniki są sklejane w oryginalnej kolejności.
+
+    Przyspieszenie 1 → N wymaga pomiaru jednego workera: przy scaling_baseline
+    jeden proces ze wszystkimi wątkami torch najpierw przetwarza początek pliku
+    (SCALING_BASELINE_BYTES, bez współdzielonego cache sqlite), a jego
+    przepustowość daje szacowany czas 1 workera dla całego pliku. Czasy obu
+    przebiegów nie obejmują ładowania modelu. Bez pomiaru raportowane jest
+    tylko wykorzystanie workerów, które nie jest przyspieszeniem.
+
+    Args:
+        input_path: Ścieżka do pliku wejściowego
+        output_path: Ścieżka do pliku wyjściowego
+        model_path: Ścieżka do modelu NER ładowanego w każdym workerze
+            (None - tylko reguły i gazetteer)
+        workers: Liczba procesów
+        replacements: Słownik mapujący etykiety na tekst zastępczy
+        show_stats: Czy wyświetlać statystyki
+        token_budget: Maksymalna liczba tokenów subword w jednej paczce inferencji
+        chunk_bytes: Przybliżony rozmiar porcji wczytywanej z pliku (w bajtach)
+        rules: Opcjonalny silnik reguł uruchamiany przed modelem
+        gazetteer: Opcjonalny słownik encji uzupełniający wynik modelu
+        cache: Opcjonalny cache wyników modelu (każdy worker ma własny poziom
+            w pamięci, poziom sqlite jest współdzielony)
+        triage: Opcjonalny klasyfikator pomijający model dla czystych zdań
+        quantize: Opcjonalny tryb kwantyzacji modelu w workerach (np. 'int8')
+        backend: Backend inferencji w workerach ('flair' lub 'onnx')
+        precision: Precyzja inferencji w workerach ('fp32', 'bf16', 'auto')
+        scaling_baseline: Czy zmierzyć przepustowość 1 workera i raportować
+            przyspieszenie oraz efektywność skalowania
+
+    Returns:
+        Dict: Statystyki anonimizacji (jak anonymize_file) uzupełnione o
+        liczbę workerów, czas całkowity, wykorzystanie workerów (worker_utilization)
+        oraz - przy scaling_baseline - speedup i scaling_efficiency (speedup / N)
+    """
+    import multiprocessing
+    import shutil
+    from concurrent.futures import ProcessPoolExecutor
+
+    print(f"📂 Przetwarzanie pliku: {input_path} ({workers} workerów)")
+
+    boundaries = _shard_boundaries(input_path, workers)
+    shards = len(boundaries) - 1
+    part_paths = [f"{output_path}.part{k}" for k in range(shards)]
+    num_threads = max(1, (os.cpu_count() or 1) // shards)
+
+    if model_path is not None and quantize is not None and not _quantized_is_fresh(model_path, quantize):
+        # Skwantyzuj raz w procesie głównym - workery wczytają gotową kopię z dysku
+        load_model(model_path, quantize)
+
+    # spawn - bezpieczne z PyTorch (fork po inicjalizacji wątków bywa zawodny)
+    context = multiprocessing.get_context('spawn')
+
+    baseline = None
+    if scaling_baseline:
+        baseline = _measure_single_worker(
+            context, input_path, output_path, model_path, replacements, token_budget, chunk_bytes,
+            rules, gazetteer, cache, triage, quantize, backend, precision
+        )
+
+    wall_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=shards, mp_context=context) as executor:
+        futures = [
+            executor.submit(
+                _anonymize_shard, k, input_path, part_paths[k], boundaries[k], boundaries[k + 1],
+                model_path, replacements, token_budget, chunk_bytes, num_threads, rules, gazetteer, cache, triage,
+                quantize, backend, precision
+            )
+            for k in range(shards)
+        ]
+        results = [future.result() for future in futures]
+
+    # Sklej pliki częściowe w oryginalnej kolejności
+    with open(output_path, 'wb') as dst:
+        for part_path in part_paths:
+            with open(part_path, 'rb') as part:
+                shutil.copyfileobj(part, dst)
+            os.remove(part_path)
+    wall_time = time.perf_counter() - wall_start
+
+    counters = _new_counters()
+    for worker_counters, _ in results:
+        _merge_counters(counters, worker_counters)
+        counters['precision'] = worker_counters['precision']
+
+    # Wykorzystanie workerów: suma czasów ich pracy podzielona przez N × czas rzeczywisty.
+    # To nie jest przyspieszenie względem 1 workera - N workerów dzieli rdzenie, pamięć
+    # i wątki torch, więc każdy z nich pracuje wolniej niż pojedynczy proces.
+    busy_time = sum(worker_time for _, worker_time in results)
+    # Czas przetwarzania N workerów (bez ładowania modelu) - wyznacza go najwolniejszy
+    parallel_time = max(worker_time for _, worker_time in results)
+
+    stats = _build_stats(input_path, output_path, counters)
+    stats['workers'] = shards
+    stats['wall_time_ms'] = wall_time * 1000
+    stats['worker_busy_ms'] = busy_time * 1000
+    stats['worker_utilization'] = busy_time / (shards * wall_time) if wall_time > 0 else 0.0
+    if baseline is not None:
+        baseline_bytes, baseline_time = baseline
+        single_time = os.path.getsize(input_path) * baseline_time / baseline_bytes if baseline_bytes else 0.0
+        stats['single_worker_estimate_ms'] = single_time * 1000
+        stats['parallel_time_ms'] = parallel_time * 1000
+        stats['speedup'] = single_time / parallel_time if parallel_time > 0 else 0.0
+        stats['scaling_efficiency'] = stats['speedup'] / shards
+
+    if show_stats:
+        _print_stats(stats, counters['total_chars'])
+        print(f"   • Workerów: {shards} (wątków torch na workera: {num_threads})")
+        print(f"   • Czas całkowity: {wall_time * 1000:.2f} ms")
+        print(f"   • Wykorzystanie workerów: {stats['worker_utilization']:.0%} "
+              f"(suma czasu pracy: {busy_time * 1000:.2f} ms)")
+        if baseline is not None:
+            print(f"   • Przyspieszenie 1 → {shards}: {stats['speedup']:.2f}x "
+                  f"(efektywność skalowania: {stats['scaling_efficiency']:.0%}; szacowany czas 1 workera "
+                  f"{stats['single_worker_estimate_ms']:.2f} ms z {baseline_bytes} B, "
+                  f"{shards} workerów {stats['parallel_time_ms']:.2f} ms)")
+
+    print(f"\n✅ Zapisano zanonimizowany plik: {output_path}")
+    return stats
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Anonimizacja danych osobowych w tekście przy użyciu modelu NER",
@@ -212,6 +1330,15 @@ Przykłady użycia:
   %(prog)s "Jan Kowalski mieszka w Warszawie"
   %(prog)s -i dane.txt -o anonimowe.txt
   %(prog)s -i dane.txt -o anonimowe.txt -m models/custom_model
+  %(prog)s -i dane.txt -o anonimowe.txt --token-budget 16384
+  %(prog)s -i dane.txt -o anonimowe.txt --workers 8
+  %(prog)s -i dane.txt -o anonimowe.txt --workers 8 --scaling-baseline
+  %(prog)s -i dane.txt -o anonimowe.txt --gazetteer only
+  %(prog)s -i dane.txt -o anonimowe.txt --cache-db cache.sqlite
+  %(prog)s -i dane.txt -o anonimowe.txt --triage resources/triage/triage.pkl
+  %(prog)s -i dane.txt -o anonimowe.txt --quantize int8
+  %(prog)s -i dane.txt -o anonimowe.txt --backend onnx
+  %(prog)s -i dane.txt -o anonimowe.txt --precision auto
   echo "Tekst" | %(prog)s
         """
     )
@@ -242,6 +1369,98 @@ Przykłady użycia:
     )
 
     
+    parser.add_argument(
+        '--token-budget',
+        type=int,
+        default=DEFAULT_TOKEN_BUDGET,
+        help=f'Maks. liczba tokenów subword w jednej paczce inferencji dla plików (domyślnie: {DEFAULT_TOKEN_BUDGET})'
+    )
+    
+    parser.add_argument(
+        '--chunk-bytes',
+        type=int,
+        default=DEFAULT_CHUNK_BYTES,
+        help=f'Rozmiar porcji pliku wczytywanej naraz, w bajtach (domyślnie: {DEFAULT_CHUNK_BYTES})'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Liczba procesów do równoległej anonimizacji pliku (domyślnie: 1). Statystyki podają '
+             'wykorzystanie workerów; przyspieszenie 1 → N tylko z --scaling-baseline'
+    )
+    
+    parser.add_argument(
+        '--scaling-baseline',
+        action='store_true',
+        help='Przy --workers > 1: zmierz najpierw 1 workera na początku pliku '
+             f'(do {SCALING_BASELINE_BYTES >> 20} MB) i raportuj przyspieszenie 1 → N '
+             'oraz efektywność skalowania'
+    )
+    
+    parser.add_argument(
+        '--no-rules',
+        action='store_true',
+        help='Wyłącz regułowe wykrywanie identyfikatorów (PESEL, konto, karta, e-mail, telefon) przed modelem'
+    )
+    
+    parser.add_argument(
+        '--gazetteer',
+        choices=['off', 'prepass', 'only'],
+        default='off',
+        help='Słownik encji z data/: prepass - uzupełnia wynik modelu, '
+             'only - zamiast modelu (bez ładowania modelu) (domyślnie: off)'
+    )
+    
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=DEFAULT_CACHE_ENTRIES,
+        help=f'Liczba zdań w cache wyników modelu w pamięci, 0 wyłącza cache (domyślnie: {DEFAULT_CACHE_ENTRIES})'
+    )
+    
+    parser.add_argument(
+        '--cache-db',
+        type=str,
+        help='Plik sqlite z trwałym cache wyników modelu (współdzielony między uruchomieniami)'
+    )
+    
+    parser.add_argument(
+        '--triage',
+        type=str,
+        help='Klasyfikator wstępny (python triage.py --train) - zdania uznane za czyste pomijają model'
+    )
+    
+    parser.add_argument(
+        '--triage-recall',
+        type=float,
+        help='Docelowa czułość klasyfikatora wstępnego, np. 0.995 (domyślnie: z treningu)'
+    )
+    
+    parser.add_argument(
+        '--quantize',
+        choices=QUANTIZE_MODES,
+        help='Dynamiczna kwantyzacja warstw liniowych transformera (CPU); '
+             'skwantyzowany model jest zapisywany obok oryginału'
+    )
+    
+    parser.add_argument(
+        '--backend',
+        choices=BACKENDS,
+        default='flair',
+        help='Backend inferencji: flair lub onnx (ONNX Runtime, wymaga eksportu: '
+             'python onnx_backend.py -m MODEL) (domyślnie: flair)'
+    )
+    
+    parser.add_argument(
+        '--precision',
+        choices=PRECISIONS,
+        default='fp32',
+        help='Precyzja inferencji: bf16 (autocast) tylko na sprzęcie z instrukcjami bf16, '
+             'auto - bf16 gdy dostępne, inaczej fp32 (domyślnie: fp32)'
+    )
+    
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
@@ -257,8 +1476,31 @@ Przykłady użycia:
     
     args = parser.parse_args()
     
-    # Załaduj model
-    tagger = load_model(args.model)
+    rules = None if args.no_rules else RuleEngine()
+    gazetteer = None if args.gazetteer == 'off' else Gazetteer.load()
+    use_model = args.gazetteer != 'only'
+    precision = resolve_precision(args.precision, args.quantize, args.backend) if use_model else 'fp32'
+    
+    cache = None
+    startup_start = time.perf_counter()
+    if use_model and args.cache_size > 0 and os.path.exists(args.model):
+        # Klucze cache zawierają odcisk pliku modelu - nowy model nie użyje starych wpisów.
+        # Pełny skrót zawartości jest potrzebny tylko dla bazy współdzielonej między uruchomieniami.
+        model_hash = file_fingerprint(args.model) if args.cache_db else file_stamp(args.model)
+        if args.quantize:
+            model_hash = f"{model_hash}:{args.quantize}"
+        if args.backend != 'flair':
+            model_hash = f"{model_hash}:{args.backend}"
+        if precision != 'fp32':
+            model_hash = f"{model_hash}:{precision}"
+        cache = SentenceCache(model_hash, args.cache_size, args.cache_db)
+    
+    triage = None
+    if use_model and args.triage:
+        if not os.path.exists(args.triage):
+            print(f"❌ Błąd: Klasyfikator triage nie znaleziony w '{args.triage}'")
+            sys.exit(1)
+        triage = TriageClassifier.load(args.triage, args.triage_recall)
     
     # Przetwarzanie pliku
     if args.input:
@@ -271,9 +1513,35 @@ Przykłady użycia:
             input_path = Path(args.input)
             output = str(input_path.parent / f"{input_path.stem}_anonymized{input_path.suffix}")
         
-        anonymize_file(args.input, output, tagger)
+        if args.workers > 1:
+            # Każdy worker ładuje własny model
+            if use_model and not os.path.exists(args.model):
+                print(f"❌ Błąd: Model nie znaleziony w '{args.model}'")
+                sys.exit(1)
+            if cache is not None:
+                print(f"⏱️  Odcisk modelu dla cache: {(time.perf_counter() - startup_start) * 1000:.0f} ms")
+            anonymize_file_parallel(
+                args.input, output, args.model if use_model else None, args.workers,
+                token_budget=args.token_budget, chunk_bytes=args.chunk_bytes,
+                rules=rules, gazetteer=gazetteer, cache=cache, triage=triage,
+                quantize=args.quantize, backend=args.backend, precision=precision,
+                scaling_baseline=args.scaling_baseline
+            )
+            return
+        
+        tagger = load_model(
+            args.model, args.quantize, args.backend, precision, startup_start
+        ) if use_model else None
+        anonymize_file(
+            args.input, output, tagger,
+            token_budget=args.token_budget, chunk_bytes=args.chunk_bytes,
+            rules=rules, gazetteer=gazetteer, cache=cache, triage=triage
+        )
         return
     
+    # Załaduj model
+    tagger = load_model(args.model, args.quantize, args.backend, precision, startup_start) if use_model else None
+    
     # Pojedynczy tekst z argumentu lub stdin
     if args.text:
         text = args.text
@@ -285,7 +1553,10 @@ Przykłady użycia:
         return
     
     # Anonimizuj tekst
-    result, entities, inference_time = anonymize_text(text, tagger, show_entities=args.verbose)
+    result, entities, inference_time = anonymize_text(
+        text, tagger, show_entities=args.verbose, rules=rules, gazetteer=gazetteer,
+        cache=cache, triage=triage
+    )
     
     if args.format == 'json':
         import json
@@ -294,6 +1565,8 @@ Przykłady użycia:
             'anonymized': result,
             'entities': entities
         }
+        if tagger is not None:
+            output['precision'] = inference_precision(tagger)
         print(json.dumps(output, ensure_ascii=False, indent=2))
     elif args.format == 'csv':
         print("original,anonymized,entities_count")
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Dynamiczne łączenie żądań API w paczki inferencji (micro-batching).
+
+Każde żądanie /anonymize to zwykle jedno krótkie zdanie, więc przy
+równoległym ruchu model dostaje paczki po jednym zdaniu. MicroBatcher zbiera
+teksty przychodzące w oknie `max_wait_ms` (liczonym od najstarszego
+oczekującego żądania) albo do limitu `max_batch_tokens` i anonimizuje je
+jednym wywołaniem anonymize_texts, a wyniki wracają do właściwych
+wywołujących przez Future.
+
+Dłuższe okno - większe paczki i przepustowość kosztem p50 opóźnienia;
+max_wait_ms=0 wyłącza czekanie (paczki tworzą się tylko z żądań, które
+zdążyły się zebrać w czasie poprzedniej inferencji).
+
+Kolejka jest ograniczona (max_pending) - gdy jest pełna, submit od razu
+zgłasza QueueFullError zamiast pozwalać, by opóźnienie rosło bez końca.
+
+Żądania trafiają do osobnych kolejek według klasy (INTERACTIVE - ktoś czeka
+na wynik, BULK - przetwarzanie wsadowe). Kolejną paczkę wybiera ważone
+round-robin (domyślnie 4:1 dla interaktywnych), a duże żądania wsadowe są
+dzielone na części po max_batch_tokens - krótki tekst interaktywny czeka
+co najwyżej na jedną paczkę wsadową, nawet gdy kolejka BULK jest pełna.
+
+Użycie:
+    from batcher import MicroBatcher
+
+    batcher = MicroBatcher(tagger, max_wait_ms=5)
+    anonymized, entities, inference_time = batcher.submit("Jan Kowalski").result()
+    results = batcher.submit_many(["Jan Kowalski", "Anna Nowak"], priority=BULK).result()
+
+    # W kodzie async:
+    result = await asyncio.wrap_future(batcher.submit(text))
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+from anonymize import DEFAULT_TOKEN_BUDGET, SUBWORDS_PER_TOKEN_ESTIMATE, anonymize_texts
+
+# Domyślny maksymalny czas oczekiwania na dołączenie kolejnych żądań (ms)
+DEFAULT_MAX_WAIT_MS = 5.0
+
+# Domyślna maksymalna liczba oczekujących żądań (w każdej klasie osobno)
+DEFAULT_MAX_PENDING = 1024
+
+# Klasy żądań
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+PRIORITIES = [INTERACTIVE, BULK]
+
+# Domyślne wagi klas - udział paczek, gdy obie kolejki są niepuste
+DEFAULT_LANE_WEIGHTS = {INTERACTIVE: 4, BULK: 1}
+
+
+class QueueFullError(RuntimeError):
+    """Kolejka batchera jest pełna - żądanie należy ponowić później."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Szacuje liczbę tokenów subword tekstu (bez tokenizera)."""
+    return max(1, len(text.split())) * SUBWORDS_PER_TOKEN_ESTIMATE
+
+
+@dataclass
+class _Request:
+    texts: List[str]
+    tokens: int
+    arrival: float
+    # Pojedynczy tekst (submit) - Future dostaje wynik, a nie listę wyników
+    single: bool
+    future: Future = field(default_factory=Future)
+
+
+def _resolve(future: Future, result=None, error: Optional[BaseException] = None):
+    """Ustawia wynik lub błąd Future; Future anulowane w międzyczasie przez wywołującego jest pomijane."""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+def _combine_futures(futures: List[Future]) -> Future:
+    """
+    Zwraca Future z połączoną listą wyników części (lub pierwszym błędem).
+
+    Anulowanie połączonego Future (np. rozłączenie klienta) anuluje części
+    jeszcze nieprzetworzone, a anulowanie części - połączony Future.
+    """
+    combined = Future()
+    results: List[Optional[list]] = [None] * len(futures)
+    remaining = [len(futures)]
+    # RLock - anulowanie części w on_done anuluje połączony Future, a ten pozostałe części
+    lock = threading.RLock()
+
+    def on_done(index: int, future: Future):
+        with lock:
+            if combined.done():
+                return
+            if future.cancelled():
+                combined.cancel()
+                return
+            if future.exception() is not None:
+                combined.set_exception(future.exception())
+                return
+            results[index] = future.result()
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                combined.set_result([result for part in results for result in part])
+
+    def on_combined_done(future: Future):
+        if future.cancelled():
+            for part in futures:
+                part.cancel()
+
+    if not futures:
+        combined.set_result([])
+    for index, future in enumerate(futures):
+        future.add_done_callback(lambda f, index=index: on_done(index, f))
+    combined.add_done_callback(on_combined_done)
+    return combined
+
+
+class MicroBatcher:
+    """
+    Wątek w tle łączący oczekujące teksty w paczki dla anonymize_texts.
+
+    Liczniki (requests, batches) pozwalają sprawdzić średni rozmiar paczki,
+    a lane_batches - podział paczek między klasy żądań.
+    """
+
+    def __init__(
+        self,
+        tagger,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        max_batch_tokens: int = DEFAULT_TOKEN_BUDGET,
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        lane_weights: Optional[Dict[str, int]] = None
+    ):
+        """
+        Args:
+            tagger: Załadowany model NER
+            max_wait_ms: Maksymalny czas oczekiwania najstarszego żądania na paczkę
+            max_batch_tokens: Szacowany limit tokenów jednej paczki żądań
+            token_budget: Budżet tokenów paczki inferencji (przekazywany do anonymize_texts)
+            max_pending: Maksymalna liczba oczekujących żądań w każdej klasie
+            lane_weights: Wagi klas żądań (domyślnie DEFAULT_LANE_WEIGHTS)
+        """
+        self.tagger = tagger
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_tokens = max_batch_tokens
+        self.token_budget = token_budget
+        self.max_pending = max_pending
+        self.lane_weights = dict(lane_weights or DEFAULT_LANE_WEIGHTS)
+        self.rejected = 0
+        self.requests = 0
+        self.batches = 0
+        self.lane_batches = {lane: 0 for lane in self.lane_weights}
+        self._pending: Dict[str, Deque[_Request]] = {lane: deque() for lane in self.lane_weights}
+        self._pending_tokens = {lane: 0 for lane in self.lane_weights}
+        # Bieżące kredyty ważonego round-robin (jak smooth weighted round-robin w nginx)
+        self._credits = {lane: 0 for lane in self.lane_weights}
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str, priority: str = INTERACTIVE) -> Future:
+        """
+        Dodaje tekst do kolejki.
+
+        Args:
+            text: Tekst do anonimizacji
+            priority: Klasa żądania (INTERACTIVE lub BULK)
+
+        Returns:
+            Future: Wynik jak z anonymize_text - (tekst z tagami, encje, czas inferencji)
+
+        Raises:
+            QueueFullError: Gdy w kolejce klasy oczekuje już max_pending żądań
+        """
+        request = _Request([text], estimate_tokens(text), time.monotonic(), single=True)
+        self._enqueue([request], priority)
+        return request.future
+
+    def submit_many(self, texts: List[str], priority: str = INTERACTIVE) -> Future:
+        """
+        Dodaje listę tekstów jako jedno żądanie (np. endpoint wsadowy).
+
+        Lista jest dzielona na części po max_batch_tokens, żeby jedno duże
+        żądanie nie zajmowało modelu na długo.
+
+        Args:
+            texts: Teksty do anonimizacji
+            priority: Klasa żądania (INTERACTIVE lub BULK)
+
+        Returns:
+            Future: Lista wyników jak z anonymize_texts, w kolejności wejściowej
+
+        Raises:
+            QueueFullError: Gdy części listy przekroczyłyby max_pending oczekujących
+                żądań klasy (do pustej kolejki lista trafia zawsze)
+        """
+        arrival = time.monotonic()
+        requests = [
+            _Request(chunk, tokens, arrival, single=False)
+            for chunk, tokens in self._split(texts)
+        ]
+        self._enqueue(requests, priority)
+        return _combine_futures([request.future for request in requests])
+
+    def _split(self, texts: List[str]) -> List[Tuple[List[str], int]]:
+        """Dzieli teksty na kolejne części o szacowanej liczbie tokenów <= max_batch_tokens."""
+        chunks: List[Tuple[List[str], int]] = []
+        chunk: List[str] = []
+        chunk_tokens = 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if chunk and chunk_tokens + tokens > self.max_batch_tokens:
+                chunks.append((chunk, chunk_tokens))
+                chunk, chunk_tokens = [], 0
+            chunk.append(text)
+            chunk_tokens += tokens
+        if chunk:
+            chunks.append((chunk, chunk_tokens))
+        return chunks
+
+    def _enqueue(self, requests: List[_Request], priority: str):
+        if priority not in self._pending:
+            raise ValueError(f"Nieznana klasa żądania: {priority} (dostępne: {', '.join(self._pending)})")
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("MicroBatcher jest zamknięty")
+            lane = self._pending[priority]
+            # Liczą się wszystkie części submit_many; do pustej kolejki wchodzi nawet większe żądanie,
+            # żeby duża lista nigdy nie była odrzucana bez końca
+            if lane and len(lane) + len(requests) > self.max_pending:
+                self.rejected += 1
+                raise QueueFullError(f"Kolejka {priority} pełna ({self.max_pending} oczekujących żądań)")
+            lane.extend(requests)
+            self._pending_tokens[priority] += sum(request.tokens for request in requests)
+            self._condition.notify()
+
+    def _choose_lane(self) -> str:
+        """Wybiera klasę dla kolejnej paczki (ważone round-robin po niepustych kolejkach)."""
+        active = [lane for lane, pending in self._pending.items() if pending]
+        if len(active) == 1:
+            return active[0]
+        for lane in active:
+            self._credits[lane] += self.lane_weights[lane]
+        chosen = max(active, key=lambda lane: self._credits[lane])
+        self._credits[chosen] -= sum(self.lane_weights[lane] for lane in active)
+        return chosen
+
+    def _take_batch(self) -> List[_Request]:
+        """Czeka na żądania i zwraca paczkę (pustą listę po zamknięciu)."""
+        with self._condition:
+            while not self._has_pending() and not self._closed:
+                self._condition.wait()
+            if not self._has_pending():
+                return []
+
+            chosen = self._choose_lane()
+            # Paczkę otwiera wybrana klasa; wolne miejsce uzupełniają tylko klasy o wyższej
+            # wadze - paczka interaktywna nie jest wydłużana tekstami wsadowymi
+            lanes = [chosen] + sorted(
+                (lane for lane in self._pending if self.lane_weights[lane] > self.lane_weights[chosen]),
+                key=lambda lane: -self.lane_weights[lane]
+            )
+            deadline = self._pending[chosen][0].arrival + self.max_wait
+            while not self._closed and sum(self._pending_tokens[lane] for lane in lanes) < self.max_batch_tokens:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch: List[_Request] = []
+            tokens = 0
+            for lane in lanes:
+                pending = self._pending[lane]
+                while pending and (not batch or tokens + pending[0].tokens <= self.max_batch_tokens):
+                    request = pending.popleft()
+                    batch.append(request)
+                    tokens += request.tokens
+                    self._pending_tokens[lane] -= request.tokens
+            self.lane_batches[chosen] += 1
+            return batch
+
+    def _has_pending(self) -> bool:
+        return any(self._pending.values())
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            # Żądania anulowane przez wywołującego (rozłączenie klienta) nie trafiają do modelu
+            batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self.requests += len(batch)
+            self.batches += 1
+            texts = [text for request in batch for text in request.texts]
+            try:
+                results = anonymize_texts(texts, self.tagger, token_budget=self.token_budget)
+            except Exception as error:
+                for request in batch:
+                    _resolve(request.future, error=error)
+                continue
+            offset = 0
+            for request in batch:
+                request_results = results[offset:offset + len(request.texts)]
+                offset += len(request.texts)
+                _resolve(request.future, request_results[0] if request.single else request_results)
+
+    def stats(self) -> Dict:
+        """
+        Zwraca liczniki: oczekujące i odrzucone żądania, przetworzone żądania,
+        paczki, średni rozmiar paczki oraz oczekujące żądania i paczki według klas.
+        """
+        return {
+            'pending': sum(len(pending) for pending in self._pending.values()),
+            'rejected': self.rejected,
+            'requests': self.requests,
+            'batches': self.batches,
+            'avg_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'lanes': {
+                lane: {'pending': len(self._pending[lane]), 'batches': self.lane_batches[lane]}
+                for lane in self._pending
+            },
+        }
+
+    def close(self, timeout: Optional[float] = None):
+        """Kończy wątek po obsłużeniu oczekujących żądań."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
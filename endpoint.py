@@ -1,10 +1,56 @@
-from fastapi import FastAPI
+import asyncio
+import codecs
+import json
+import os
+import secrets
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from anonymize import load_model, anonymize_text
+from anonymize import DEFAULT_TOKEN_BUDGET, load_model
+from batcher import BULK, DEFAULT_LANE_WEIGHTS, DEFAULT_MAX_WAIT_MS, INTERACTIVE, PRIORITIES, MicroBatcher, \
+    QueueFullError, estimate_tokens
+from result_cache import file_fingerprint
+from incremental import DocumentSession
+from jobs import DEFAULT_JOBS_DIR, DONE, KIND_TEXTS, JobRunner, JobStore
+from prefork import READY_FD_ENV, notify_ready
+from segmenter import split_paragraphs
 from template_filler.filler import TagFiller
 
-app = FastAPI(title="NoFace Anonymizer API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Rozgrzewka w tle - /health odpowiada od razu, a /ready dopiero po rozgrzaniu modelu
+    warm_up_task = asyncio.create_task(_warm_up_in_background())
+    if PREFORK and READY_FD_ENV in os.environ:
+        # Worker wymieniany po podmianie modelu zaczyna przyjmować połączenia dopiero
+        # po rozgrzewce - do tego czasu obsługują je pozostałe workery
+        await asyncio.shield(warm_up_task)
+    # SIGHUP - podmiana modelu bez restartu (w trybie pre-fork obsługuje go proces główny)
+    loop = asyncio.get_running_loop()
+    if not PREFORK:
+        try:
+            loop.add_signal_handler(signal.SIGHUP, _schedule_reload)
+        except (AttributeError, NotImplementedError, RuntimeError):
+            pass
+    yield
+    warm_up_task.cancel()
+    if _job_runner is not None:
+        # Przerwane zadanie wraca do kolejki i po restarcie jest wznawiane od punktu kontrolnego
+        await loop.run_in_executor(None, _job_runner.stop, 5)
+    if _batcher is not None:
+        _batcher.close(timeout=5)
+    for executor in _fill_executors.values():
+        executor.shutdown(wait=False)
+
+
+app = FastAPI(title="NoFace Anonymizer API", lifespan=lifespan)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -17,13 +63,66 @@ app.add_middleware(
 
 # Załaduj model tylko raz (możesz zmienić ścieżkę jeśli trzeba)
 MODEL_PATH = 'resources/model/final-model.pt'
+# Kwantyzacja modelu na węzłach CPU, np. MODEL_QUANTIZE=int8 (domyślnie: brak)
+MODEL_QUANTIZE = os.environ.get('MODEL_QUANTIZE') or None
+# Micro-batching: maks. czas czekania żądania na paczkę (ms) i szacowany limit tokenów paczki
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', DEFAULT_MAX_WAIT_MS))
+BATCH_MAX_TOKENS = int(os.environ.get('BATCH_MAX_TOKENS', DEFAULT_TOKEN_BUDGET))
+# Maks. liczba żądań w toku (inferencja + wypełnianie) w każdej klasie; nadmiarowe dostają 503 z Retry-After
+QUEUE_MAX = int(os.environ.get('QUEUE_MAX', 256))
+# Klasy żądań: waga interaktywnych względem wsadowych (BULK ma wagę 1) i próg szacowanych
+# tokenów, powyżej którego tekst z /anonymize trafia do klasy wsadowej
+INTERACTIVE_WEIGHT = int(os.environ.get('INTERACTIVE_WEIGHT', DEFAULT_LANE_WEIGHTS[INTERACTIVE]))
+INTERACTIVE_MAX_TOKENS = int(os.environ.get('INTERACTIVE_MAX_TOKENS', 1024))
+RETRY_AFTER_S = int(os.environ.get('RETRY_AFTER_S', 1))
+# Wątki wypełniające tagi (TagFiller) - poza pętlą zdarzeń, osobna pula dla każdej klasy
+FILL_WORKERS = int(os.environ.get('FILL_WORKERS', 2))
+# Maks. liczba tekstów w jednym żądaniu /anonymize/batch
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 10000))
+# Strumieniowanie: maks. liczba akapitów w toku (wysłanych do modelu, jeszcze nie odesłanych)
+STREAM_WINDOW = int(os.environ.get('STREAM_WINDOW', 32))
+# Strumieniowanie: maks. długość akapitu bez pustej linii trzymanego w buforze (znaki)
+STREAM_MAX_PARAGRAPH = int(os.environ.get('STREAM_MAX_PARAGRAPH', 20000))
+# Rozgrzewka przy starcie: plik z tekstami (oddzielonymi pustą linią) i liczba przebiegów
+WARMUP_FILE = os.environ.get('WARMUP_FILE') or None
+WARMUP_ROUNDS = int(os.environ.get('WARMUP_ROUNDS', 2))
+# Domyślne teksty rozgrzewki: krótki, typowy i długi (dłuższy niż okno transformera)
+WARMUP_TEXTS = [
+    "Jan Kowalski",
+    "Nazywam się Anna Nowak, mieszkam w Krakowie przy ul. Długiej 5, tel. 600 100 200.",
+    " ".join(
+        ["Pan Piotr Wiśniewski z Gdańska napisał 12 marca 2023 r. do urzędu w Poznaniu, "
+         "podając PESEL 85010112345 i adres e-mail piotr.wisniewski@example.com."] * 20
+    ),
+]
 _tagger = None
 _filler = None
+_batcher = None
+_fill_executors = {}
+_in_flight = {priority: 0 for priority in PRIORITIES}
+# Zadania asynchroniczne: katalog (baza sqlite + pliki) i liczba wątków przetwarzających
+JOBS_DIR = os.environ.get('JOBS_DIR', DEFAULT_JOBS_DIR)
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 1))
+# Token operacji administracyjnych (nagłówek X-Admin-Token); bez niego /admin/* jest wyłączone
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN') or None
+# Ustawiane przy uruchomieniu z --workers > 1 (dziedziczone przez workery)
+PREFORK = False
+_ready = False
+_warm_up_error: Optional[str] = None
+_model_version: Optional[str] = None
+_reload_task: Optional[asyncio.Task] = None
+_job_store = None
+_job_runner = None
+
+def model_version(model_path: str) -> str:
+    """Zwraca wersję modelu - skrót zawartości pliku (lub katalogu) modelu."""
+    return file_fingerprint(model_path)[:12]
 
 def get_tagger():
-    global _tagger
+    global _tagger, _model_version
     if _tagger is None:
-        _tagger = load_model(MODEL_PATH)
+        _model_version = model_version(MODEL_PATH)
+        _tagger = load_model(MODEL_PATH, MODEL_QUANTIZE)
     return _tagger
 
 def get_filler():
@@ -32,17 +131,353 @@ def get_filler():
         _filler = TagFiller()
     return _filler
 
-def get_anonymized_and_placeholder_text(text: str):
-    tagger = get_tagger()
+def get_batcher():
+    # Wątek batchera startuje leniwie - w trybie pre-fork osobno w każdym workerze
+    global _batcher
+    if _batcher is None:
+        _batcher = _new_batcher(get_tagger())
+    return _batcher
+
+def _new_batcher(tagger) -> MicroBatcher:
+    return MicroBatcher(
+        tagger, BATCH_MAX_WAIT_MS, BATCH_MAX_TOKENS,
+        lane_weights={INTERACTIVE: INTERACTIVE_WEIGHT, BULK: 1}
+    )
+
+def get_job_store() -> JobStore:
+    global _job_store
+    if _job_store is None:
+        _job_store = JobStore(JOBS_DIR)
+    return _job_store
+
+def _start_job_runner():
+    # W trybie pre-fork zadania przetwarza tylko worker 0 (uruchamiany ponownie z tym samym
+    # numerem), więc przerwane zadania można bezpiecznie przywrócić do kolejki przy starcie
+    global _job_runner
+    if JOB_WORKERS <= 0 or (PREFORK and os.environ.get('PREFORK_WORKER') != '0'):
+        return
+    _job_runner = JobRunner(get_job_store(), get_tagger, JOB_WORKERS)
+    _job_runner.start()
+
+def get_fill_executor(priority: str = INTERACTIVE):
+    # Osobne pule - wypełnianie dużej paczki wsadowej nie blokuje żądań interaktywnych
+    if priority not in _fill_executors:
+        _fill_executors[priority] = ThreadPoolExecutor(
+            max_workers=FILL_WORKERS, thread_name_prefix=f"filler-{priority}"
+        )
+    return _fill_executors[priority]
+
+def queue_depth() -> int:
+    return sum(_in_flight.values())
+
+def resolve_priority(header: Optional[str], default: str) -> str:
+    """Zwraca klasę żądania z nagłówka X-Priority (lub domyślną dla endpointu)."""
+    if header is None:
+        return default
+    priority = header.strip().lower()
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=422, detail=f"X-Priority musi być jednym z: {', '.join(PRIORITIES)}")
+    return priority
+
+def _admit(priority: str):
+    # Licznik zmieniany tylko w pętli zdarzeń - bez blokad; limit osobno dla każdej klasy,
+    # więc zalew żądań wsadowych nie odrzuca interaktywnych
+    if _in_flight[priority] >= QUEUE_MAX:
+        _reject_busy()
+    _in_flight[priority] += 1
+
+def _release(priority: str):
+    _in_flight[priority] -= 1
+
+def _reject_busy():
+    raise HTTPException(
+        status_code=503,
+        detail="Serwer przeciążony - spróbuj ponownie później",
+        headers={'Retry-After': str(RETRY_AFTER_S), 'X-Queue-Depth': str(queue_depth())},
+    )
+
+def load_warm_up_texts(path: Optional[str] = None) -> List[str]:
+    """Zwraca teksty rozgrzewki - z pliku (teksty oddzielone pustą linią) lub domyślne WARMUP_TEXTS."""
+    if path is None:
+        return WARMUP_TEXTS
+    with open(path, 'r', encoding='utf-8') as f:
+        texts = [text.strip() for text in f.read().split('\n\n')]
+    return [text for text in texts if text]
+
+def warm_up(texts: List[str], rounds: int = WARMUP_ROUNDS):
+    """
+    Ładuje model, TagFiller i batcher, a następnie przepuszcza teksty przez
+    pełną ścieżkę żądania, żeby pierwsze prawdziwe żądania nie płaciły za
+    alokacje i pierwsze wywołania kerneli.
+
+    Args:
+        texts: Reprezentatywne teksty (także długie - ścieżka okien transformera)
+        rounds: Liczba przebiegów (0 - tylko załadowanie komponentów)
+    """
+    start_time = time.perf_counter()
+    get_tagger()
+    filler = get_filler()
+    batcher = get_batcher()
+    load_time = time.perf_counter() - start_time
+    _exercise(batcher, filler, texts, rounds)
+    total_time = time.perf_counter() - start_time
+    print(f"✅ Rozgrzewka zakończona: {len(texts)} tekstów, przebiegów: {rounds} "
+          f"(ładowanie {load_time * 1000:.0f} ms, łącznie {total_time * 1000:.0f} ms)")
+
+def _exercise(batcher: MicroBatcher, filler: TagFiller, texts: List[str], rounds: int):
+    for _ in range(rounds):
+        # Pojedynczo (małe paczki, jak typowe /anonymize) i razem (duże paczki)
+        for text in texts:
+            anonymized, _, _ = batcher.submit(text).result()
+            filler.fill(anonymized)
+        results = batcher.submit_many(texts).result()
+        filler.fill_batch([anonymized for anonymized, _, _ in results])
+
+def _load_and_warm_up(model_path: str):
+    """Ładuje nową wersję modelu obok bieżącej i rozgrzewa ją na osobnym batcherze."""
+    version = model_version(model_path)
+    tagger = load_model(model_path, MODEL_QUANTIZE)
+    batcher = _new_batcher(tagger)
+    try:
+        _exercise(batcher, get_filler(), load_warm_up_texts(WARMUP_FILE), WARMUP_ROUNDS)
+    except Exception:
+        batcher.close()
+        raise
+    return tagger, batcher, version
+
+async def reload_model() -> str:
+    """
+    Podmienia model bez przerywania obsługi żądań.
+
+    Nowa wersja jest ładowana i rozgrzewana w tle, a następnie podmieniana
+    w pętli zdarzeń - kolejne żądania trafiają już do nowego batchera.
+    Żądania przyjęte wcześniej kończą się na starym modelu, po czym stary
+    batcher jest zamykany. Przy błędzie ładowania zostaje bieżący model.
+
+    Returns:
+        str: Wersja nowego modelu
+    """
+    global _tagger, _batcher, _model_version
+    loop = asyncio.get_running_loop()
+    start_time = time.perf_counter()
+    tagger, batcher, version = await loop.run_in_executor(None, _load_and_warm_up, MODEL_PATH)
+
+    previous_version, previous_batcher = _model_version, _batcher
+    _tagger, _batcher, _model_version = tagger, batcher, version
+    print(f"✅ Podmieniono model: {previous_version} → {version} "
+          f"(ładowanie i rozgrzewka {(time.perf_counter() - start_time) * 1000:.0f} ms)")
+    if previous_batcher is not None:
+        await loop.run_in_executor(None, previous_batcher.close)
+    return version
+
+def _schedule_reload():
+    # Wywoływane z obsługi SIGHUP i /admin/reload; podmiana w trakcie rozgrzewki lub innej podmiany jest pomijana
+    global _reload_task
+    if not _ready or (_reload_task is not None and not _reload_task.done()):
+        print("⚠️  Model jest właśnie ładowany - pomijam żądanie podmiany")
+        return
+    _reload_task = asyncio.ensure_future(reload_model())
+    _reload_task.add_done_callback(_report_reload_error)
+
+def _report_reload_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"❌ Podmiana modelu nie powiodła się: {task.exception()}")
+
+def reload_preloaded():
+    """
+    Ładuje i rozgrzewa nową wersję modelu w procesie głównym pre-fork.
+
+    Workery są potem wymieniane po jednym i forkowane z nowego obrazu.
+    Batcher rozgrzewki jest zamykany - każdy worker tworzy własny.
+    """
+    global _tagger, _model_version
+    tagger, batcher, version = _load_and_warm_up(MODEL_PATH)
+    batcher.close()
+    previous_version = _model_version
+    _tagger, _model_version = tagger, version
+    print(f"✅ Załadowano model w procesie głównym: {previous_version} → {version}")
+
+async def _warm_up_in_background():
+    global _ready, _warm_up_error
+    loop = asyncio.get_running_loop()
+    try:
+        texts = load_warm_up_texts(WARMUP_FILE)
+        await loop.run_in_executor(None, warm_up, texts, WARMUP_ROUNDS)
+    except Exception as error:
+        _warm_up_error = f"{type(error).__name__}: {error}"
+        print(f"❌ Rozgrzewka nie powiodła się: {_warm_up_error}")
+        return
+    _ready = True
+    _start_job_runner()
+    # Proces główny pre-fork wymienia kolejnego workera dopiero po gotowości tego
+    notify_ready()
+
+def _require_ready():
+    # Zimna replika nie przyjmuje żądań - żądanie nie zapłaci za ładowanie modelu
+    if not _ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Model jest jeszcze ładowany - spróbuj ponownie później",
+            headers={'Retry-After': str(RETRY_AFTER_S)},
+        )
+
+async def _anonymize_and_fill(text: str, priority: str = INTERACTIVE):
+    _admit(priority)
+    try:
+        try:
+            future = get_batcher().submit(text, priority)
+        except QueueFullError:
+            _reject_busy()
+        # Wersja modelu, który obsłuży żądanie (podmiana zmienia ją dopiero dla kolejnych)
+        version = _model_version
+        anonymized, _, _ = await asyncio.wrap_future(future)
+        loop = asyncio.get_running_loop()
+        replaced = await loop.run_in_executor(get_fill_executor(priority), get_filler().fill, anonymized)
+        return anonymized, replaced, version
+    finally:
+        _release(priority)
+
+async def _anonymize_and_fill_many(texts: List[str], priority: str = BULK):
+    _admit(priority)
+    try:
+        try:
+            future = get_batcher().submit_many(texts, priority)
+        except QueueFullError:
+            _reject_busy()
+        version = _model_version
+        results = await asyncio.wrap_future(future)
+        loop = asyncio.get_running_loop()
+        replaced = await loop.run_in_executor(
+            get_fill_executor(priority), get_filler().fill_batch, [anonymized for anonymized, _, _ in results]
+        )
+        items = [(anonymized, entities, filled) for (anonymized, entities, _), filled in zip(results, replaced)]
+        return items, version
+    finally:
+        _release(priority)
+
+async def _upload_chunks(request: Request) -> AsyncIterator[str]:
+    """Zwraca tekst przesyłany w treści żądania (surowy/chunked lub plik multipart) porcjami."""
+    # Odpowiedź jest już w toku, więc błędne bajty zamieniamy zamiast zwracać 400
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    if request.headers.get('content-type', '').startswith('multipart/form-data'):
+        # Starlette buforuje plik multipart w pliku tymczasowym - pamięć pozostaje ograniczona
+        form = await request.form()
+        upload = next((value for value in form.values() if hasattr(value, 'read')), None)
+        if upload is None:
+            raise HTTPException(status_code=400, detail="Brak pliku w żądaniu multipart")
+        while True:
+            data = await upload.read(1 << 16)
+            if not data:
+                break
+            yield decoder.decode(data)
+    else:
+        async for data in request.stream():
+            yield decoder.decode(data)
+    yield decoder.decode(b'', final=True)
+
+async def _stream_paragraphs(request: Request) -> AsyncIterator[tuple]:
+    """Dzieli przesyłany dokument na akapity (akapit, separator) w miarę napływu danych."""
+    buffer = ''
+    async for chunk in _upload_chunks(request):
+        buffer += chunk
+        paragraphs, consumed = split_paragraphs(buffer, final=False, max_chars=STREAM_MAX_PARAGRAPH)
+        for paragraph in paragraphs:
+            yield paragraph
+        buffer = buffer[consumed:]
+    paragraphs, _ = split_paragraphs(buffer, final=True)
+    for paragraph in paragraphs:
+        yield paragraph
+
+async def _submit_with_retry(text: str, priority: str):
+    # Rozpoczęty strumień nie może już dostać 503 - przy pełnej kolejce czekamy
+    while True:
+        try:
+            return asyncio.wrap_future(get_batcher().submit(text, priority)), _model_version
+        except QueueFullError:
+            await asyncio.sleep(RETRY_AFTER_S)
+
+async def _anonymize_stream(request: Request, output: str, priority: str) -> AsyncIterator[str]:
+    """
+    Anonimizuje dokument akapit po akapicie i zwraca wyniki w kolejności.
+
+    Producent czyta dalsze akapity i wysyła je do batchera (do STREAM_WINDOW
+    w toku), a odpowiedź z wcześniejszymi akapitami jest już wysyłana.
+    """
+    pending: asyncio.Queue = asyncio.Queue(maxsize=STREAM_WINDOW)
+
+    async def produce():
+        try:
+            async for paragraph, separator in _stream_paragraphs(request):
+                # Puste akapity (same odstępy) nie trafiają do modelu
+                if paragraph.strip():
+                    future, version = await _submit_with_retry(paragraph, priority)
+                else:
+                    future, version = None, _model_version
+                await pending.put((paragraph, separator, future, version))
+        except Exception as error:
+            await pending.put(error)
+        else:
+            await pending.put(None)
+
+    producer = asyncio.create_task(produce())
+    loop = asyncio.get_running_loop()
     filler = get_filler()
-    
-    # Anonimizacja - zamiana encji na tagi [NAME], [CITY] itd.
-    anonymized, _, _ = anonymize_text(text, tagger)
-    
-    # Wypełnienie tagów losowymi wartościami z odmianą gramatyczną
-    replaced = filler.fill(anonymized)
-    
-    return anonymized, replaced
+    index = 0
+    try:
+        while True:
+            item = await pending.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            paragraph, separator, future, version = item
+            if future is None:
+                anonymized = replaced = paragraph
+            else:
+                anonymized, _, _ = await future
+                replaced = await loop.run_in_executor(get_fill_executor(priority), filler.fill, anonymized)
+            if output == 'ndjson':
+                yield json.dumps({
+                    'index': index,
+                    'anonymizedText': anonymized,
+                    'replacedText': replaced,
+                    'separator': separator,
+                    'modelVersion': version,
+                }, ensure_ascii=False) + '\n'
+            else:
+                yield (replaced if output == 'replaced' else anonymized) + separator
+            index += 1
+    finally:
+        producer.cancel()
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse bez nasłuchu rozłączenia w tle.
+
+    Domyślna StreamingResponse czyta receive() równolegle z wysyłaniem, co
+    zabiera fragmenty treści żądania wczytywanej jeszcze przez generator.
+    Rozłączenie klienta i tak przerywa strumień (ClientDisconnect przy
+    odczycie treści lub błąd przy wysyłaniu).
+
+    on_close jest wywoływane po zakończeniu odpowiedzi w każdym przypadku -
+    także gdy wysłanie nagłówków się nie powiedzie albo odpowiedź zostanie
+    anulowana, zanim generator w ogóle ruszy (wtedy jego finally się nie wykona).
+    """
+
+    def __init__(self, *args, on_close: Optional[Callable[[], None]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        finally:
+            try:
+                # Generator zatrzymany na yield (błąd wysyłania) kończy się od razu, a nie przy GC
+                await self.body_iterator.aclose()
+            finally:
+                if self.on_close is not None:
+                    self.on_close()
 
 
 class AnonymizeRequest(BaseModel):
@@ -52,17 +487,431 @@ class AnonymizeRequest(BaseModel):
 class AnonymizeResponse(BaseModel):
     anonymizedText: str
     replacedText: str
+    modelVersion: str
+
+
+class BatchAnonymizeRequest(BaseModel):
+    texts: List[str]
+    includeSpans: bool = False
+
+
+class SpanInfo(BaseModel):
+    start: int
+    end: int
+    label: str
+    text: str
+    confidence: float
+
+
+class BatchAnonymizeItem(BaseModel):
+    anonymizedText: str
+    replacedText: str
+    spans: Optional[List[SpanInfo]] = None
+
+
+class BatchAnonymizeResponse(BaseModel):
+    results: List[BatchAnonymizeItem]
+    modelVersion: Optional[str] = None
+
+
+class HealthResponse(BaseModel):
+    status: str
+    ready: bool
+    modelVersion: Optional[str] = None
+    queueDepth: int
+    queueDepthByPriority: Dict[str, int]
+    queueMax: int
+
+
+class ReadyResponse(BaseModel):
+    ready: bool
+    error: Optional[str] = None
+
+
+class JobTextsRequest(BaseModel):
+    texts: List[str]
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    totalBytes: int
+    processedBytes: int
+    progress: float
+    createdAt: float
+    updatedAt: float
+    stats: Optional[Dict] = None
+    error: Optional[str] = None
+
+
+class JobTextsResult(BaseModel):
+    results: List[str]
+
+
+class ReloadResponse(BaseModel):
+    status: str
+    modelVersion: Optional[str] = None
+    previousVersion: Optional[str] = None
+
+
+@app.middleware("http")
+async def add_queue_depth_header(request: Request, call_next):
+    # Głębokość kolejki w każdej odpowiedzi - load balancer może omijać zajęte repliki
+    response = await call_next(request)
+    response.headers['X-Queue-Depth'] = str(queue_depth())
+    return response
+
+
+@app.get("/health", response_model=HealthResponse)
+async def health():
+    # Liveness - odpowiada także w trakcie rozgrzewki
+    if not _ready:
+        status = "error" if _warm_up_error else "starting"
+    else:
+        status = "busy" if any(depth >= QUEUE_MAX for depth in _in_flight.values()) else "ok"
+    return HealthResponse(
+        status=status,
+        ready=_ready,
+        modelVersion=_model_version,
+        queueDepth=queue_depth(),
+        queueDepthByPriority=dict(_in_flight),
+        queueMax=QUEUE_MAX
+    )
+
+
+@app.get("/ready", response_model=ReadyResponse)
+async def ready():
+    # Readiness - 200 dopiero po załadowaniu i rozgrzaniu modelu
+    if not _ready:
+        return JSONResponse(status_code=503, content={'ready': False, 'error': _warm_up_error})
+    return ReadyResponse(ready=True)
 
 
 @app.post("/anonymize", response_model=AnonymizeResponse)
-async def anonymize(request: AnonymizeRequest):
-    anonymized, replaced = get_anonymized_and_placeholder_text(request.text)
+async def anonymize(request: AnonymizeRequest, x_priority: Optional[str] = Header(None)):
+    _require_ready()
+    # Domyślnie interaktywne; bardzo długie teksty nie zajmują kolejki interaktywnej
+    default = INTERACTIVE if estimate_tokens(request.text) <= INTERACTIVE_MAX_TOKENS else BULK
+    priority = resolve_priority(x_priority, default)
+    anonymized, replaced, version = await _anonymize_and_fill(request.text, priority)
     return AnonymizeResponse(
         anonymizedText=anonymized,
-        replacedText=replaced
+        replacedText=replaced,
+        modelVersion=version
     )
 
 
+@app.post("/anonymize/stream")
+async def anonymize_stream(request: Request, output: str = 'ndjson', x_priority: Optional[str] = Header(None)):
+    """
+    Strumieniowa anonimizacja dużego dokumentu.
+
+    Treść żądania: surowy tekst UTF-8 (także Transfer-Encoding: chunked) lub
+    plik w multipart/form-data. Odpowiedź jest wysyłana akapit po akapicie:
+    output=ndjson - jedna linia JSON na akapit (index, anonymizedText,
+    replacedText, separator); output=anonymized / replaced - sam tekst
+    (z tagami lub wypełniony), z zachowanymi odstępami między akapitami.
+    Domyślnie w klasie wsadowej (X-Priority: interactive zmienia klasę).
+    """
+    _require_ready()
+    if output not in ('ndjson', 'anonymized', 'replaced'):
+        raise HTTPException(status_code=422, detail="output musi być jednym z: ndjson, anonymized, replaced")
+    priority = resolve_priority(x_priority, BULK)
+    _admit(priority)
+    media_type = 'application/x-ndjson' if output == 'ndjson' else 'text/plain; charset=utf-8'
+    # W trybie tekstowym wersja w nagłówku (w NDJSON także przy każdym akapicie)
+    headers = {'X-Model-Version': _model_version or ''}
+    try:
+        # Zwalniane przez odpowiedź po jej zakończeniu (także przy wczesnym rozłączeniu)
+        return _DuplexStreamingResponse(
+            _anonymize_stream(request, output, priority), media_type=media_type, headers=headers,
+            on_close=lambda: _release(priority)
+        )
+    except BaseException:
+        _release(priority)
+        raise
+
+
+@app.post("/anonymize/batch", response_model=BatchAnonymizeResponse)
+async def anonymize_batch(request: BatchAnonymizeRequest, x_priority: Optional[str] = Header(None)):
+    _require_ready()
+    # Teksty trafiają do batchera jako jedno żądanie, domyślnie w klasie wsadowej
+    priority = resolve_priority(x_priority, BULK)
+    if len(request.texts) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Za dużo tekstów w żądaniu (maks. {BATCH_MAX_ITEMS})")
+    if not request.texts:
+        return BatchAnonymizeResponse(results=[])
+    results, version = await _anonymize_and_fill_many(request.texts, priority)
+    return BatchAnonymizeResponse(modelVersion=version, results=[
+        BatchAnonymizeItem(
+            anonymizedText=anonymized,
+            replacedText=replaced,
+            spans=[
+                SpanInfo(start=e['start'], end=e['end'], label=e['label'], text=e['text'],
+                         confidence=e['confidence'])
+                for e in entities
+            ] if request.includeSpans else None
+        )
+        for anonymized, entities, replaced in results
+    ])
+
+
+def _apply_session_message(session: DocumentSession, raw: str):
+    """
+    Nanosi na sesję wiadomość edytora i zwraca jej rewizję.
+
+    Raises:
+        ValueError: Przy niepoprawnym JSON, nieznanym typie wiadomości lub nieprawidłowej edycji
+    """
+    try:
+        message = json.loads(raw)
+        kind = message.get('type')
+        if kind == 'set':
+            session.set_text(str(message.get('text', '')))
+        elif kind == 'edit':
+            session.apply_edit(int(message['start']), int(message['end']), str(message.get('text', '')))
+        else:
+            raise ValueError(f"Nieznany typ wiadomości: {kind}")
+    except (KeyError, TypeError, AttributeError) as error:
+        raise ValueError(f"Niepełna wiadomość: {error}")
+    return message.get('revision')
+
+async def _push_session_diff(websocket: WebSocket, session: DocumentSession, revision: Optional[int]):
+    # Do modelu trafiają tylko zdania, których treść zmieniła się od poprzedniej wersji
+    start_time = time.perf_counter()
+    version = _model_version
+    session.set_model_version(version)
+    missing = session.missing_sentences()
+    if missing:
+        try:
+            future = get_batcher().submit_many(missing, INTERACTIVE)
+        except QueueFullError:
+            await websocket.send_json({'type': 'error', 'revision': revision, 'busy': True,
+                                       'detail': "Serwer przeciążony - zmiana zostanie przeliczona przy kolejnej edycji",
+                                       'retryAfter': RETRY_AFTER_S})
+            return
+        try:
+            results = await asyncio.wrap_future(future)
+            loop = asyncio.get_running_loop()
+            filled = await loop.run_in_executor(
+                get_fill_executor(INTERACTIVE), get_filler().fill_batch, [anonymized for anonymized, _, _ in results]
+            )
+        except Exception as error:
+            await websocket.send_json({'type': 'error', 'revision': revision, 'detail': f"Błąd anonimizacji: {error}"})
+            return
+        session.store(missing, results, filled)
+
+    diff = session.diff()
+    await websocket.send_json({
+        'type': 'diff',
+        'revision': revision,
+        'modelVersion': version,
+        'recomputed': len(missing),
+        'timeMs': (time.perf_counter() - start_time) * 1000,
+        **diff,
+    })
+
+
+@app.websocket("/ws/anonymize")
+async def anonymize_session(websocket: WebSocket):
+    """
+    Sesja edytora z przyrostową anonimizacją (incremental.DocumentSession).
+
+    Klient wysyła {"type": "set", "text", "revision"} (cały tekst) lub
+    {"type": "edit", "start", "end", "text", "revision"} (zamiana fragmentu
+    [start, end), offsety w punktach kodowych Unicode). Serwer odpowiada
+    {"type": "diff", "revision", "start", "deleteCount", "segments", "lead", ...}
+    albo {"type": "error", "detail"}. Edycje nadesłane w trakcie liczenia są
+    łączone - model liczy tylko ostatni stan dokumentu.
+    """
+    await websocket.accept()
+    if not _ready:
+        await websocket.send_json({'type': 'error', 'detail': "Model jest jeszcze ładowany", 'retryAfter': RETRY_AFTER_S})
+        await websocket.close(code=1013)
+        return
+
+    session = DocumentSession()
+    inbox: asyncio.Queue = asyncio.Queue()
+
+    async def receive():
+        try:
+            while True:
+                await inbox.put(await websocket.receive_text())
+        except WebSocketDisconnect:
+            await inbox.put(None)
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while True:
+            raw_messages = [await inbox.get()]
+            while not inbox.empty():
+                raw_messages.append(inbox.get_nowait())
+            if None in raw_messages:
+                break
+
+            applied, revision = False, None
+            for raw in raw_messages:
+                try:
+                    revision = _apply_session_message(session, raw)
+                    applied = True
+                except ValueError as error:
+                    await websocket.send_json({'type': 'error', 'detail': f"Nieprawidłowa wiadomość: {error}"})
+            if applied:
+                await _push_session_diff(websocket, session, revision)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
+
+def _job_response(job: Dict) -> JobResponse:
+    return JobResponse(
+        id=job['id'],
+        kind=job['kind'],
+        status=job['status'],
+        totalBytes=job['total_bytes'],
+        processedBytes=job['processed_bytes'],
+        progress=job['processed_bytes'] / job['total_bytes'] if job['total_bytes'] else float(job['status'] == DONE),
+        createdAt=job['created'],
+        updatedAt=job['updated'],
+        stats=job['stats'],
+        error=job['error']
+    )
+
+def _get_job_or_404(job_id: str) -> Dict:
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Nie ma zadania {job_id}")
+    return job
+
+async def _submit_job(create, *args) -> JSONResponse:
+    # Zapis wejścia na dysk poza pętlą zdarzeń
+    loop = asyncio.get_running_loop()
+    store = get_job_store()
+    job_id = await loop.run_in_executor(None, create, *args)
+    if _job_runner is not None:
+        _job_runner.notify()
+    return JSONResponse(status_code=202, content=_job_response(store.get(job_id)).model_dump())
+
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def create_texts_job(request: JobTextsRequest):
+    """Kolejkuje anonimizację listy tekstów; wynik: GET /jobs/{id}/result."""
+    return await _submit_job(get_job_store().create_from_texts, request.texts)
+
+
+@app.post("/jobs/upload", response_model=JobResponse, status_code=202)
+async def create_file_job(request: Request):
+    """Kolejkuje anonimizację pliku tekstowego UTF-8 (multipart/form-data); wynik: GET /jobs/{id}/result."""
+    form = await request.form()
+    upload = next((value for value in form.values() if hasattr(value, 'read')), None)
+    if upload is None:
+        raise HTTPException(status_code=400, detail="Brak pliku w żądaniu multipart")
+    return await _submit_job(get_job_store().create_from_file, upload.file)
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    return _job_response(_get_job_or_404(job_id))
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Wynik zakończonego zadania: plik z tagami lub {"results": [...]} dla listy tekstów."""
+    job = _get_job_or_404(job_id)
+    if job['status'] != DONE:
+        raise HTTPException(status_code=409, detail=f"Zadanie nie jest zakończone (status: {job['status']})")
+    store = get_job_store()
+    if job['kind'] == KIND_TEXTS:
+        loop = asyncio.get_running_loop()
+        return JobTextsResult(results=await loop.run_in_executor(None, store.text_results, job_id))
+    return FileResponse(
+        store.output_path(job_id), media_type='text/plain; charset=utf-8', filename=f"{job_id}.txt"
+    )
+
+
+@app.post("/admin/reload", response_model=ReloadResponse)
+async def admin_reload(x_admin_token: Optional[str] = Header(None)):
+    """
+    Ładuje ponownie model z MODEL_PATH (np. po treningu) i podmienia go bez restartu.
+
+    W trybie pre-fork żądanie trafia do jednego workera, więc podmianę zleca
+    procesowi głównemu (SIGHUP) - odpowiedź 202. Proces główny ładuje nowy
+    model raz i wymienia workery po jednym (także ten, który odpowiedział),
+    więc wagi pozostają współdzielone; w trakcie wymiany pamięć mieści dwie
+    wersje modelu.
+    """
+    if ADMIN_TOKEN is None:
+        raise HTTPException(status_code=403, detail="Operacje administracyjne wyłączone (brak ADMIN_TOKEN)")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Nieprawidłowy token administracyjny")
+    if PREFORK:
+        os.kill(os.getppid(), signal.SIGHUP)
+        return JSONResponse(status_code=202, content={'status': 'reloading', 'modelVersion': _model_version})
+    if not _ready or (_reload_task is not None and not _reload_task.done()):
+        raise HTTPException(status_code=409, detail="Model jest właśnie ładowany")
+
+    previous_version = _model_version
+    _schedule_reload()
+    try:
+        version = await asyncio.shield(_reload_task)
+    except Exception as error:
+        raise HTTPException(status_code=500, detail=f"Nie udało się załadować modelu: {error}")
+    return ReloadResponse(status="reloaded", modelVersion=version, previousVersion=previous_version)
+
+
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=3000)
+    from anonymize import QUANTIZE_MODES
+
+    parser = argparse.ArgumentParser(description="NoFace Anonymizer API")
+    parser.add_argument('--quantize', choices=QUANTIZE_MODES, default=MODEL_QUANTIZE,
+                        help='Dynamiczna kwantyzacja modelu na CPU (także zmienna MODEL_QUANTIZE)')
+    parser.add_argument('--host', default="0.0.0.0", help='Adres nasłuchiwania (domyślnie: 0.0.0.0)')
+    parser.add_argument('--port', type=int, default=3000, help='Port (domyślnie: 3000)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Liczba workerów pre-fork współdzielących model załadowany raz (domyślnie: 1)')
+    parser.add_argument('--batch-wait-ms', type=float, default=BATCH_MAX_WAIT_MS,
+                        help='Maks. czas czekania żądania na wspólną paczkę inferencji - więcej to większa '
+                             'przepustowość kosztem opóźnienia (także BATCH_MAX_WAIT_MS, domyślnie: %(default)s)')
+    parser.add_argument('--batch-max-tokens', type=int, default=BATCH_MAX_TOKENS,
+                        help='Szacowany limit tokenów paczki żądań (także BATCH_MAX_TOKENS, domyślnie: %(default)s)')
+    parser.add_argument('--queue-max', type=int, default=QUEUE_MAX,
+                        help='Maks. liczba żądań w toku, ponad nią 503 z Retry-After (także QUEUE_MAX, domyślnie: %(default)s)')
+    parser.add_argument('--interactive-weight', type=int, default=INTERACTIVE_WEIGHT,
+                        help='Waga klasy interaktywnej względem wsadowej (waga 1) przy wyborze paczek '
+                             '(także INTERACTIVE_WEIGHT, domyślnie: %(default)s)')
+    parser.add_argument('--jobs-dir', default=JOBS_DIR,
+                        help='Katalog zadań asynchronicznych - baza sqlite i pliki (także JOBS_DIR, domyślnie: %(default)s)')
+    parser.add_argument('--job-workers', type=int, default=JOB_WORKERS,
+                        help='Liczba wątków przetwarzających zadania, 0 - bez przetwarzania '
+                             '(także JOB_WORKERS, domyślnie: %(default)s)')
+    parser.add_argument('--warmup-file', default=WARMUP_FILE,
+                        help='Teksty rozgrzewki oddzielone pustą linią (także WARMUP_FILE, domyślnie: wbudowane)')
+    parser.add_argument('--warmup-rounds', type=int, default=WARMUP_ROUNDS,
+                        help='Liczba przebiegów rozgrzewki przed gotowością, 0 - tylko ładowanie '
+                             '(także WARMUP_ROUNDS, domyślnie: %(default)s)')
+    args = parser.parse_args()
+    MODEL_QUANTIZE = args.quantize
+    BATCH_MAX_WAIT_MS = args.batch_wait_ms
+    BATCH_MAX_TOKENS = args.batch_max_tokens
+    QUEUE_MAX = args.queue_max
+    INTERACTIVE_WEIGHT = args.interactive_weight
+    JOBS_DIR = args.jobs_dir
+    JOB_WORKERS = args.job_workers
+    WARMUP_FILE = args.warmup_file
+    WARMUP_ROUNDS = args.warmup_rounds
+
+    if args.workers > 1:
+        from prefork import serve_prefork
+
+        def preload():
+            get_tagger()
+            get_filler()
+
+        PREFORK = True
+        serve_prefork(app, args.host, args.port, args.workers, preload=preload, reload=reload_preloaded)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
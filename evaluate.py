@@ -7,6 +7,21 @@ Oblicza metryki jakości anonimizacji:
 - Metryki per-klasa
 - Confusion matrix
 - Dokładność na poziomie tokenów i encji
+- Czułość klasyfikatora wstępnego (triage) względem modelu i przyspieszenie
+- Porównanie wariantów inferencji (np. kwantyzacja int8, backend ONNX): F1 na
+  wygenerowanym zbiorze testowym, zgodność spanów z pierwszym wariantem
+  i przepustowość
+- Zgodność spanów inferencji bf16 z fp32 na rzeczywistym pliku
+
+Ewaluacja triage z linii poleceń:
+    python evaluate.py --triage resources/triage/triage.pkl -i test/in.txt -m resources/model/final-model.pt
+
+Benchmark wariantów modelu (fp32 vs int8):
+    python evaluate.py --benchmark -m resources/model/final-model.pt --quantize int8
+    python evaluate.py --benchmark -m resources/model/final-model.pt --backend onnx
+
+Zgodność bf16 z fp32 (jedna linia pliku = jeden tekst):
+    python evaluate.py --precision-check -i orig_final.txt -m resources/model/final-model.pt
 """
 
 import re
@@ -531,6 +546,241 @@ def evaluate_anonymization(
         return result
 
 
+def evaluate_triage(
+    texts: List[str],
+    tagger,
+    triage,
+    token_budget: Optional[int] = None,
+    rounds: int = 3
+) -> Dict[str, float]:
+    """
+    Mierzy czułość klasyfikatora triage względem modelu i przyspieszenie end-to-end.
+
+    Teksty są anonimizowane (bez reguł i cache, żeby mierzyć sam model)
+    pełnym modelem i z pomijaniem zdań uznanych za czyste. Encje modelu
+    zgubione przez pominięcie zdania obniżają czułość.
+
+    Przed pomiarem jest nieliczony przebieg rozgrzewający, a potem oba
+    warianty są uruchamiane `rounds` razy na przemian (kolejność zmienia się
+    co rundę) - żaden nie korzysta stale z modelu rozgrzanego przez drugi.
+    Raportowana jest mediana czasów.
+
+    Args:
+        texts: Teksty do anonimizacji
+        tagger: Załadowany model NER
+        triage: Klasyfikator (triage.TriageClassifier)
+        token_budget: Budżet tokenów paczki (domyślnie jak w anonymize)
+        rounds: Liczba pomiarów każdego wariantu
+
+    Returns:
+        Dict: entity_recall, text_recall, skip_rate, czasy (ms, mediany) i speedup
+    """
+    import statistics
+    import time
+    from anonymize import DEFAULT_TOKEN_BUDGET, _detect_entities
+
+    if token_budget is None:
+        token_budget = DEFAULT_TOKEN_BUDGET
+
+    # Rozgrzewka - pierwsze wywołania modelu płacą za alokacje i inicjalizację kerneli
+    _detect_entities(texts, tagger, token_budget)
+
+    checked, skipped = triage.checked, triage.skipped
+    times = {False: [], True: []}
+    for round_index in range(max(1, rounds)):
+        for use_triage in ((False, True) if round_index % 2 == 0 else (True, False)):
+            start = time.perf_counter()
+            results = _detect_entities(texts, tagger, token_budget, triage=triage if use_triage else None)
+            times[use_triage].append(time.perf_counter() - start)
+            if use_triage:
+                fast = results
+            else:
+                full = results
+    full_time = statistics.median(times[False])
+    triage_time = statistics.median(times[True])
+    # Udział pominiętych zdań jest taki sam w każdej rundzie - liczony łącznie
+    checked, skipped = triage.checked - checked, triage.skipped - skipped
+
+    def spans(results):
+        return {
+            (i, e['start'], e['end'], e['label'])
+            for i, (entities, _) in enumerate(results) for e in entities
+        }
+
+    full_spans = spans(full)
+    kept_spans = full_spans & spans(fast)
+    texts_with_pii = [i for i, (entities, _) in enumerate(full) if entities]
+    texts_kept = [i for i in texts_with_pii if fast[i][0]]
+
+    return {
+        'entity_recall': len(kept_spans) / len(full_spans) if full_spans else 1.0,
+        'text_recall': len(texts_kept) / len(texts_with_pii) if texts_with_pii else 1.0,
+        'model_entities': len(full_spans),
+        'skip_rate': skipped / checked if checked else 0.0,
+        'full_time_ms': full_time * 1000,
+        'triage_time_ms': triage_time * 1000,
+        'speedup': full_time / triage_time if triage_time > 0 else 0.0,
+    }
+
+
+def evaluate_precision(
+    texts: List[str],
+    tagger,
+    precision: str = 'bf16',
+    token_budget: Optional[int] = None,
+    max_differences: int = 10
+) -> Dict:
+    """
+    Porównuje spany modelu w obniżonej precyzji ze spanami fp32.
+
+    Ten sam tagger anonimizuje teksty dwa razy (bez reguł i cache, żeby
+    porównywać sam model): raz w fp32, raz w `precision`. Spany fp32 są
+    wzorcem dla span_precision/span_recall.
+
+    Args:
+        texts: Teksty do anonimizacji
+        tagger: Załadowany model NER
+        precision: Porównywana precyzja (np. 'bf16')
+        token_budget: Budżet tokenów paczki (domyślnie jak w anonymize)
+        max_differences: Ile różniących się tekstów zwrócić jako przykłady
+
+    Returns:
+        Dict: text_agreement, span_precision, span_recall, czasy (ms),
+        speedup i przykłady różnic (numer linii, spany tylko fp32 / tylko w precision)
+    """
+    import time
+    from anonymize import DEFAULT_TOKEN_BUDGET, _detect_entities, inference_precision
+
+    if token_budget is None:
+        token_budget = DEFAULT_TOKEN_BUDGET
+
+    def run(mode):
+        tagger.inference_precision = mode
+        start = time.perf_counter()
+        results = _detect_entities(texts, tagger, token_budget)
+        elapsed = time.perf_counter() - start
+        return [{(e['start'], e['end'], e['label']) for e in entities} for entities, _ in results], elapsed
+
+    original = inference_precision(tagger)
+    try:
+        reference, reference_time = run('fp32')
+        compared, compared_time = run(precision)
+    finally:
+        tagger.inference_precision = original
+
+    common = sum(len(a & b) for a, b in zip(reference, compared))
+    reference_total = sum(len(a) for a in reference)
+    compared_total = sum(len(b) for b in compared)
+    differences = [
+        (i + 1, sorted(a - b), sorted(b - a))
+        for i, (a, b) in enumerate(zip(reference, compared)) if a != b
+    ]
+
+    return {
+        'precision': precision,
+        'texts': len(texts),
+        'text_agreement': 1.0 - len(differences) / len(texts) if texts else 1.0,
+        'span_precision': common / compared_total if compared_total else 1.0,
+        'span_recall': common / reference_total if reference_total else 1.0,
+        'fp32_spans': reference_total,
+        'fp32_time_ms': reference_time * 1000,
+        'time_ms': compared_time * 1000,
+        'speedup': reference_time / compared_time if compared_time > 0 else 0.0,
+        'differences': differences[:max_differences],
+    }
+
+
+def _bio_tags(sentence, label_type: str = 'ner') -> List[str]:
+    """Zamienia spany zdania Flair na sekwencję tagów BIO (po tokenach)."""
+    tags = ['O'] * len(sentence.tokens)
+    for span in sentence.get_spans(label_type):
+        label = re.sub(r'^[BIES]-', '', span.get_label(label_type).value)
+        for offset, token in enumerate(span.tokens):
+            tags[token.idx - 1] = f"{'B' if offset == 0 else 'I'}-{label}"
+    return tags
+
+
+def benchmark_taggers(
+    variants: Dict[str, object],
+    sentences: List,
+    token_budget: Optional[int] = None
+) -> Dict[str, Dict[str, float]]:
+    """
+    Porównuje warianty modelu na zdaniach z etykietami (np. test z generate_corpus).
+
+    Każdy wariant tagguje świeże kopie zdań (ten sam tekst, bez etykiet)
+    przez anonymize.predict_sentences, a wynik jest porównywany z etykietami
+    wzorcowymi oraz ze spanami pierwszego wariantu (span_agreement - udział
+    zdań z identycznymi spanami i etykietami).
+
+    Args:
+        variants: Nazwa wariantu → załadowany tagger (np. {'fp32': ..., 'int8': ...})
+        sentences: Zdania Flair z etykietami NER
+        token_budget: Budżet tokenów paczki (domyślnie jak w anonymize)
+
+    Returns:
+        Dict[str, Dict[str, float]]: Dla wariantu: f1_micro, precision, recall,
+        span_agreement, time_ms, sentences_per_s, chars_per_s
+    """
+    import time
+    from flair.data import Sentence
+    from anonymize import DEFAULT_TOKEN_BUDGET, predict_sentences
+
+    if token_budget is None:
+        token_budget = DEFAULT_TOKEN_BUDGET
+
+    texts = [sentence.to_original_text() for sentence in sentences]
+    y_true = [_bio_tags(sentence) for sentence in sentences]
+    total_chars = sum(len(text) for text in texts)
+
+    def spans(sentence):
+        return {
+            (span.start_position, span.end_position, span.get_label('ner').value)
+            for span in sentence.get_spans('ner')
+        }
+
+    results = {}
+    baseline_spans = None
+    for name, tagger in variants.items():
+        predicted = [Sentence(text) for text in texts]
+        start = time.perf_counter()
+        predict_sentences(predicted, tagger, token_budget)
+        elapsed = time.perf_counter() - start
+
+        evaluation = evaluate_ner(y_true, [_bio_tags(sentence) for sentence in predicted])
+        predicted_spans = [spans(sentence) for sentence in predicted]
+        if baseline_spans is None:
+            baseline_spans = predicted_spans
+        agreement = sum(a == b for a, b in zip(baseline_spans, predicted_spans))
+        results[name] = {
+            'f1_micro': evaluation.f1_micro,
+            'precision': evaluation.precision_micro,
+            'recall': evaluation.recall_micro,
+            'span_agreement': agreement / len(texts) if texts else 1.0,
+            'time_ms': elapsed * 1000,
+            'sentences_per_s': len(texts) / elapsed if elapsed > 0 else 0.0,
+            'chars_per_s': total_chars / elapsed if elapsed > 0 else 0.0,
+        }
+    return results
+
+
+def print_benchmark(results: Dict[str, Dict[str, float]]):
+    """Wyświetla tabelę benchmarku (różnice względem pierwszego wariantu)."""
+    baseline = next(iter(results.values()))
+    print("=" * 88)
+    print("BENCHMARK WARIANTÓW MODELU")
+    print("=" * 88)
+    print(f"{'Wariant':<16} {'F1':>8} {'ΔF1':>8} {'Zgodn.':>8} {'Czas [ms]':>12} {'Zdań/s':>10} "
+          f"{'Znaków/s':>12} {'Przysp.':>8}")
+    print("-" * 88)
+    for name, r in results.items():
+        speedup = baseline['time_ms'] / r['time_ms'] if r['time_ms'] > 0 else 0.0
+        print(f"{name:<16} {r['f1_micro']:>8.4f} {r['f1_micro'] - baseline['f1_micro']:>+8.4f} "
+              f"{r['span_agreement']:>8.2%} {r['time_ms']:>12.1f} {r['sentences_per_s']:>10.1f} "
+              f"{r['chars_per_s']:>12,.0f} {speedup:>7.2f}x")
+    print("=" * 88)
+
+
 # ============================================================================
 # FUNKCJE POMOCNICZE DO TESTOWANIA
 # ============================================================================
@@ -560,7 +810,123 @@ def quick_evaluate(y_true: List[str], y_pred: List[str]) -> Dict[str, float]:
 # CLI
 # ============================================================================
 
+def _triage_main(args):
+    """CLI: ewaluacja klasyfikatora triage na pliku (jedna linia = jeden tekst)."""
+    from anonymize import load_model
+    from triage import TriageClassifier
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        texts = [line.strip() for line in f if line.strip()]
+    tagger = load_model(args.model)
+    triage = TriageClassifier.load(args.triage, args.recall)
+
+    report = evaluate_triage(texts, tagger, triage)
+    print("=" * 60)
+    print("EWALUACJA TRIAGE")
+    print("=" * 60)
+    print(f"  Próg:                 {triage.threshold:.4f} (docelowa czułość {triage.target_recall:.3f})")
+    print(f"  Czułość (encje):      {report['entity_recall']:.4f} ({report['model_entities']} encji modelu)")
+    print(f"  Czułość (teksty):     {report['text_recall']:.4f}")
+    print(f"  Pominięte zdania:     {report['skip_rate']:.1%}")
+    print(f"  Czas bez triage:      {report['full_time_ms']:.2f} ms (mediana)")
+    print(f"  Czas z triage:        {report['triage_time_ms']:.2f} ms (mediana)")
+    print(f"  Przyspieszenie:       {report['speedup']:.2f}x")
+
+
+def _precision_main(args):
+    """CLI: zgodność spanów bf16 z fp32 na pliku (jedna linia = jeden tekst)."""
+    import json
+    from pathlib import Path
+    from anonymize import load_model
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        texts = [line.strip() for line in f if line.strip()]
+    tagger = load_model(args.model, precision='bf16')
+    if tagger.inference_precision != 'bf16':
+        print("⚠️  Sprzęt nie obsługuje bf16 - porównanie wymusza autocast bf16 (wolniejszy, ale poprawny)")
+
+    report = evaluate_precision(texts, tagger, 'bf16')
+    print("=" * 60)
+    print("ZGODNOŚĆ SPANÓW bf16 vs fp32")
+    print("=" * 60)
+    print(f"  Teksty:               {report['texts']} (spanów fp32: {report['fp32_spans']})")
+    print(f"  Identyczne teksty:    {report['text_agreement']:.2%}")
+    print(f"  Precyzja spanów:      {report['span_precision']:.4f}")
+    print(f"  Czułość spanów:       {report['span_recall']:.4f}")
+    print(f"  Czas fp32:            {report['fp32_time_ms']:.2f} ms")
+    print(f"  Czas bf16:            {report['time_ms']:.2f} ms")
+    print(f"  Przyspieszenie:       {report['speedup']:.2f}x")
+    for line_no, only_fp32, only_bf16 in report['differences']:
+        print(f"  Linia {line_no}: tylko fp32 {only_fp32}, tylko bf16 {only_bf16}")
+
+    report_path = Path(args.model).with_name("precision_check.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(report, input=args.input), f, ensure_ascii=False, indent=2)
+    print(f"✅ Zapisano raport: {report_path}")
+
+
+def _benchmark_main(args):
+    """CLI: benchmark wariantów modelu na zbiorze testowym z generate_corpus."""
+    import json
+    from pathlib import Path
+    from anonymize import load_model
+    from data_generator import generate_corpus
+
+    corpus = generate_corpus(max_sentences=args.max_sentences)
+    sentences = list(corpus.test)
+
+    variants = {'fp32': load_model(args.model)}
+    if args.quantize:
+        variants[args.quantize] = load_model(args.model, args.quantize)
+    if args.backend == 'onnx':
+        variants['onnx'] = load_model(args.model, backend='onnx')
+
+    results = benchmark_taggers(variants, sentences)
+    print_benchmark(results)
+
+    report_path = Path(args.model).with_name("benchmark.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({'test_sentences': len(sentences), 'variants': results}, f, ensure_ascii=False, indent=2)
+    print(f"✅ Zapisano raport: {report_path}")
+
+
 if __name__ == "__main__":
+    import argparse
+    import sys
+    from anonymize import BACKENDS, QUANTIZE_MODES
+
+    parser = argparse.ArgumentParser(description="Ewaluacja modelu NER")
+    parser.add_argument("--triage", help="Klasyfikator triage do ewaluacji względem modelu")
+    parser.add_argument("-i", "--input", help="Plik z tekstami (dla --triage)")
+    parser.add_argument("-m", "--model", default="resources/model/final-model.pt", help="Model NER (dla --triage)")
+    parser.add_argument("--recall", type=float, help="Docelowa czułość triage (domyślnie: z treningu)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Porównaj warianty modelu (F1 na teście z generate_corpus i przepustowość)")
+    parser.add_argument("--quantize", choices=QUANTIZE_MODES, help="Dodaj do benchmarku wariant skwantyzowany")
+    parser.add_argument("--backend", choices=BACKENDS, default="flair",
+                        help="Dodaj do benchmarku wariant z innym backendem (onnx)")
+    parser.add_argument("--precision-check", action="store_true",
+                        help="Porównaj spany bf16 ze spanami fp32 na pliku -i (np. orig_final.txt)")
+    parser.add_argument("--max-sentences", type=int, default=5000,
+                        help="Liczba zdań korpusu dla --benchmark (test to 10%%, domyślnie: 5000)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        _benchmark_main(args)
+        sys.exit(0)
+
+    if args.precision_check:
+        if not args.input:
+            parser.error("--precision-check wymaga -i/--input")
+        _precision_main(args)
+        sys.exit(0)
+
+    if args.triage:
+        if not args.input:
+            parser.error("--triage wymaga -i/--input")
+        _triage_main(args)
+        sys.exit(0)
+
     # Przykład użycia
     print("=" * 60)
     print("PRZYKŁAD EWALUACJI NER")
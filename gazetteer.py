@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+"""
+Słownikowy detektor encji (gazetteer) oparty na automacie Aho-Corasick.
+
+Listy wartości z `data/` (imiona z `data/names.txt`, nazwiska, miasta, firmy,
+szkoły, stanowiska z `data/*/values.txt`) są kompilowane do jednego automatu,
+który przegląda tekst w czasie liniowym - niezależnie od liczby haseł.
+Zbudowany automat jest zapisywany na dysk i przebudowywany tylko wtedy,
+gdy zmienią się pliki źródłowe.
+
+Dopasowanie:
+- bez rozróżniania wielkości liter,
+- z końcówkami fleksyjnymi: hasło jest zapisywane jako temat (bez końcowej
+  samogłoski), a po dopasowaniu tematu akceptowana jest typowa końcówka
+  przypadka (Warszawa → Warszawie, Kowalski → Kowalskiego, Anna → Annę),
+- tylko na granicach słów,
+- dopasowanie, które jest zwykłym słowem z szablonów w `data/` (np. "jak",
+  "dane", "mieszka"), jest odrzucane, gdy wielka litera nie świadczy o nazwie
+  własnej: pisane małą literą, WERSALIKAMI albo na początku zdania lub linii
+  ("Dane osobowe", "DANE"). Szablony to tekst bez danych osobowych, więc
+  dobrze przybliżają słownik słów pospolitych.
+
+Gazetteer może działać jako przebieg o wysokiej czułości przed modelem
+(encje dodawane tam, gdzie model nic nie znalazł) albo jako tania
+alternatywa dla modelu (`anonymize.py --gazetteer only`).
+
+Użycie:
+    from gazetteer import Gazetteer
+
+    gazetteer = Gazetteer.load()
+    entities = gazetteer.scan("Pani Anna Kowalska mieszka w Warszawie.")
+
+    # Porównanie z modelem:
+    python gazetteer.py --benchmark -i test/in.txt -m resources/model/final-model.pt
+"""
+import os
+import pickle
+import re
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DATA_DIR = Path(__file__).parent / "data"
+
+# Domyślne miejsce zapisu skompilowanego automatu
+DEFAULT_CACHE_PATH = Path(__file__).parent / "resources" / "gazetteer" / "automaton.pkl"
+
+# Źródła haseł: (etykieta, plik w data/). Przy powtórzeniu hasła wygrywa wcześniejsze źródło
+GAZETTEER_SOURCES: List[Tuple[str, str]] = [
+    ("COMPANY", "company/values.txt"),
+    ("SCHOOL-NAME", "school-name/values.txt"),
+    ("CITY", "city/values.txt"),
+    ("JOB-TITLE", "job-title/values.txt"),
+    ("SURNAME", "surname/values.txt"),
+    ("NAME", "name/values.txt"),
+    ("NAME", "names.txt"),
+]
+
+# Wersja formatu automatu - zmiana unieważnia zapisany cache
+CACHE_VERSION = 2
+
+# Pliki z szablonami (tekst bez danych osobowych) - źródło słów pospolitych
+TEMPLATE_GLOBS = ["*/templates.txt", "mixed_templates.txt"]
+
+# Minimalna liczba nadań imienia w data/names.txt - rzadsze wpisy to głównie
+# szum (np. "MA", "PAN") dający fałszywe dopasowania
+MIN_NAME_COUNT = 100
+
+# Hasła krótsze niż MIN_ENTRY_LENGTH są pomijane
+MIN_ENTRY_LENGTH = 3
+
+# Minimalna długość tematu, przy której dopuszczane są końcówki fleksyjne
+MIN_STEM_LENGTH = 3
+
+# Pewność przypisywana encjom słownikowym (niższa niż reguł z sumą kontrolną)
+GAZETTEER_CONFIDENCE = 0.5
+
+# Samogłoski obcinane na końcu hasła przy tworzeniu tematu
+STEM_VOWELS = set('aeiouyąęó')
+
+# Końcówki przypadków akceptowane po temacie ('' - forma bez końcówki)
+INFLECTION_ENDINGS = {
+    '', 'a', 'e', 'i', 'o', 'u', 'y', 'ą', 'ę',
+    'ie', 'em', 'om', 'ow', 'ów', 'owi', 'owie', 'ach', 'ami',
+    'iem', 'iego', 'iemu', 'im', 'ich', 'imi',
+    'ej', 'ego', 'emu', 'ym', 'ych', 'ymi',
+    'owa', 'owej', 'ową', 'owy', 'owe', 'owego', 'owym',
+}
+
+
+def _fold(text: str) -> str:
+    """Zamienia tekst na małe litery, zachowując długość (znak po znaku)."""
+    folded = []
+    for ch in text:
+        lower = ch.lower()
+        folded.append(lower if len(lower) == 1 else ch)
+    return ''.join(folded)
+
+
+def _read_entries(data_dir: Path, min_name_count: int) -> Iterable[Tuple[str, str]]:
+    """Czyta hasła (tekst, etykieta) ze źródeł GAZETTEER_SOURCES."""
+    for label, filename in GAZETTEER_SOURCES:
+        filepath = data_dir / filename
+        if not filepath.exists():
+            continue
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                if filename == "names.txt":
+                    # Format: IMIĘ,PŁEĆ,LICZBA_NADAŃ
+                    parts = line.strip().split(',')
+                    if len(parts) < 3 or not parts[2].isdigit() or int(parts[2]) < min_name_count:
+                        continue
+                    entry = parts[0]
+                else:
+                    entry = line
+                entry = ' '.join(entry.split())
+                if len(entry) >= MIN_ENTRY_LENGTH:
+                    yield entry, label
+
+
+def _template_files(data_dir: Path) -> List[Path]:
+    """Zwraca posortowaną listę plików z szablonami."""
+    return sorted(path for pattern in TEMPLATE_GLOBS for path in data_dir.glob(pattern))
+
+
+def _read_common_words(data_dir: Path) -> set:
+    """
+    Zbiera słowa z szablonów (bez placeholderów {tag}) jako słowa pospolite.
+
+    Liczą się tylko słowa występujące w szablonach także małą literą - słowo
+    pisane zawsze wielką (np. imię w przykładowym zdaniu) jest nazwą własną.
+    """
+    words = set()
+    for filepath in _template_files(data_dir):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = re.sub(r'\{[^}]*\}', ' ', line)
+                words.update(_fold(word) for word in re.findall(r'\w+', line) if word[0].islower())
+    return words
+
+
+# Znaki kończące zdanie - następne słowo jest pisane wielką literą niezależnie od tego, czy to nazwa
+SENTENCE_END_CHARS = '.!?…:;'
+
+
+def _starts_sentence(text: str, start: int) -> bool:
+    """Sprawdza, czy słowo na pozycji start otwiera tekst, linię lub zdanie (pomija cudzysłowy i nawiasy)."""
+    i = start - 1
+    while i >= 0 and (text[i] in ' \t"\'„”«»([–—-'):
+        i -= 1
+    return i < 0 or text[i] in '\r\n' or text[i] in SENTENCE_END_CHARS
+
+
+def _source_signature(data_dir: Path, min_name_count: int) -> Tuple:
+    """Sygnatura plików źródłowych (rozmiar i czas modyfikacji) do walidacji cache."""
+    paths = [data_dir / filename for _, filename in GAZETTEER_SOURCES] + _template_files(data_dir)
+    files = []
+    for filepath in paths:
+        if filepath.exists():
+            stat = filepath.stat()
+            files.append((str(filepath.relative_to(data_dir)), stat.st_size, stat.st_mtime_ns))
+    return (CACHE_VERSION, min_name_count, tuple(files))
+
+
+class Gazetteer:
+    """
+    Automat Aho-Corasick nad słownikami encji.
+
+    Węzły trie są przechowywane w listach (przejścia, wiązania porażki,
+    wyjścia), co pozwala zapisać cały automat jednym wywołaniem pickle.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str]], common_words: Optional[set] = None):
+        """
+        Args:
+            entries: Pary (hasło, etykieta)
+            common_words: Słowa pospolite odrzucane, gdy dopasowanie nie wygląda na nazwę
+                własną (mała litera, wersaliki, początek zdania)
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        # (długość klucza, etykieta, czy dopuszczalne końcówki fleksyjne)
+        self._patterns: List[Tuple[int, str, bool]] = []
+        self.common_words = common_words or set()
+        self.signature: Optional[Tuple] = None
+
+        for entry, label in entries:
+            self._add(entry, label)
+        self._build_fail_links()
+
+    def _add(self, entry: str, label: str):
+        """Dodaje hasło do trie (jako temat z otwartą końcówką, jeśli to możliwe)."""
+        key = _fold(entry)
+        # Oboczność ó → o w odmianie (Kraków → Krakowa, Rzeszów → Rzeszowie)
+        if len(key) > MIN_STEM_LENGTH and key[-2] == 'ó' and key[-1].isalpha():
+            self._add_key(key[:-2] + 'o' + key[-1], label)
+        self._add_key(key, label)
+
+    def _add_key(self, key: str, label: str):
+        """Dodaje znormalizowany klucz do trie."""
+        stem = key[:-1] if key[-1] in STEM_VOWELS else key
+        open_ending = len(stem) >= MIN_STEM_LENGTH and stem[-1].isalpha()
+        if open_ending:
+            key = stem
+
+        node = 0
+        for ch in key:
+            child = self._goto[node].get(ch)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][ch] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = child
+
+        # Powtórzone hasło - zostaje pierwsza etykieta
+        if not self._out[node]:
+            self._out[node].append(len(self._patterns))
+            self._patterns.append((len(key), label, open_ending))
+
+    def _build_fail_links(self):
+        """Wyznacza wiązania porażki (BFS) i scala wyjścia sufiksów."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    @property
+    def size(self) -> int:
+        """Liczba haseł w automacie."""
+        return len(self._patterns)
+
+    @classmethod
+    def build(cls, data_dir: Path = DATA_DIR, min_name_count: int = MIN_NAME_COUNT) -> 'Gazetteer':
+        """Buduje automat ze słowników w data_dir."""
+        gazetteer = cls(_read_entries(Path(data_dir), min_name_count), _read_common_words(Path(data_dir)))
+        gazetteer.signature = _source_signature(Path(data_dir), min_name_count)
+        return gazetteer
+
+    @classmethod
+    def load(
+        cls,
+        data_dir: Path = DATA_DIR,
+        cache_path: Optional[Path] = DEFAULT_CACHE_PATH,
+        min_name_count: int = MIN_NAME_COUNT
+    ) -> 'Gazetteer':
+        """
+        Wczytuje automat z cache na dysku lub buduje go (i zapisuje), gdy cache
+        nie istnieje albo pliki źródłowe się zmieniły.
+
+        Args:
+            data_dir: Katalog ze słownikami
+            cache_path: Ścieżka pliku cache (None - bez cache)
+            min_name_count: Minimalna liczba nadań imienia z data/names.txt
+        """
+        signature = _source_signature(Path(data_dir), min_name_count)
+        if cache_path is not None and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    gazetteer = pickle.load(f)
+                if isinstance(gazetteer, cls) and gazetteer.signature == signature:
+                    return gazetteer
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+                pass  # Uszkodzony cache - przebuduj
+
+        gazetteer = cls.build(data_dir, min_name_count)
+        if cache_path is not None:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                pickle.dump(gazetteer, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return gazetteer
+
+    def scan(self, text: str) -> List[Dict]:
+        """
+        Wyszukuje hasła w tekście (jedno przejście automatu).
+
+        Nakładające się dopasowania rozstrzygane są regułą "najdłuższe od lewej".
+
+        Returns:
+            List[Dict]: Encje w formacie anonymize_text (text, label, start,
+            end, confidence), posortowane według pozycji
+        """
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self._patterns
+        n = len(text)
+        candidates: List[Tuple[int, int, str]] = []
+
+        node = 0
+        for i, ch in enumerate(text):
+            lower = ch.lower()
+            if len(lower) != 1:
+                lower = ch
+            while node and lower not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(lower, 0)
+
+            for pattern_id in out[node]:
+                length, label, open_ending = patterns[pattern_id]
+                start = i + 1 - length
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                end = i + 1
+                if open_ending:
+                    suffix_end = end
+                    while suffix_end < n and text[suffix_end].isalpha():
+                        suffix_end += 1
+                    if _fold(text[end:suffix_end]) not in INFLECTION_ENDINGS:
+                        continue
+                    end = suffix_end
+                elif end < n and text[end].isalnum():
+                    continue
+                if _fold(text[start:end]) in self.common_words and (
+                    text[start].islower() or text[start:end].isupper() or _starts_sentence(text, start)
+                ):
+                    continue
+                candidates.append((start, end, label))
+
+        # Najdłuższe od lewej, bez nakładania
+        candidates.sort(key=lambda c: (c[0], c[0] - c[1]))
+        entities = []
+        last_end = 0
+        for start, end, label in candidates:
+            if start < last_end:
+                continue
+            entities.append({
+                'text': text[start:end],
+                'label': label,
+                'start': start,
+                'end': end,
+                'confidence': GAZETTEER_CONFIDENCE,
+            })
+            last_end = end
+        return entities
+
+
+def benchmark(input_path: str, model_path: Optional[str] = None, cache_path: Path = DEFAULT_CACHE_PATH):
+    """
+    Mierzy czas budowy automatu, wczytania z cache i przepustowość skanowania,
+    opcjonalnie porównując ją z modelem NER na tym samym pliku.
+    """
+    with open(input_path, 'r', encoding='utf-8') as f:
+        lines = [line for line in f if line.strip()]
+    total_chars = sum(len(line) for line in lines)
+
+    start_time = time.perf_counter()
+    gazetteer = Gazetteer.build()
+    build_time = time.perf_counter() - start_time
+
+    if cache_path is not None:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'wb') as f:
+            pickle.dump(gazetteer, f, protocol=pickle.HIGHEST_PROTOCOL)
+        start_time = time.perf_counter()
+        Gazetteer.load(cache_path=cache_path)
+        load_time = time.perf_counter() - start_time
+    else:
+        load_time = None
+
+    start_time = time.perf_counter()
+    found = sum(len(gazetteer.scan(line)) for line in lines)
+    scan_time = time.perf_counter() - start_time
+
+    print(f"\n📊 Gazetteer ({gazetteer.size} haseł, {len(gazetteer._goto)} węzłów):")
+    print(f"   • Budowa automatu: {build_time * 1000:.2f} ms")
+    if load_time is not None:
+        print(f"   • Wczytanie z cache: {load_time * 1000:.2f} ms")
+    print(f"   • Skanowanie: {scan_time * 1000:.2f} ms, {found} encji "
+          f"({total_chars / scan_time if scan_time else 0:,.0f} znaków/s)")
+
+    if model_path:
+        from anonymize import load_model, anonymize_texts
+
+        tagger = load_model(model_path)
+        results = anonymize_texts(lines, tagger)
+        model_time = sum(inference_time for _, _, inference_time in results)
+        model_found = sum(len(entities) for _, entities, _ in results)
+        print(f"\n📊 Model NER:")
+        print(f"   • Inferencja: {model_time * 1000:.2f} ms, {model_found} encji "
+              f"({total_chars / model_time if model_time else 0:,.0f} znaków/s)")
+        if scan_time > 0:
+            print(f"   • Gazetteer szybszy {model_time / scan_time:.1f}x")
+
+
+def main():
+    """CLI: wyszukiwanie haseł w tekście lub benchmark."""
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(description="Słownikowy detektor encji (Aho-Corasick)")
+    parser.add_argument("text", nargs="?", help="Tekst do przeszukania")
+    parser.add_argument("-i", "--input", help="Plik wejściowy (dla --benchmark)")
+    parser.add_argument("-m", "--model", help="Model NER do porównania (dla --benchmark)")
+    parser.add_argument("--benchmark", action="store_true", help="Zmierz budowę i przepustowość")
+    parser.add_argument("--rebuild", action="store_true", help="Przebuduj cache automatu")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        if not args.input:
+            parser.error("--benchmark wymaga -i/--input")
+        benchmark(args.input, args.model)
+        return
+
+    if args.rebuild and DEFAULT_CACHE_PATH.exists():
+        DEFAULT_CACHE_PATH.unlink()
+    gazetteer = Gazetteer.load()
+
+    if args.text:
+        text = args.text
+    elif not sys.stdin.isatty():
+        text = sys.stdin.read().strip()
+    else:
+        print(f"Gazetteer gotowy: {gazetteer.size} haseł ({DEFAULT_CACHE_PATH})")
+        return
+
+    print(json.dumps(gazetteer.scan(text), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Przyrostowa anonimizacja dokumentu edytowanego w interfejsie.
+
+Edytor wysyła zmiany po każdym naciśnięciu klawisza. Zamiast anonimizować
+cały dokument od nowa, sesja dzieli tekst na zdania (segmenter.segment_text)
+i pamięta wyniki modelu dla treści każdego zdania - po edycji do modelu
+trafiają tylko zdania, których treść się zmieniła. Klient dostaje różnicę
+listy zdań (usuń `deleteCount` zdań od pozycji `start`, wstaw `segments`),
+a niezmienione zdania zachowują także wcześniej wylosowane wartości
+wypełnienia, więc podgląd nie "miga" przy pisaniu.
+
+Offsety edycji są liczone w punktach kodowych Unicode (indeksy str w Pythonie).
+
+Użycie:
+    from incremental import DocumentSession
+
+    session = DocumentSession()
+    session.apply_edit(0, 0, "Jan Kowalski mieszka w Krakowie.")
+    missing = session.missing_sentences()
+    session.store(missing, anonymize_texts(missing, tagger), filled_texts)
+    diff = session.diff()
+"""
+from typing import Dict, List, Optional, Tuple
+
+from segmenter import segment_text
+
+
+def _common_prefix(old: List[tuple], new: List[tuple]) -> int:
+    length = 0
+    while length < len(old) and length < len(new) and old[length] == new[length]:
+        length += 1
+    return length
+
+
+def _common_suffix(old: List[tuple], new: List[tuple], prefix: int) -> int:
+    length = 0
+    while (length < len(old) - prefix and length < len(new) - prefix
+           and old[-1 - length] == new[-1 - length]):
+        length += 1
+    return length
+
+
+class DocumentSession:
+    """
+    Stan dokumentu jednej sesji edytora: tekst, wyniki modelu dla zdań
+    i lista zdań ostatnio wysłana klientowi.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.model_version: Optional[str] = None
+        # Treść zdania -> (tekst z tagami, encje, tekst wypełniony)
+        self._results: Dict[str, Tuple[str, List[Dict], str]] = {}
+        # Zdania z separatorami w postaci, jaką ma klient
+        self._shown: List[Tuple[str, str]] = []
+        # Po podmianie modelu klient dostaje cały dokument od nowa
+        self._stale = False
+
+    def set_text(self, text: str):
+        """Zastępuje cały tekst dokumentu."""
+        self.text = text
+
+    def apply_edit(self, start: int, end: int, replacement: str):
+        """
+        Zastępuje fragment [start, end) tekstu.
+
+        Raises:
+            ValueError: Gdy zakres wykracza poza tekst
+        """
+        if not 0 <= start <= end <= len(self.text):
+            raise ValueError(f"Nieprawidłowy zakres edycji [{start}, {end}) dla tekstu o długości {len(self.text)}")
+        self.text = self.text[:start] + replacement + self.text[end:]
+
+    def set_model_version(self, version: Optional[str]):
+        """Po podmianie modelu zapamiętane wyniki są nieaktualne - kolejna różnica obejmie cały dokument."""
+        if version != self.model_version:
+            self.model_version = version
+            self._results.clear()
+            self._stale = True
+
+    def _pieces(self) -> Tuple[str, List[Tuple[str, str]]]:
+        """Zwraca odstęp przed pierwszym zdaniem oraz listę (zdanie, odstęp po nim)."""
+        segments = segment_text(self.text)
+        if not segments:
+            return self.text, []
+        lead = self.text[:segments[0][0]]
+        pieces = []
+        for index, (start, end) in enumerate(segments):
+            next_start = segments[index + 1][0] if index + 1 < len(segments) else len(self.text)
+            pieces.append((self.text[start:end], self.text[end:next_start]))
+        return lead, pieces
+
+    def missing_sentences(self) -> List[str]:
+        """Zwraca zdania (bez powtórzeń, w kolejności), dla których brak wyniku modelu."""
+        _, pieces = self._pieces()
+        return list(dict.fromkeys(sentence for sentence, _ in pieces if sentence not in self._results))
+
+    def store(self, sentences: List[str], results: List[Tuple], filled: List[str]):
+        """
+        Zapamiętuje wyniki dla zdań.
+
+        Args:
+            sentences: Zdania z missing_sentences
+            results: Wyniki anonymize_texts dla zdań - (tekst z tagami, encje, czas)
+            filled: Teksty wypełnione (TagFiller) dla zdań
+        """
+        for sentence, (anonymized, entities, _), replaced in zip(sentences, results, filled):
+            self._results[sentence] = (anonymized, entities, replaced)
+
+    def diff(self) -> Dict:
+        """
+        Zwraca różnicę względem stanu klienta i zapamiętuje nowy stan.
+
+        Returns:
+            Dict: lead (odstęp przed pierwszym zdaniem), start, deleteCount
+            i segments - nowe zdania (text, separator, anonymizedText,
+            replacedText, spans z offsetami względem początku zdania)
+        """
+        lead, pieces = self._pieces()
+        if self._stale:
+            prefix = suffix = 0
+        else:
+            prefix = _common_prefix(self._shown, pieces)
+            suffix = _common_suffix(self._shown, pieces, prefix)
+        changed = pieces[prefix:len(pieces) - suffix]
+
+        segments = []
+        for sentence, separator in changed:
+            anonymized, entities, replaced = self._results[sentence]
+            segments.append({
+                'text': sentence,
+                'separator': separator,
+                'anonymizedText': anonymized,
+                'replacedText': replaced,
+                'spans': [
+                    {'start': e['start'], 'end': e['end'], 'label': e['label'], 'text': e['text'],
+                     'confidence': e['confidence']}
+                    for e in entities
+                ],
+            })
+        diff = {
+            'lead': lead,
+            'start': prefix,
+            'deleteCount': len(self._shown) - prefix - suffix,
+            'segments': segments,
+        }
+
+        self._shown = pieces
+        self._stale = False
+        # Wyniki tylko dla zdań obecnych w dokumencie - pamięć sesji nie rośnie z historią edycji
+        current = {sentence for sentence, _ in pieces}
+        self._results = {sentence: result for sentence, result in self._results.items() if sentence in current}
+        return diff
@@ -12,11 +12,18 @@ from flair.data import Sentence
 from flair.models import SequenceTagger
 
 import config
+from anonymize import predict_sentences, resolve_precision, rewrite_spans
+from slim_model import is_slim_checkpoint, load_slim
 
 
-def _load_model(model_path: Optional[str] = None) -> SequenceTagger:
+def _load_model(model_path: Optional[str] = None, precision: str = 'fp32') -> SequenceTagger:
     """
     Ładuje model Flair. Jeśli model_path == None, próbuje kilku domyślnych nazw.
+    Katalog modelu slim (slim_model.py) jest wczytywany bez SequenceTagger.load.
+
+    Args:
+        model_path: ścieżka do modelu (.pt lub katalog modelu slim)
+        precision: precyzja inferencji ('fp32', 'bf16' lub 'auto' - bf16 gdy sprzęt je obsługuje)
 
     Returns:
         załadowany SequenceTagger
@@ -34,7 +41,11 @@ def _load_model(model_path: Optional[str] = None) -> SequenceTagger:
         if model_path is None:
             raise FileNotFoundError(f"Nie znaleziono modelu w {config.MODEL_DIR}. Proszę wytrenować model najpierw.")
 
-    tagger = SequenceTagger.load(model_path)
+    if is_slim_checkpoint(model_path):
+        tagger = load_slim(model_path)
+    else:
+        tagger = SequenceTagger.load(model_path)
+    tagger.inference_precision = resolve_precision(precision)
     return tagger
 
 
@@ -54,36 +65,18 @@ def anonymize(text: str, tagger: Optional[SequenceTagger] = None) -> str:
         tagger = _load_model()
 
     sentence = Sentence(text)
-    tagger.predict(sentence)
-
-    # Zbuduj mapa start_index -> (end_index, label)
-    spans = sentence.get_spans(config.TAG_TYPE)
-    start_map = {}
-    for span in spans:
-        # span.tokens[0].idx jest indeksem tokenu (1-based)
-        start_idx = span.tokens[0].idx - 1
-        end_idx = span.tokens[-1].idx - 1
-        # etykieta może mieć format B-LABEL lub LABEL — bierzemy ostatnią część
-        label = span.get_label(config.TAG_TYPE).value
-        # usuń prefiksy B-/I- jeśli istnieją
-        label = re.sub(r'^[BI]-', '', label)
-        start_map[start_idx] = (end_idx, label)
-
-    tokens = [t.text for t in sentence.tokens]
-    out_tokens = []
-    i = 0
-    while i < len(tokens):
-        if i in start_map:
-            end_idx, label = start_map[i]
-            tag = config.ANONYMIZE_TAGS.get(label, "{anon}")
-            out_tokens.append(tag)
-            i = end_idx + 1
-        else:
-            out_tokens.append(tokens[i])
-            i += 1
-
-    # Złącz z pojedynczą spacją — dla prostoty
-    return " ".join(out_tokens)
+    # Zdania dłuższe niż okno transformera są przetwarzane nakładającymi się oknami
+    predict_sentences([sentence], tagger)
+
+    # Podmień fragmenty po offsetach znakowych - odstępy i nowe linie zostają jak w oryginale
+    replacements = []
+    for span in sentence.get_spans(config.TAG_TYPE):
+        # etykieta może mieć format B-LABEL lub LABEL — usuń prefiksy B-/I-
+        label = re.sub(r'^[BI]-', '', span.get_label(config.TAG_TYPE).value)
+        tag = config.ANONYMIZE_TAGS.get(label, "{anon}")
+        replacements.append((span.start_position, span.end_position, tag))
+
+    return rewrite_spans(text, replacements)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+Asynchroniczne zadania anonimizacji dużych zbiorów dokumentów (backfill).
+
+Archiwa dziesiątek tysięcy dokumentów nie mieszczą się w czasie jednego
+żądania HTTP. Zadanie (plik lub lista tekstów) jest zapisywane na dysk
+i kolejkowane w lokalnej bazie sqlite, a JobRunner przetwarza je w tle
+wsadową ścieżką anonymize_file. Po każdej porcji pliku w bazie zapisywany
+jest punkt kontrolny, więc po restarcie procesu przerwane zadanie wraca do
+kolejki i jest wznawiane od ostatniej zapisanej porcji.
+
+Układ katalogu zadań:
+    <jobs_dir>/jobs.sqlite      - stan zadań
+    <jobs_dir>/<id>/input.txt   - wejście
+    <jobs_dir>/<id>/output.txt  - wynik (tekst z tagami)
+    <jobs_dir>/<id>/texts.json  - liczba linii każdego tekstu (zadania z listy tekstów)
+
+Użycie (przez endpoint.py):
+    POST /jobs {"texts": [...]} lub POST /jobs/upload (plik) -> id zadania
+    GET /jobs/<id>                                         -> status i postęp
+    GET /jobs/<id>/result                                  -> wynik
+
+    from jobs import JobStore, JobRunner
+
+    store = JobStore("resources/jobs")
+    job_id = store.create_from_texts(["Jan Kowalski", "Anna Nowak"])
+    runner = JobRunner(store, lambda: tagger)
+    runner.start()
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Optional
+
+from anonymize import DEFAULT_TOKEN_BUDGET, anonymize_file
+
+# Domyślny katalog zadań
+DEFAULT_JOBS_DIR = "resources/jobs"
+JOBS_DB_FILE = "jobs.sqlite"
+
+# Statusy zadań
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# Rodzaje zadań
+KIND_FILE = 'file'
+KIND_TEXTS = 'texts'
+
+
+class _JobInterrupted(Exception):
+    """Przetwarzanie przerwane przez zatrzymanie JobRunnera (zadanie wraca do kolejki)."""
+
+
+class JobStore:
+    """
+    Trwały stan zadań (sqlite) i ich pliki.
+
+    Połączenie jest współdzielone przez wątki (pętla zdarzeń API i workery
+    JobRunnera) i chronione blokadą - zapytania są krótkie.
+    """
+
+    def __init__(self, jobs_dir: str = DEFAULT_JOBS_DIR):
+        """
+        Args:
+            jobs_dir: Katalog na bazę zadań oraz pliki wejściowe i wynikowe
+        """
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.jobs_dir / JOBS_DB_FILE), timeout=30, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+            "created REAL NOT NULL, updated REAL NOT NULL, total_bytes INTEGER NOT NULL, "
+            "checkpoint TEXT, stats TEXT, error TEXT)"
+        )
+        self._db.commit()
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.jobs_dir / job_id
+
+    def input_path(self, job_id: str) -> Path:
+        return self.job_dir(job_id) / "input.txt"
+
+    def output_path(self, job_id: str) -> Path:
+        return self.job_dir(job_id) / "output.txt"
+
+    def _new_job_dir(self) -> str:
+        job_id = uuid.uuid4().hex
+        self.job_dir(job_id).mkdir(parents=True)
+        return job_id
+
+    def _enqueue(self, job_id: str, kind: str) -> str:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, status, created, updated, total_bytes) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, now, now, os.path.getsize(self.input_path(job_id)))
+            )
+            self._db.commit()
+        return job_id
+
+    def create_from_file(self, source: BinaryIO) -> str:
+        """
+        Tworzy zadanie z pliku tekstowego UTF-8 (kopiowanego porcjami do katalogu zadania).
+
+        Returns:
+            str: Identyfikator zadania
+        """
+        job_id = self._new_job_dir()
+        with open(self.input_path(job_id), 'wb') as f:
+            shutil.copyfileobj(source, f, 1 << 20)
+        return self._enqueue(job_id, KIND_FILE)
+
+    def create_from_texts(self, texts: List[str]) -> str:
+        """
+        Tworzy zadanie z listy tekstów.
+
+        Teksty są zapisywane kolejno, każdy zakończony znakiem nowej linii;
+        liczba linii każdego tekstu pozwala odtworzyć listę wyników.
+
+        Returns:
+            str: Identyfikator zadania
+        """
+        job_id = self._new_job_dir()
+        with open(self.input_path(job_id), 'w', encoding='utf-8', newline='') as f:
+            for text in texts:
+                f.write(text + '\n')
+        with open(self.job_dir(job_id) / "texts.json", 'w', encoding='utf-8') as f:
+            json.dump([text.count('\n') + 1 for text in texts], f)
+        return self._enqueue(job_id, KIND_TEXTS)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Zwraca stan zadania (None, gdy nie istnieje).
+
+        Returns:
+            Optional[Dict]: id, kind, status, created, updated, total_bytes,
+            processed_bytes, stats (po zakończeniu), error (po błędzie)
+        """
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._as_dict(row) if row is not None else None
+
+    def _as_dict(self, row: sqlite3.Row) -> Dict:
+        checkpoint = json.loads(row['checkpoint']) if row['checkpoint'] else None
+        processed = row['total_bytes'] if row['status'] == DONE else (checkpoint or {}).get('input_offset', 0)
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'created': row['created'],
+            'updated': row['updated'],
+            'total_bytes': row['total_bytes'],
+            'processed_bytes': processed,
+            'checkpoint': checkpoint,
+            'stats': json.loads(row['stats']) if row['stats'] else None,
+            'error': row['error'],
+        }
+
+    def claim_next(self) -> Optional[Dict]:
+        """Oznacza najstarsze oczekujące zadanie jako przetwarzane i je zwraca (None, gdy kolejka pusta)."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE jobs SET status = ?, updated = ? WHERE id = ?", (RUNNING, time.time(), row['id'])
+            )
+            self._db.commit()
+        job = self._as_dict(row)
+        job['status'] = RUNNING
+        return job
+
+    def _update(self, job_id: str, **fields):
+        fields['updated'] = time.time()
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self._db.commit()
+
+    def save_checkpoint(self, job_id: str, checkpoint: Dict):
+        """Zapisuje punkt kontrolny anonymize_file (postęp zadania)."""
+        self._update(job_id, checkpoint=json.dumps(checkpoint, ensure_ascii=False))
+
+    def finish(self, job_id: str, stats: Dict):
+        self._update(job_id, status=DONE, stats=json.dumps(stats, ensure_ascii=False))
+
+    def fail(self, job_id: str, error: str):
+        self._update(job_id, status=FAILED, error=error)
+
+    def requeue(self, job_id: str):
+        self._update(job_id, status=QUEUED)
+
+    def requeue_interrupted(self) -> int:
+        """
+        Przywraca do kolejki zadania przerwane restartem procesu (status running).
+
+        Returns:
+            int: Liczba przywróconych zadań
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, updated = ? WHERE status = ?", (QUEUED, time.time(), RUNNING)
+            )
+            self._db.commit()
+        return cursor.rowcount
+
+    def text_results(self, job_id: str) -> List[str]:
+        """Zwraca wyniki zadania z listy tekstów (teksty z tagami w kolejności wejściowej)."""
+        with open(self.job_dir(job_id) / "texts.json", 'r', encoding='utf-8') as f:
+            line_counts = json.load(f)
+        results = []
+        # anonymize_file dzieli linie tylko na '\n' - samotne '\r' jest częścią tekstu,
+        # więc readline nie może go traktować jako końca linii (newline='' by tak robiło)
+        with open(self.output_path(job_id), 'r', encoding='utf-8', newline='\n') as f:
+            for count in line_counts:
+                lines = [f.readline() for _ in range(count)]
+                results.append(''.join(lines)[:-1])
+        return results
+
+
+class JobRunner:
+    """
+    Wątki w tle przetwarzające zadania z JobStore przez anonymize_file.
+
+    Przy starcie zadania przerwane poprzednim zamknięciem procesu wracają do
+    kolejki; stop() przerywa bieżące zadania po zapisaniu porcji i również
+    odkłada je do kolejki.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        get_tagger: Callable[[], object],
+        workers: int = 1,
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+        poll_interval: float = 1.0
+    ):
+        """
+        Args:
+            store: Magazyn zadań
+            get_tagger: Funkcja zwracająca bieżący model (wywoływana przy starcie
+                każdego zadania - po podmianie modelu nowe zadania używają nowego)
+            workers: Liczba wątków przetwarzających zadania
+            token_budget: Budżet tokenów paczki inferencji
+            poll_interval: Co ile sekund sprawdzać kolejkę (zadania z innych procesów)
+        """
+        self.store = store
+        self.get_tagger = get_tagger
+        self.workers = workers
+        self.token_budget = token_budget
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        """Przywraca przerwane zadania do kolejki i uruchamia wątki."""
+        requeued = self.store.requeue_interrupted()
+        if requeued:
+            print(f"⚙️  Wznowiono przerwane zadania: {requeued}")
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-runner-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def notify(self):
+        """Budzi wątki po dodaniu zadania (bez czekania na kolejne sprawdzenie kolejki)."""
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Zatrzymuje wątki; bieżące zadania wracają do kolejki po zapisaniu porcji."""
+        self._stopping = True
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping:
+            job = self.store.claim_next()
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._process(job)
+
+    def _checkpoint(self, job_id: str, checkpoint: Dict):
+        self.store.save_checkpoint(job_id, checkpoint)
+        if self._stopping:
+            raise _JobInterrupted()
+
+    def _process(self, job: Dict):
+        job_id = job['id']
+        try:
+            stats = anonymize_file(
+                str(self.store.input_path(job_id)),
+                str(self.store.output_path(job_id)),
+                self.get_tagger(),
+                show_stats=False,
+                token_budget=self.token_budget,
+                resume=job['checkpoint'],
+                on_checkpoint=lambda checkpoint: self._checkpoint(job_id, checkpoint)
+            )
+        except _JobInterrupted:
+            self.store.requeue(job_id)
+            return
+        except Exception as error:
+            print(f"❌ Zadanie {job_id} nie powiodło się: {error}")
+            self.store.fail(job_id, f"{type(error).__name__}: {error}")
+            return
+        self.store.finish(job_id, stats)
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+Backend ONNX Runtime dla taggera NER (bez SequenceTagger.predict).
+
+Eksport dzieli wytrenowany SequenceTagger na dwa grafy ONNX:
+- encoder.onnx - transformer (input_ids, attention_mask → stany ukryte
+  wybranych warstw, jak w TransformerWordEmbeddings),
+- head.onnx - reprojekcja embeddingów, BiLSTM i warstwa liniowa
+  (embeddingi tokenów → emisje dla każdego tagu).
+
+Pooling subwordów na tokeny (first/last/mean/first_last) oraz dekodowanie
+CRF (Viterbi na emisjach i macierzy przejść) są liczone w NumPy, a spany
+składane tak samo jak w Flair (get_spans_from_bio), więc wynik odpowiada
+backendowi Flair. Graf enkodera widzi tylko tokeny zdania, więc modele
+z kontekstem dokumentu (context_length > 0) nie są eksportowane.
+
+Eksport (wymaga torch, flair, onnx):
+    python onnx_backend.py -m resources/model/final-model.pt
+
+Użycie (wymaga onnxruntime, numpy, transformers):
+    python anonymize.py -i input.txt --backend onnx
+
+    from onnx_backend import OnnxTagger
+    tagger = OnnxTagger.load("resources/model/final-model.onnx")
+"""
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Wersja ONNX opset używana przy eksporcie
+ONNX_OPSET = 14
+
+# Nazwy plików w katalogu eksportu
+ENCODER_FILE = "encoder.onnx"
+HEAD_FILE = "head.onnx"
+CRF_FILE = "crf.npz"
+CONFIG_FILE = "config.json"
+TOKENIZER_DIR = "tokenizer"
+
+
+def onnx_dir_for(model_path: str) -> Path:
+    """Zwraca katalog eksportu ONNX dla modelu (obok oryginału, np. final-model.onnx/)."""
+    path = Path(model_path)
+    return path.with_name(f"{path.stem}.onnx")
+
+
+def _parse_layers(layers, num_hidden_layers: int) -> List[int]:
+    """Zamienia specyfikację warstw Flair ('-1', '-1,-2', 'all') na indeksy hidden_states."""
+    if isinstance(layers, (list, tuple)):
+        return [int(layer) for layer in layers]
+    if layers == 'all':
+        return list(range(num_hidden_layers + 1))
+    return [int(layer) for layer in str(layers).split(',')]
+
+
+def _context_length(embedding) -> int:
+    """Zwraca największe context_length embeddingu lub któregokolwiek z embeddingów w nim zagnieżdżonych."""
+    lengths = [getattr(embedding, 'context_length', 0) or 0]
+    for inner in getattr(embedding, 'embeddings', None) or []:
+        lengths.append(_context_length(inner))
+    return max(lengths)
+
+
+def export_onnx(model_path: str, output_dir: Path = None) -> Path:
+    """
+    Eksportuje SequenceTagger do katalogu z grafami ONNX.
+
+    Args:
+        model_path: Ścieżka do modelu Flair (.pt)
+        output_dir: Katalog docelowy (domyślnie: onnx_dir_for(model_path))
+
+    Returns:
+        Path: Katalog eksportu
+
+    Raises:
+        ValueError: Gdy model używa embeddingów innych niż jeden transformer
+            lub embeddingów z kontekstem dokumentu (context_length > 0)
+    """
+    import torch
+    from flair.models import SequenceTagger
+
+    output_dir = Path(output_dir) if output_dir is not None else onnx_dir_for(model_path)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    tagger = SequenceTagger.load(model_path)
+    tagger.to(torch.device('cpu'))
+    tagger.eval()
+
+    embedding = tagger.embeddings
+    context_length = _context_length(embedding)
+    if context_length > 0:
+        raise ValueError(
+            f"Eksport ONNX nie obsługuje embeddingów z kontekstem dokumentu (context_length={context_length}) - "
+            "enkoder widzi tylko tokeny zdania, więc wynik różniłby się od backendu Flair"
+        )
+    if not (hasattr(embedding, 'model') and hasattr(embedding, 'tokenizer')):
+        raise ValueError("Eksport ONNX obsługuje tylko taggery z pojedynczym TransformerWordEmbeddings")
+
+    layer_indexes = _parse_layers(
+        getattr(embedding, 'layer_indexes', None) or getattr(embedding, 'layers', '-1'),
+        embedding.model.config.num_hidden_layers
+    )
+    layer_mean = bool(getattr(embedding, 'layer_mean', True))
+
+    class Encoder(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            hidden = self.model(
+                input_ids=input_ids, attention_mask=attention_mask, output_hidden_states=True
+            ).hidden_states
+            layers = [hidden[i] for i in layer_indexes]
+            if layer_mean:
+                return torch.stack(layers).mean(dim=0)
+            return torch.cat(layers, dim=-1)
+
+    class Head(torch.nn.Module):
+        def __init__(self, tagger):
+            super().__init__()
+            self.tagger = tagger
+
+        def forward(self, embeddings):
+            x = embeddings
+            if self.tagger.reproject_embeddings:
+                x = self.tagger.embedding2nn(x)
+            if self.tagger.use_rnn:
+                x, _ = self.tagger.rnn(x)
+            return self.tagger.linear(x)
+
+    # Przykładowe wejścia do śledzenia grafu
+    example = embedding.tokenizer(
+        [["Jan", "Kowalski", "mieszka", "w", "Warszawie", "."]],
+        is_split_into_words=True, return_tensors='pt'
+    )
+    with torch.no_grad():
+        encoder = Encoder(embedding.model).eval()
+        torch.onnx.export(
+            encoder, (example['input_ids'], example['attention_mask']), str(output_dir / ENCODER_FILE),
+            input_names=['input_ids', 'attention_mask'], output_names=['hidden'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'subwords'},
+                'attention_mask': {0: 'batch', 1: 'subwords'},
+                'hidden': {0: 'batch', 1: 'subwords'},
+            },
+            opset_version=ONNX_OPSET,
+        )
+        hidden_size = encoder(example['input_ids'], example['attention_mask']).shape[-1]
+        if getattr(embedding, 'subtoken_pooling', 'first') == 'first_last':
+            hidden_size *= 2
+
+        head = Head(tagger).eval()
+        torch.onnx.export(
+            head, (torch.zeros(1, 6, hidden_size),), str(output_dir / HEAD_FILE),
+            input_names=['embeddings'], output_names=['emissions'],
+            dynamic_axes={'embeddings': {1: 'tokens'}, 'emissions': {1: 'tokens'}},
+            opset_version=ONNX_OPSET,
+        )
+
+    tags = tagger.label_dictionary.get_items()
+    crf = {}
+    if tagger.use_crf:
+        crf = {
+            'transitions': tagger.crf.transitions.detach().cpu().numpy(),
+            'start': np.array(tagger.label_dictionary.get_idx_for_item('<START>')),
+            'stop': np.array(tagger.label_dictionary.get_idx_for_item('<STOP>')),
+        }
+    np.savez(output_dir / CRF_FILE, **crf)
+
+    embedding.tokenizer.save_pretrained(str(output_dir / TOKENIZER_DIR))
+    config = {
+        'tags': tags,
+        'tag_type': tagger.tag_type,
+        'use_crf': bool(tagger.use_crf),
+        'subtoken_pooling': getattr(embedding, 'subtoken_pooling', 'first'),
+        'source_model': str(model_path),
+    }
+    with open(output_dir / CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+    return output_dir
+
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def viterbi_decode(
+    emissions: np.ndarray,
+    transitions: np.ndarray,
+    start: int,
+    stop: int
+) -> Tuple[List[int], List[float]]:
+    """
+    Dekoduje najlepszą ścieżkę tagów CRF (konwencja Flair: transitions[do, z]).
+
+    Args:
+        emissions: Emisje [tokeny, tagi]
+        transitions: Macierz przejść [tagi, tagi]
+        start: Indeks tagu <START>
+        stop: Indeks tagu <STOP>
+
+    Returns:
+        Tuple[List[int], List[float]]: Indeksy tagów i pewność każdego tokenu
+    """
+    length = emissions.shape[0]
+    scores = np.empty_like(emissions)
+    backpointers = np.zeros(emissions.shape, dtype=np.int64)
+
+    scores[0] = emissions[0] + transitions[:, start]
+    for t in range(1, length):
+        # candidates[do, z] = wynik dotychczasowy dla "z" + przejście z → do
+        candidates = scores[t - 1][np.newaxis, :] + transitions
+        backpointers[t] = candidates.argmax(axis=1)
+        scores[t] = candidates.max(axis=1) + emissions[t]
+
+    final = scores[-1] + transitions[stop]
+    best = [int(final.argmax())]
+    for t in range(length - 1, 0, -1):
+        best.append(int(backpointers[t, best[-1]]))
+    best.reverse()
+
+    confidences = _softmax(scores)
+    return best, [float(confidences[t, tag]) for t, tag in enumerate(best)]
+
+
+def spans_from_bio(tags: List[str], scores: List[float]) -> List[Tuple[int, int, str, float]]:
+    """
+    Składa spany z tagów BIO/BIOES tak jak flair (get_spans_from_bio).
+
+    Returns:
+        List[Tuple[int, int, str, float]]: (pierwszy token, ostatni token,
+        etykieta, średnia pewność tokenów)
+    """
+    spans = []
+    current: List[int] = []
+    current_scores: List[float] = []
+    weights: Dict[str, float] = {}
+    previous = "O-"
+
+    def close():
+        label = max(weights, key=weights.get)
+        spans.append((current[0], current[-1], label, sum(current_scores) / len(current_scores)))
+
+    for idx, tag in enumerate(tags):
+        if tag in ('', 'O', '_'):
+            tag = "O-"
+        in_span = tag != "O-"
+        starts_new_span = tag[0:2] in ('B-', 'S-') or (in_span and previous[2:] != tag[2:])
+        if (starts_new_span or not in_span) and current:
+            close()
+            current, current_scores, weights = [], [], {}
+        if in_span:
+            current.append(idx)
+            current_scores.append(scores[idx])
+            weights[tag[2:]] = weights.get(tag[2:], 0.0) + (1.1 if starts_new_span else 1.0)
+        previous = tag
+    if current:
+        close()
+    return spans
+
+
+class OnnxTagger:
+    """
+    Tagger NER na ONNX Runtime z interfejsem predict() jak SequenceTagger.
+
+    Atrybut `embeddings.tokenizer` udostępnia tokenizer transformera, więc
+    anonymize.predict_sentences liczy budżety tokenów i okna tak samo jak
+    dla modelu Flair.
+    """
+
+    def __init__(self, export_dir: Path, threads: int = 0):
+        """
+        Args:
+            export_dir: Katalog utworzony przez export_onnx
+            threads: Liczba wątków ONNX Runtime (0 - domyślnie)
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        export_dir = Path(export_dir)
+        with open(export_dir / CONFIG_FILE, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        self.tags: List[str] = config['tags']
+        self.tag_type: str = config['tag_type']
+        self.use_crf: bool = config['use_crf']
+        self.subtoken_pooling: str = config['subtoken_pooling']
+
+        crf = np.load(export_dir / CRF_FILE)
+        if self.use_crf:
+            self.transitions = crf['transitions']
+            self.start = int(crf['start'])
+            self.stop = int(crf['stop'])
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        providers = ['CPUExecutionProvider']
+        self.encoder = ort.InferenceSession(str(export_dir / ENCODER_FILE), options, providers=providers)
+        self.head = ort.InferenceSession(str(export_dir / HEAD_FILE), options, providers=providers)
+
+        tokenizer = AutoTokenizer.from_pretrained(str(export_dir / TOKENIZER_DIR))
+        self.embeddings = SimpleNamespace(tokenizer=tokenizer)
+
+    @classmethod
+    def load(cls, export_dir: Path, threads: int = 0) -> "OnnxTagger":
+        """Wczytuje wyeksportowany model."""
+        return cls(export_dir, threads)
+
+    def _pool(self, hidden: np.ndarray, positions: List[List[int]]) -> np.ndarray:
+        """Łączy stany subwordów w embeddingi tokenów (pooling jak w Flair)."""
+        width = hidden.shape[-1] * (2 if self.subtoken_pooling == 'first_last' else 1)
+        pooled = np.zeros((len(positions), width), dtype=hidden.dtype)
+        for i, subwords in enumerate(positions):
+            if not subwords:
+                continue
+            if self.subtoken_pooling == 'last':
+                pooled[i] = hidden[subwords[-1]]
+            elif self.subtoken_pooling == 'mean':
+                pooled[i] = hidden[subwords].mean(axis=0)
+            elif self.subtoken_pooling == 'first_last':
+                pooled[i] = np.concatenate([hidden[subwords[0]], hidden[subwords[-1]]])
+            else:
+                pooled[i] = hidden[subwords[0]]
+        return pooled
+
+    def _decode(self, emissions: np.ndarray) -> Tuple[List[str], List[float]]:
+        """Zamienia emisje zdania na tagi i ich pewności."""
+        if self.use_crf:
+            indices, scores = viterbi_decode(emissions, self.transitions, self.start, self.stop)
+        else:
+            probabilities = _softmax(emissions)
+            indices = [int(i) for i in probabilities.argmax(axis=-1)]
+            scores = [float(probabilities[t, i]) for t, i in enumerate(indices)]
+        return [self.tags[i] for i in indices], scores
+
+    def predict(self, sentences, mini_batch_size: int = 32, **kwargs):
+        """Przewiduje etykiety NER i dodaje spany do zdań Flair (w miejscu)."""
+        if not isinstance(sentences, list):
+            sentences = [sentences]
+        for first in range(0, len(sentences), mini_batch_size):
+            batch = [s for s in sentences[first:first + mini_batch_size] if len(s) > 0]
+            if batch:
+                self._predict_batch(batch)
+
+    def _predict_batch(self, batch):
+        encoded = self.embeddings.tokenizer(
+            [[token.text for token in sentence.tokens] for sentence in batch],
+            is_split_into_words=True, padding=True, return_tensors='np'
+        )
+        hidden = self.encoder.run(None, {
+            'input_ids': encoded['input_ids'].astype(np.int64),
+            'attention_mask': encoded['attention_mask'].astype(np.int64),
+        })[0]
+
+        for b, sentence in enumerate(batch):
+            positions: List[List[int]] = [[] for _ in sentence.tokens]
+            for subword, word in enumerate(encoded.word_ids(b)):
+                if word is not None:
+                    positions[word].append(subword)
+            embeddings = self._pool(hidden[b], positions)[np.newaxis].astype(np.float32)
+            emissions = self.head.run(None, {'embeddings': embeddings})[0][0]
+
+            tags, scores = self._decode(emissions)
+            sentence.remove_labels(self.tag_type)
+            for first, last, label, score in spans_from_bio(tags, scores):
+                sentence[first:last + 1].add_label(self.tag_type, label, score)
+
+
+def main():
+    """CLI: eksport modelu Flair do ONNX."""
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Eksport taggera NER do ONNX Runtime")
+    parser.add_argument("-m", "--model", default="resources/model/final-model.pt", help="Model Flair (.pt)")
+    parser.add_argument("-o", "--output", help="Katalog eksportu (domyślnie: obok modelu, *.onnx/)")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    output_dir = export_onnx(args.model, Path(args.output) if args.output else None)
+    print(f"✅ Wyeksportowano model do: {output_dir} ({time.perf_counter() - start_time:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+"""
+Serwowanie API w modelu pre-fork ze współdzielonymi wagami modelu.
+
+uvicorn --workers N uruchamia N niezależnych procesów i każdy ładuje własną
+kopię HerBERT-a, kandydatów TagFiller i słowników Morfeusza. Tutaj proces
+główny ładuje model i filler raz, zamraża obiekty dla GC (gc.freeze), otwiera
+gniazdo nasłuchujące i dopiero wtedy forkuje workery. Strony pamięci z wagami
+są współdzielone copy-on-write - inferencja ich nie modyfikuje, więc pamięć
+węzła rośnie z liczbą workerów tylko o prywatne bufory aktywacji.
+
+Uruchomienie (przez endpoint.py):
+    python endpoint.py --workers 4
+
+Podmiana modelu we wszystkich workerach (bez restartu):
+    kill -HUP <PID główny>
+
+Po SIGHUP proces główny ładuje i rozgrzewa nową wersję modelu, a następnie
+wymienia workery po jednym - nowe są forkowane z nowego obrazu, więc wagi
+nadal są współdzielone (w trakcie wymiany w pamięci są najwyżej dwie
+wersje modelu, a nie osobna kopia w każdym workerze).
+
+Benchmark pamięci (RSS/PSS na workera dla różnej liczby workerów):
+    python prefork.py --benchmark --workers 1 2 4
+"""
+import gc
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+# Deskryptor, przez który worker zgłasza gotowość procesowi głównemu (notify_ready)
+READY_FD_ENV = 'PREFORK_READY_FD'
+# Co ile sekund proces główny sprawdza workery i żądanie podmiany modelu
+POLL_INTERVAL_S = 0.2
+# Maks. czas na zakończenie obsługiwanych żądań przez wymieniany worker
+WORKER_STOP_TIMEOUT_S = 30.0
+# Maks. czas na gotowość nowego workera przy wymianie
+WORKER_READY_TIMEOUT_S = 300.0
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    """Otwiera gniazdo nasłuchujące współdzielone przez workery."""
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def memory_usage(pid: int) -> Dict[str, float]:
+    """
+    Zwraca zużycie pamięci procesu (Linux, /proc/<pid>/smaps_rollup).
+
+    Returns:
+        Dict[str, float]: rss_mb, pss_mb (RSS z podziałem stron współdzielonych
+        między procesy), shared_mb, private_mb
+    """
+    fields = {'Rss': 0, 'Pss': 0, 'Shared_Clean': 0, 'Shared_Dirty': 0, 'Private_Clean': 0, 'Private_Dirty': 0}
+    with open(f"/proc/{pid}/smaps_rollup", 'r') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in fields:
+                fields[name] = int(value.split()[0])
+    return {
+        'rss_mb': fields['Rss'] / 1024,
+        'pss_mb': fields['Pss'] / 1024,
+        'shared_mb': (fields['Shared_Clean'] + fields['Shared_Dirty']) / 1024,
+        'private_mb': (fields['Private_Clean'] + fields['Private_Dirty']) / 1024,
+    }
+
+
+def worker_pids(pid: int) -> List[int]:
+    """Zwraca PID-y procesów potomnych (workerów) procesu głównego."""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", 'r') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def notify_ready():
+    """
+    Zgłasza procesowi głównemu, że worker jest gotowy (np. po rozgrzewce).
+
+    Poza wymianą workera (i poza trybem pre-fork) nic nie robi.
+    """
+    fd = os.environ.pop(READY_FD_ENV, None)
+    if fd is None:
+        return
+    try:
+        os.write(int(fd), b'1')
+        os.close(int(fd))
+    except OSError:
+        pass
+
+
+def _run_worker(app, sock: socket.socket, index: int, threads: int, log_level: str, ready_fd: Optional[int]):
+    """Pętla workera (w procesie potomnym): serwer uvicorn na współdzielonym gnieździe."""
+    import uvicorn
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # Podmianę modelu obsługuje proces główny (wymiana workerów)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    # Numer workera dla aplikacji (np. zadania w tle uruchamiane tylko w jednym workerze)
+    os.environ['PREFORK_WORKER'] = str(index)
+    if ready_fd is not None:
+        os.environ[READY_FD_ENV] = str(ready_fd)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def serve_prefork(
+    app,
+    host: str,
+    port: int,
+    workers: int,
+    preload: Optional[Callable[[], None]] = None,
+    log_level: str = 'info',
+    reload: Optional[Callable[[], None]] = None
+):
+    """
+    Serwuje aplikację ASGI w `workers` procesach sforkowanych z procesu głównego.
+
+    Proces główny nie obsługuje żądań - pilnuje workerów i uruchamia nowy,
+    gdy któryś zakończy się nieoczekiwanie. SIGINT/SIGTERM zamyka wszystkie.
+    SIGHUP uruchamia `reload` w procesie głównym (poza obsługą sygnału),
+    a potem wymienia workery po jednym: stary kończy obsługiwane żądania,
+    nowy jest forkowany z nowego obrazu i przed wymianą kolejnego czeka
+    się na jego gotowość (notify_ready, najwyżej WORKER_READY_TIMEOUT_S).
+
+    Args:
+        app: Aplikacja ASGI (np. endpoint.app)
+        host: Adres nasłuchiwania
+        port: Port nasłuchiwania
+        workers: Liczba workerów
+        preload: Funkcja ładująca współdzielone zasoby przed forkiem
+            (np. model i TagFiller)
+        log_level: Poziom logów uvicorn
+        reload: Funkcja ładująca (i rozgrzewająca) nową wersję zasobów w procesie
+            głównym po SIGHUP; przy błędzie workery nie są wymieniane
+    """
+    if not hasattr(os, 'fork'):
+        raise RuntimeError("Tryb pre-fork wymaga systemu z os.fork (Linux, macOS)")
+
+    if preload is not None:
+        preload()
+    # Obiekty załadowane przed forkiem nie będą skanowane przez GC w workerach,
+    # więc GC nie zapisuje do ich nagłówków i strony zostają współdzielone
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind_socket(host, port)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    children: Dict[int, int] = {}
+    stopping = False
+    reload_requested = False
+
+    def spawn(index: int, ready_fd: Optional[int] = None) -> int:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(app, sock, index, threads, log_level, ready_fd)
+            finally:
+                os._exit(0)
+        children[pid] = index
+        return pid
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def request_reload(signum, frame):
+        # Tylko flaga - ładowanie modelu w obsłudze sygnału blokowałoby pilnowanie workerów
+        nonlocal reload_requested
+        reload_requested = True
+
+    def stop_worker(pid: int):
+        """Zatrzymuje workera (SIGTERM - uvicorn kończy obsługiwane żądania) i czeka na jego koniec."""
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + WORKER_STOP_TIMEOUT_S
+        while True:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if done:
+                break
+            if time.monotonic() > deadline:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                break
+            time.sleep(POLL_INTERVAL_S)
+        children.pop(pid, None)
+
+    def start_worker(index: int) -> bool:
+        """Uruchamia workera i czeka, aż zgłosi gotowość (koniec rozgrzewki)."""
+        read_fd, write_fd = os.pipe()
+        spawn(index, write_fd)
+        os.close(write_fd)
+        try:
+            deadline = time.monotonic() + WORKER_READY_TIMEOUT_S
+            while not stopping:
+                ready, _, _ = select.select([read_fd], [], [], POLL_INTERVAL_S)
+                if ready:
+                    # Pusty odczyt - worker zakończył się przed gotowością
+                    return os.read(read_fd, 1) == b'1'
+                if time.monotonic() > deadline:
+                    return False
+            return False
+        finally:
+            os.close(read_fd)
+
+    def recycle_workers():
+        start_time = time.perf_counter()
+        if reload is not None:
+            try:
+                reload()
+            except (Exception, SystemExit) as error:
+                # SystemExit - load_model kończy proces, gdy pliku modelu nie ma
+                print(f"❌ Nie udało się załadować nowego modelu - workery zostają przy starym: {error}")
+                return
+        # Nowa wersja ma trafić do obrazu forkowanych workerów jako współdzielona
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+        for pid, index in sorted(children.items(), key=lambda item: item[1]):
+            if stopping:
+                return
+            stop_worker(pid)
+            if stopping:
+                return
+            if not start_worker(index):
+                print(f"⚠️  Nowy worker {index} nie zgłosił gotowości - kontynuuję wymianę")
+        print(f"✅ Wymieniono workery: {len(children)} ({(time.perf_counter() - start_time) * 1000:.0f} ms)")
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGHUP, request_reload)
+
+    for index in range(workers):
+        spawn(index)
+    print(f"✅ Pre-fork: {workers} workerów na http://{host}:{port} (PID główny {os.getpid()}, "
+          f"wątków torch na workera: {threads})")
+
+    while children:
+        if reload_requested and not stopping:
+            reload_requested = False
+            recycle_workers()
+            continue
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(POLL_INTERVAL_S)
+            continue
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            print(f"❌ Worker {index} (PID {pid}) zakończył się (status {status}) - uruchamiam ponownie")
+            spawn(index)
+    sock.close()
+
+
+def benchmark_memory(
+    worker_counts: List[int],
+    port: int = 3100,
+    timeout: float = 300.0,
+    extra_args: Optional[List[str]] = None
+) -> List[Dict[str, float]]:
+    """
+    Mierzy pamięć serwera pre-fork dla różnej liczby workerów.
+
+    Dla każdej liczby workerów uruchamia `endpoint.py --workers N`, czeka aż
+    wszystkie workery przyjmą połączenia, wysyła po jednym żądaniu
+    (rozgrzanie buforów) i odczytuje RSS/PSS procesów.
+
+    Args:
+        worker_counts: Liczby workerów do sprawdzenia (np. [1, 2, 4])
+        port: Port testowego serwera
+        timeout: Maksymalny czas oczekiwania na start serwera (s)
+        extra_args: Dodatkowe argumenty endpoint.py (np. ['--quantize', 'int8'])
+
+    Returns:
+        List[Dict[str, float]]: Dla każdej liczby workerów: workers, master_rss_mb,
+        worker_rss_mb (średnio), worker_private_mb (średnio), total_pss_mb
+    """
+    import json
+    import subprocess
+    import urllib.request
+
+    endpoint = os.path.join(os.path.dirname(os.path.abspath(__file__)), "endpoint.py")
+    results = []
+    for workers in worker_counts:
+        process = subprocess.Popen(
+            [sys.executable, endpoint, '--workers', str(workers), '--port', str(port)] + (extra_args or []),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            deadline = time.monotonic() + timeout
+            while len(worker_pids(process.pid)) < workers or not _accepts(port):
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"Serwer z {workers} workerami nie wystartował")
+                time.sleep(0.5)
+
+            body = json.dumps({'text': "Jan Kowalski mieszka w Warszawie."}).encode('utf-8')
+            for _ in range(workers * 2):
+                request = urllib.request.Request(
+                    f"http://127.0.0.1:{port}/anonymize", data=body, headers={'Content-Type': 'application/json'}
+                )
+                urllib.request.urlopen(request, timeout=timeout).read()
+
+            children = worker_pids(process.pid)
+            master = memory_usage(process.pid)
+            usages = [memory_usage(pid) for pid in children]
+            results.append({
+                'workers': len(children),
+                'master_rss_mb': master['rss_mb'],
+                'worker_rss_mb': sum(u['rss_mb'] for u in usages) / len(usages),
+                'worker_private_mb': sum(u['private_mb'] for u in usages) / len(usages),
+                'total_pss_mb': master['pss_mb'] + sum(u['pss_mb'] for u in usages),
+            })
+        finally:
+            process.terminate()
+            process.wait()
+    return results
+
+
+def _accepts(port: int) -> bool:
+    """Sprawdza, czy serwer przyjmuje połączenia na porcie."""
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+def main():
+    """CLI: benchmark pamięci serwera pre-fork."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark pamięci API w trybie pre-fork")
+    parser.add_argument("--benchmark", action="store_true", help="Zmierz RSS/PSS dla różnej liczby workerów")
+    parser.add_argument("--workers", type=int, nargs='+', default=[1, 2, 4], help="Liczby workerów (domyślnie: 1 2 4)")
+    parser.add_argument("--port", type=int, default=3100, help="Port testowego serwera (domyślnie: 3100)")
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        return
+
+    results = benchmark_memory(args.workers, args.port)
+    print("=" * 72)
+    print("PAMIĘĆ SERWERA PRE-FORK")
+    print("=" * 72)
+    print(f"{'Workery':>8} {'RSS główny':>12} {'RSS/worker':>12} {'Prywatna/worker':>16} {'PSS węzła':>12}")
+    print("-" * 72)
+    for r in results:
+        print(f"{r['workers']:>8} {r['master_rss_mb']:>10.0f}MB {r['worker_rss_mb']:>10.0f}MB "
+              f"{r['worker_private_mb']:>14.0f}MB {r['total_pss_mb']:>10.0f}MB")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-import re
+from segmenter import segment_text
 
 # Wczytanie danych z pliku orig.txt
 try:
@@ -11,13 +11,11 @@ except Exception as e:
 # Zamiana nawiasów kwadratowych na klamrowe
 tekst_przetworzony = tekst.replace('[', '{').replace(']', '}')
 
-# Podział tekstu na zdania
-# Wzorzec do wyszukiwania końca zdania: kropka, wykrzyknik lub znak zapytania, po którym następuje spacja lub koniec linii
-wzorzec_zdania = r'[.!?](?:\s|$)'
-zdania = re.split(wzorzec_zdania, tekst_przetworzony)
-
-# Usunięcie pustych zdań
-zdania = [zdanie.strip() for zdanie in zdania if zdanie.strip()]
+# Podział tekstu na zdania (segmenter pomija skróty typu "ul.", "art." i dzieli akapity)
+# Zdanie może obejmować pojedyncze złamanie linii - mixed_templates to jeden szablon na linię,
+# więc odstępy wewnątrz zdania są sprowadzane do pojedynczych spacji
+zdania = [' '.join(tekst_przetworzony[start:end].split()) for start, end in segment_text(tekst_przetworzony)]
+zdania = [zdanie for zdanie in zdania if zdanie]
 
 # Zapisanie wyników do pliku mixed_templates
 try:
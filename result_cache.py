@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Cache wyników modelu NER adresowany treścią zdania.
+
+Formularze, wyciągi bankowe i szablony powtarzają te same linie tysiące razy,
+a model dla identycznego zdania zawsze zwraca te same encje. Cache przechowuje
+encje modelu (offsety względem zdania) pod kluczem będącym skrótem SHA-256
+z odcisku pliku modelu i treści zdania, więc po ponownym treningu stare wpisy
+po prostu przestają pasować. Cache w pamięci (jedno uruchomienie) wystarczy
+tani odcisk z metadanych pliku (file_stamp); baza współdzielona między
+uruchomieniami wymaga skrótu zawartości (file_fingerprint).
+
+Poziomy:
+- pamięć: LRU o ograniczonej liczbie wpisów,
+- dysk (opcjonalnie): baza sqlite współdzielona między uruchomieniami
+  i procesami (tryb WAL).
+
+Użycie:
+    from result_cache import SentenceCache, file_fingerprint
+
+    cache = SentenceCache(file_fingerprint("resources/model/final-model.pt"),
+                          db_path="resources/cache/sentences.sqlite")
+    anonymize_file("in.txt", "out.txt", tagger, cache=cache)
+"""
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Domyślna liczba zdań trzymanych w pamięci
+DEFAULT_CACHE_ENTRIES = 100_000
+
+# Rozmiar bloku przy liczeniu odcisku pliku modelu
+_HASH_BLOCK_BYTES = 1 << 20
+
+
+def file_fingerprint(path: str) -> str:
+    """
+    Zwraca SHA-256 zawartości pliku (odcisk modelu do kluczy cache).
+
+    Dla katalogu (np. model slim) skrót obejmuje wszystkie pliki w kolejności nazw.
+    """
+    digest = hashlib.sha256()
+    root = Path(path)
+    files = sorted(f for f in root.rglob('*') if f.is_file()) if root.is_dir() else [root]
+    for file in files:
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK_BYTES), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def file_stamp(path: str) -> str:
+    """
+    Zwraca tani odcisk pliku z metadanych (ścieżka, rozmiar, mtime_ns) - bez czytania zawartości.
+
+    Wystarcza do kluczy cache w obrębie jednego uruchomienia; dla katalogu
+    obejmuje wszystkie pliki w kolejności nazw.
+    """
+    root = Path(path).resolve()
+    files = sorted(f for f in root.rglob('*') if f.is_file()) if root.is_dir() else [root]
+    digest = hashlib.sha256()
+    for file in files:
+        stat = file.stat()
+        digest.update(f"{file}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class SentenceCache:
+    """
+    Dwupoziomowy cache encji modelu dla zdań (LRU w pamięci + sqlite).
+
+    Obiekt można przekazać do procesu potomnego (pickle) - przenoszona jest
+    tylko konfiguracja, a worker otwiera własne połączenie z bazą.
+    """
+
+    def __init__(
+        self,
+        model_hash: str,
+        max_entries: int = DEFAULT_CACHE_ENTRIES,
+        db_path: Optional[str] = None
+    ):
+        """
+        Args:
+            model_hash: Odcisk modelu (np. file_fingerprint pliku modelu)
+            max_entries: Maksymalna liczba zdań w pamięci
+            db_path: Opcjonalna ścieżka do bazy sqlite (poziom dyskowy)
+        """
+        self.model_hash = model_hash
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path is not None:
+            self._db = sqlite3.connect(db_path, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sentences (key TEXT PRIMARY KEY, entities TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    def __getstate__(self) -> Dict:
+        return {'model_hash': self.model_hash, 'max_entries': self.max_entries, 'db_path': self.db_path}
+
+    def __setstate__(self, state: Dict):
+        self.__init__(state['model_hash'], state['max_entries'], state['db_path'])
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_hash}\0{text}".encode('utf-8')).hexdigest()
+
+    def _remember(self, key: str, entities: List[Dict]):
+        self._memory[key] = entities
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str) -> Optional[List[Dict]]:
+        """
+        Zwraca encje zapisane dla zdania (None gdy brak).
+
+        Returns:
+            Optional[List[Dict]]: Kopie encji (text, label, start, end,
+            confidence) z offsetami względem zdania
+        """
+        key = self._key(text)
+        entities = self._memory.get(key)
+        if entities is not None:
+            self._memory.move_to_end(key)
+        elif self._db is not None:
+            row = self._db.execute("SELECT entities FROM sentences WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                entities = [
+                    {'text': text[start:end], 'label': label, 'start': start, 'end': end, 'confidence': confidence}
+                    for start, end, label, confidence in json.loads(row[0])
+                ]
+                self._remember(key, entities)
+        if entities is None:
+            return None
+        return [dict(entity) for entity in entities]
+
+    def put_many(self, items: Dict[str, List[Dict]]):
+        """Zapisuje encje dla wielu zdań (jedna transakcja sqlite)."""
+        rows = []
+        for text, entities in items.items():
+            key = self._key(text)
+            stored = [
+                {k: entity[k] for k in ('text', 'label', 'start', 'end', 'confidence')}
+                for entity in entities
+            ]
+            self._remember(key, stored)
+            rows.append((key, json.dumps(
+                [[e['start'], e['end'], e['label'], e['confidence']] for e in stored]
+            )))
+        if self._db is not None and rows:
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO sentences VALUES (?, ?)", rows)
+
+    def record(self, hits: int, misses: int):
+        """Dolicza trafienia i chybienia (zdania obsłużone bez modelu / przez model)."""
+        self.hits += hits
+        self.misses += misses
+
+    def close(self):
+        """Zamyka połączenie z bazą."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
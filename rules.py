@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+Regułowy detektor danych o sztywnym formacie (szybka ścieżka przed modelem NER).
+
+Wykrywa identyfikatory, które da się rozpoznać wyrażeniem regularnym
+i zweryfikować sumą kontrolną:
+- PESEL (wagi 1-3-7-9 + poprawna data urodzenia),
+- BANK-ACCOUNT (NRB/IBAN, suma kontrolna mod 97),
+- CREDIT-CARD-NUMBER (algorytm Luhna),
+oraz - bez sumy kontrolnej, tylko po formacie:
+- EMAIL,
+- PHONE (polskie numery komórkowe i stacjonarne; wymagany kierunkowy
+  +48/0048/(xx) albo wskazówka w kontekście, np. "tel.", "kom.", "fax").
+
+Tylko encje zweryfikowane sumą kontrolną (CHECKSUM_LABELS) mają
+pierwszeństwo przed modelem NER; EMAIL i PHONE jedynie go uzupełniają.
+
+Formaty odpowiadają tym generowanym przez `generate_values.py`
+(z separatorami spacji i myślników).
+
+Użycie:
+    from rules import RuleEngine
+
+    engine = RuleEngine()
+    entities = engine.detect("PESEL: 90010112345, tel. +48 600 100 200")
+
+    # Samodzielnie z linii poleceń:
+    python rules.py "Mój PESEL to 44051401359"
+    python rules.py -i wyciag.csv -o wyciag_anonymized.csv
+"""
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Wagi sumy kontrolnej PESEL
+PESEL_WEIGHTS = [1, 3, 7, 9, 1, 3, 7, 9, 1, 3]
+
+# Długości numerów IBAN dla krajów (pozostałe kraje: 15-34 znaki)
+IBAN_LENGTHS = {'PL': 28, 'DE': 22, 'GB': 22, 'FR': 27, 'ES': 24, 'IT': 27, 'NL': 18, 'CZ': 24}
+
+# Kolejność ma znaczenie: wcześniejsza reguła wygrywa przy nakładających się dopasowaniach
+RULE_PATTERNS: List[Tuple[str, str]] = [
+    ("EMAIL", r'(?<![\w.+-])[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[a-zA-Z]{2,}(?![\w-])'),
+    ("BANK-ACCOUNT", r'(?<![\w])(?:[A-Z]{2} ?)?\d{2}(?: ?[0-9A-Z]{4}){2,7}(?: ?[0-9A-Z]{1,4})?(?![\w])'),
+    ("CREDIT-CARD-NUMBER", r'(?<![\d/+-])\d{4}(?:[ -]?\d{2,7}){2,4}(?![\d/-])'),
+    ("PESEL", r'(?<![\d/+-])\d{2} ?\d{2} ?\d{2}[ -]?\d{5}(?![\d/-])'),
+    ("PHONE", r'(?<![\w/+])(?:(?:\+|00)?48[ -]?)?(?:\(\d{2}\)[ -]?\d{3}[ -]?\d{2}[ -]?\d{2}'
+              r'|\d{3}[ -]?\d{3}[ -]?\d{3}|\d{2}[ -]\d{3}[ -]\d{2}[ -]\d{2})(?![\d/-])'),
+]
+
+# Etykiety weryfikowane sumą kontrolną - tylko one mają pierwszeństwo przed modelem NER
+CHECKSUM_LABELS = frozenset({"BANK-ACCOUNT", "CREDIT-CARD-NUMBER", "PESEL"})
+
+# Wskazówka przed numerem telefonu bez kierunkowego ("tel. 600 100 200", "kom.: 600-100-200")
+PHONE_CONTEXT = re.compile(
+    r'(?i)(?<!\w)(?:tel|telefon\w*|kom|komórk\w*|fax|faks\w*|zadzwo\w*|dzwo\w*|sms\w*|phone|mobile)'
+    r'(?!\w)[^\w\n]{0,4}(?:(?:nr|numer\w*|pod|na)(?!\w)[^\w\n]{0,4}){0,2}$'
+)
+PHONE_CONTEXT_WINDOW = 40
+
+
+def pesel_is_valid(digits: str) -> bool:
+    """Sprawdza sumę kontrolną i zakodowaną datę urodzenia numeru PESEL."""
+    if len(digits) != 11 or not digits.isdigit():
+        return False
+    checksum = sum(int(d) * w for d, w in zip(digits, PESEL_WEIGHTS))
+    if (10 - checksum % 10) % 10 != int(digits[10]):
+        return False
+    # Miesiąc zakodowany z przesunięciem stulecia (+0, +20, +40, +60, +80)
+    month = int(digits[2:4]) % 20
+    day = int(digits[4:6])
+    return 1 <= month <= 12 and 1 <= day <= 31
+
+
+def luhn_is_valid(digits: str) -> bool:
+    """Sprawdza numer karty algorytmem Luhna."""
+    if not 13 <= len(digits) <= 19 or not digits.isdigit():
+        return False
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        n = int(d)
+        if i % 2 == 1:
+            n *= 2
+            if n > 9:
+                n -= 9
+        total += n
+    return total % 10 == 0
+
+
+def iban_is_valid(account: str) -> bool:
+    """
+    Sprawdza numer rachunku (IBAN lub polski NRB bez prefiksu) sumą mod 97.
+
+    Numer bez kodu kraju o długości 26 cyfr traktowany jest jako polski NRB.
+    """
+    if account[:2].isdigit():
+        if len(account) != 26 or not account.isdigit():
+            return False
+        account = 'PL' + account
+    country = account[:2]
+    if not country.isalpha() or not account[2:4].isdigit():
+        return False
+    if len(account) != IBAN_LENGTHS.get(country, len(account)) or not 15 <= len(account) <= 34:
+        return False
+    rearranged = account[4:] + account[:4]
+    number = ''.join(str(int(ch, 36)) for ch in rearranged)
+    return int(number) % 97 == 1
+
+
+def _phone_is_valid(digits: str) -> bool:
+    """Sprawdza, czy cyfry tworzą polski numer (9 cyfr, opcjonalnie z kodem 48)."""
+    if len(digits) == 11 and digits.startswith('48'):
+        digits = digits[2:]
+    elif len(digits) == 13 and digits.startswith('0048'):
+        digits = digits[4:]
+    return len(digits) == 9 and digits[0] != '0'
+
+
+def _phone_has_context(text: str, start: int, value: str) -> bool:
+    """
+    Sprawdza, czy dopasowanie wygląda na numer telefonu, a nie dowolny ciąg cyfr
+    ("Faktura nr 123456789", "Kwota 100 200 300 zł"): numer ma kierunkowy
+    (+48, 0048, 48, (xx)) albo bezpośrednio poprzedza go wskazówka (PHONE_CONTEXT).
+    """
+    if value.startswith(('+', '(')) or len(_normalize(value)) > 9:
+        return True
+    return PHONE_CONTEXT.search(text[max(0, start - PHONE_CONTEXT_WINDOW):start]) is not None
+
+
+def _normalize(value: str) -> str:
+    """Usuwa separatory (spacje, myślniki, nawiasy, plus) z numeru."""
+    return re.sub(r'[\s()+-]', '', value)
+
+
+class RuleEngine:
+    """
+    Regułowy detektor identyfikatorów o sztywnym formacie.
+
+    Wzorce są kompilowane raz przy tworzeniu obiektu. Dopasowania są
+    weryfikowane sumami kontrolnymi (EMAIL i PHONE - tylko formatem,
+    PHONE dodatkowo kontekstem), a nakładające się dopasowania
+    rozstrzygane priorytetem reguł (kolejność w RULE_PATTERNS).
+    """
+
+    VALIDATORS = {
+        "EMAIL": lambda value: True,
+        "BANK-ACCOUNT": lambda value: iban_is_valid(_normalize(value).upper()),
+        "CREDIT-CARD-NUMBER": lambda value: luhn_is_valid(_normalize(value)),
+        "PESEL": lambda value: pesel_is_valid(_normalize(value)),
+        "PHONE": lambda value: _phone_is_valid(_normalize(value)),
+    }
+
+    def __init__(self, labels: Optional[List[str]] = None):
+        """
+        Args:
+            labels: Opcjonalna lista etykiet do wykrywania (domyślnie wszystkie)
+        """
+        self.rules = [
+            (label, re.compile(pattern))
+            for label, pattern in RULE_PATTERNS
+            if labels is None or label in labels
+        ]
+
+    def detect(self, text: str) -> List[Dict]:
+        """
+        Wykrywa identyfikatory w tekście.
+
+        Returns:
+            List[Dict]: Encje w formacie anonymize_text (text, label, start,
+            end, confidence), posortowane według pozycji
+        """
+        taken: List[Tuple[int, int]] = []
+        entities = []
+        for label, pattern in self.rules:
+            validate = self.VALIDATORS[label]
+            for match in pattern.finditer(text):
+                start, end = match.span()
+                if any(start < t_end and t_start < end for t_start, t_end in taken):
+                    continue
+                if not validate(match.group(0)):
+                    continue
+                if label == "PHONE" and not _phone_has_context(text, start, match.group(0)):
+                    continue
+                taken.append((start, end))
+                entities.append({
+                    'text': match.group(0),
+                    'label': label,
+                    'start': start,
+                    'end': end,
+                    'confidence': 1.0,
+                })
+        entities.sort(key=lambda e: e['start'])
+        return entities
+
+    @staticmethod
+    def split_checksum(entities: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Dzieli encje na zweryfikowane sumą kontrolną (CHECKSUM_LABELS)
+        i pozostałe (EMAIL, PHONE).
+
+        Returns:
+            Tuple[List[Dict], List[Dict]]: (zweryfikowane, pozostałe)
+        """
+        checked = [e for e in entities if e['label'] in CHECKSUM_LABELS]
+        other = [e for e in entities if e['label'] not in CHECKSUM_LABELS]
+        return checked, other
+
+    @staticmethod
+    def covers_text(text: str, entities: List[Dict]) -> bool:
+        """
+        Sprawdza, czy tekst składa się wyłącznie z identyfikatorów
+        zweryfikowanych sumą kontrolną.
+
+        Poza encjami mogą zostać tylko separatory (spacje, interpunkcja) -
+        wtedy model NER nie ma czego szukać i może zostać pominięty.
+        EMAIL i PHONE nie mają sumy kontrolnej, więc nie zwalniają z modelu.
+        """
+        entities = [e for e in entities if e['label'] in CHECKSUM_LABELS]
+        if not entities:
+            return False
+        pos = 0
+        rest = []
+        for entity in entities:
+            rest.append(text[pos:entity['start']])
+            pos = entity['end']
+        rest.append(text[pos:])
+        return not any(ch.isalnum() for ch in ''.join(rest))
+
+
+def main():
+    """CLI: samodzielna anonimizacja regułami (bez modelu NER)."""
+    import argparse
+    import json
+    import sys
+    import time
+
+    from anonymize import DEFAULT_REPLACEMENTS, _replace_entities
+
+    parser = argparse.ArgumentParser(
+        description="Regułowe wykrywanie identyfikatorów (PESEL, konto, karta, e-mail, telefon)"
+    )
+    parser.add_argument("text", nargs="?", help="Tekst do sprawdzenia")
+    parser.add_argument("-i", "--input", help="Plik wejściowy")
+    parser.add_argument("-o", "--output", help="Plik wyjściowy (domyślnie: input_anonymized)")
+    args = parser.parse_args()
+
+    engine = RuleEngine()
+
+    def anonymize_line(line: str) -> Tuple[str, int]:
+        entities = engine.detect(line)
+        return _replace_entities(line, entities, DEFAULT_REPLACEMENTS), len(entities)
+
+    if args.input:
+        input_path = Path(args.input)
+        output = Path(args.output) if args.output else input_path.with_name(
+            f"{input_path.stem}_anonymized{input_path.suffix}"
+        )
+        # Plik wyjściowy jest otwierany do zapisu przed odczytem wejścia - ten sam plik zostałby wyczyszczony
+        if output.resolve() == input_path.resolve():
+            print(f"❌ Błąd: Plik wyjściowy '{output}' jest plikiem wejściowym")
+            sys.exit(1)
+        start_time = time.perf_counter()
+        total_chars = 0
+        total_entities = 0
+        with open(args.input, 'r', encoding='utf-8') as src, open(output, 'w', encoding='utf-8') as dst:
+            for line in src:
+                anonymized, count = anonymize_line(line)
+                dst.write(anonymized)
+                total_chars += len(line)
+                total_entities += count
+        elapsed = time.perf_counter() - start_time
+        print(f"✅ Zapisano: {output}")
+        print(f"   • Znalezionych encji: {total_entities}")
+        print(f"⏱️  Czas: {elapsed * 1000:.2f} ms ({total_chars / elapsed if elapsed else 0:,.0f} znaków/s)")
+        return
+
+    if args.text:
+        text = args.text
+    elif not sys.stdin.isatty():
+        text = sys.stdin.read().strip()
+    else:
+        parser.print_help()
+        return
+
+    print(json.dumps(engine.detect(text), ensure_ascii=False, indent=2))
+    print(anonymize_line(text)[0])
+
+
+if __name__ == "__main__":
+    main()
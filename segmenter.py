@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Segmentacja tekstu na zdania i akapity przed modelem NER.
+
+Długi dokument podany jako jedno zdanie Flair to jedna ogromna sekwencja
+(kwadratowy koszt atencji, limit długości HerBERT-a). Segmenter dzieli tekst
+na krótkie jednostki i zwraca ich offsety znakowe, dzięki czemu wykryte encje
+można przenieść z powrotem na pozycje w oryginalnym dokumencie.
+
+Zasady podziału:
+- pusta linia (koniec akapitu) zawsze kończy segment,
+- `.`, `!`, `?`, `…` kończą zdanie, jeśli po odstępie zaczyna się wielka litera,
+- kropka po skrócie (`ul.`, `art.`, `tel.`...) lub inicjale (`J.`) nie kończy zdania,
+- pojedynczy znak nowej linii nie dzieli (adresy bywają wieloliniowe).
+
+Użycie:
+    from segmenter import segment_text, iter_segments
+
+    for start, end in segment_text(text):
+        print(text[start:end])
+
+    # Strumieniowo (np. plik czytany porcjami):
+    for offset, segment in iter_segments(chunks):
+        ...
+
+    # Akapity z zachowaniem odstępów (''.join(p + sep) odtwarza tekst):
+    paragraphs, consumed = split_paragraphs(buffer, final=False)
+"""
+import re
+from typing import Iterable, Iterator, List, Tuple
+
+# Maksymalna długość segmentu bez granicy zdania - dłuższy fragment jest cięty
+# na ostatnim odstępie (dalej obsługuje go model, np. oknami przesuwnymi)
+DEFAULT_MAX_SEGMENT_CHARS = 20000
+
+# Skróty, po których kropka nie kończy zdania (porównywane małymi literami)
+ABBREVIATIONS = {
+    'ul', 'al', 'pl', 'os', 'nr', 'tel', 'art', 'ust', 'pkt', 'par', 'zw',
+    'dz', 'poz', 'godz', 'min', 'ok', 'im', 'św', 'dr', 'hab', 'prof', 'inż',
+    'mgr', 'lek', 'med', 'płk', 'gen', 'ks', 'sp', 'zo', 'o.o', 'tzw', 'np',
+    'tj', 'tzn', 'itd', 'itp', 'wg', 'ds', 'rej', 'kod', 'woj', 'pow', 'gm',
+    'm', 'r', 'w', 'k', 'ur', 'zam', 'lok', 'm.in', 'jw', 'sygn', 'akt',
+}
+
+_BOUNDARY_PATTERN = re.compile(
+    r'(?P<para>\n[^\S\n]*\n\s*)'       # pusta linia - koniec akapitu
+    r'|(?<=[.!?…])(?P<gap>\s+)(?=\S)'  # odstęp po znaku końca zdania
+)
+
+_PARAGRAPH_PATTERN = re.compile(r'\n[^\S\n]*\n\s*')
+
+# Znaki, które mogą poprzedzać pierwszą literę zdania
+_OPENING_CHARS = '„"«»\'([-–—'
+
+_LAST_WORD_PATTERN = re.compile(r'(?<![\w.])([\w.]+)\.$')
+
+
+def _is_sentence_break(text: str, gap: re.Match) -> bool:
+    """Sprawdza, czy odstęp po znaku interpunkcyjnym jest granicą zdania."""
+    # Następne zdanie musi zaczynać się wielką literą
+    pos = gap.end()
+    while pos < len(text) and text[pos] in _OPENING_CHARS:
+        pos += 1
+    if pos >= len(text) or not text[pos].isupper():
+        return False
+
+    if text[gap.start() - 1] != '.':
+        return True
+
+    # Kropka po skrócie lub inicjale nie kończy zdania
+    match = _LAST_WORD_PATTERN.search(text, max(0, gap.start() - 20), gap.start())
+    if match is None:
+        return True
+    word = match.group(1).lower()
+    if word in ABBREVIATIONS:
+        return False
+    return not (len(word) == 1 and word.isalpha())
+
+
+def _trimmed(text: str, start: int, end: int) -> Tuple[int, int]:
+    """Zwraca zakres [start, end) bez białych znaków na brzegach."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _segment_buffer(text: str, final: bool, max_chars: int) -> Tuple[List[Tuple[int, int]], int]:
+    """
+    Znajduje segmenty w buforze.
+
+    Args:
+        text: Bufor tekstu
+        final: Czy to koniec danych (niedokończona końcówka też jest segmentem)
+        max_chars: Maksymalna długość segmentu bez granicy zdania
+
+    Returns:
+        Tuple[List[Tuple[int, int]], int]: Zakresy segmentów i pozycja,
+        od której zaczyna się niedokończona końcówka bufora
+    """
+    segments: List[Tuple[int, int]] = []
+    seg_start = 0
+
+    def emit(end: int):
+        start, stop = _trimmed(text, seg_start, end)
+        # Zbyt długi fragment bez granicy zdania - tnij na odstępach
+        while stop - start > max_chars:
+            cut = text.rfind(' ', start + 1, start + max_chars)
+            if cut == -1:
+                cut = start + max_chars
+            piece = _trimmed(text, start, cut)
+            if piece[0] < piece[1]:
+                segments.append(piece)
+            start, stop = _trimmed(text, cut, stop)
+        if start < stop:
+            segments.append((start, stop))
+
+    for match in _BOUNDARY_PATTERN.finditer(text):
+        if match.group('gap') is not None and not _is_sentence_break(text, match):
+            continue
+        emit(match.start())
+        seg_start = match.end()
+
+    if final:
+        emit(len(text))
+        seg_start = len(text)
+    elif len(text) - seg_start > max_chars:
+        # Nie trzymaj w buforze dowolnie długiej końcówki bez granicy
+        cut = text.rfind(' ', seg_start + 1, len(text) - 1)
+        if cut > seg_start:
+            emit(cut)
+            seg_start = cut
+
+    return segments, seg_start
+
+
+def segment_text(text: str, max_chars: int = DEFAULT_MAX_SEGMENT_CHARS) -> List[Tuple[int, int]]:
+    """
+    Dzieli tekst na zdania i akapity.
+
+    Args:
+        text: Tekst do podziału
+        max_chars: Maksymalna długość segmentu bez granicy zdania
+
+    Returns:
+        List[Tuple[int, int]]: Zakresy znakowe [start, end) niepustych segmentów
+        (bez białych znaków na brzegach), w kolejności występowania
+    """
+    segments, _ = _segment_buffer(text, final=True, max_chars=max_chars)
+    return segments
+
+
+def iter_segments(
+    chunks: Iterable[str],
+    max_chars: int = DEFAULT_MAX_SEGMENT_CHARS
+) -> Iterator[Tuple[int, str]]:
+    """
+    Strumieniowo dzieli tekst podawany porcjami na zdania i akapity.
+
+    Segment jest zwracany dopiero, gdy jego koniec jest pewny, więc wynik
+    jest taki sam jak dla segment_text na połączonym tekście (z dokładnością
+    do cięcia zbyt długich fragmentów bez granic zdań).
+
+    Args:
+        chunks: Kolejne fragmenty tekstu (np. porcje czytane z pliku)
+        max_chars: Maksymalna długość segmentu bez granicy zdania
+
+    Yields:
+        Tuple[int, str]: Offset segmentu w całym tekście i jego treść
+    """
+    buffer = ''
+    offset = 0
+    for chunk in chunks:
+        buffer += chunk
+        segments, consumed = _segment_buffer(buffer, final=False, max_chars=max_chars)
+        for start, end in segments:
+            yield offset + start, buffer[start:end]
+        buffer = buffer[consumed:]
+        offset += consumed
+
+    segments, _ = _segment_buffer(buffer, final=True, max_chars=max_chars)
+    for start, end in segments:
+        yield offset + start, buffer[start:end]
+
+
+def split_paragraphs(
+    text: str,
+    final: bool = True,
+    max_chars: int = DEFAULT_MAX_SEGMENT_CHARS
+) -> Tuple[List[Tuple[str, str]], int]:
+    """
+    Dzieli bufor na akapity (granica: pusta linia), zachowując odstępy.
+
+    Używane przy strumieniowym przetwarzaniu dokumentów: akapit jest
+    zwracany dopiero, gdy jego separator jest kompletny. Akapit dłuższy
+    niż max_chars bez pustej linii jest cięty po ostatnim znaku nowej
+    linii (lub spacji) z pustym separatorem.
+
+    Args:
+        text: Bufor tekstu
+        final: Czy to koniec danych (końcówka bufora też jest akapitem)
+        max_chars: Maksymalna długość akapitu trzymanego w buforze
+
+    Returns:
+        Tuple[List[Tuple[str, str]], int]: Pary (akapit, separator) oraz
+        pozycja, od której zaczyna się niedokończona końcówka bufora
+    """
+    paragraphs: List[Tuple[str, str]] = []
+    pos = 0
+    for match in _PARAGRAPH_PATTERN.finditer(text):
+        if not final and match.end() == len(text):
+            # Separator może ciągnąć się w kolejnej porcji
+            break
+        paragraphs.append((text[pos:match.start()], match.group(0)))
+        pos = match.end()
+
+    if final:
+        rest = text[pos:]
+        body = rest.rstrip()
+        if rest:
+            paragraphs.append((body, rest[len(body):]))
+        return paragraphs, len(text)
+
+    while len(text) - pos > max_chars:
+        cut = text.rfind('\n', pos, pos + max_chars)
+        if cut == -1:
+            cut = text.rfind(' ', pos, pos + max_chars)
+        end = cut + 1 if cut != -1 else pos + max_chars
+        paragraphs.append((text[pos:end], ''))
+        pos = end
+    return paragraphs, pos
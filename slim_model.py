@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Odchudzony format modelu NER do szybkiego startu.
+
+SequenceTagger.load rozpakowuje pełny pickle checkpointu (z embeddingami,
+stanem optymalizatora i metadanymi treningu), a następnie inicjalizuje
+losowo wagi transformera tylko po to, żeby je nadpisać. Format slim dzieli
+model na:
+- meta.pt - konfiguracja taggera (słownik tagów, parametry embeddingów,
+  tokenizer) bez tensorów,
+- weights.safetensors - same wagi w fp32 (opcjonalnie --half: duże
+  macierze w fp16).
+
+Start jest szybszy, bo nie ma rozpakowywania pełnego pickle ani losowej
+inicjalizacji wag transformera. Wagi nie są jednak leniwe: safetensors
+wczytuje je do pamięci, a load_state_dict kopiuje je do parametrów modelu,
+więc przy ładowaniu w pamięci są chwilowo dwie kopie wag.
+
+Zapis w fp16 zmniejsza plik o ok. połowę, ale zaokrągla wagi - po powrocie
+do fp32 wyniki mogą odbiegać od oryginału. Dlatego jest domyślnie wyłączony,
+a konwersja porównuje spany modelu slim i oryginału na tekstach próbnych.
+
+Konwersja (wymaga flair, safetensors):
+    python slim_model.py -m resources/model/final-model.pt
+    python slim_model.py -m resources/model/final-model.pt --half -t probka.txt
+
+Użycie:
+    python anonymize.py -m resources/model/final-model.slim -i input.txt
+
+    from slim_model import load_slim
+    tagger = load_slim("resources/model/final-model.slim")
+"""
+import contextlib
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Nazwy plików w katalogu modelu slim
+SLIM_META_FILE = "meta.pt"
+SLIM_WEIGHTS_FILE = "weights.safetensors"
+
+# Tensory mniejsze niż ten próg zostają w fp32 (oszczędność byłaby pomijalna)
+HALF_MIN_NUMEL = 4096
+
+# Fragmenty nazw parametrów, które zawsze zostają w fp32 (CRF, normalizacje, biasy)
+KEEP_FP32 = ('crf', 'LayerNorm', 'layer_norm', 'bias')
+
+# Domyślne teksty do sprawdzenia zgodności spanów modelu slim z oryginałem
+PARITY_TEXTS = [
+    "Jan Kowalski mieszka przy ul. Długiej 5 w Krakowie.",
+    "Proszę o kontakt z Anną Nowak, tel. 600 100 200, e-mail anna.nowak@example.com.",
+    "Przelew na konto PL61 1090 1014 0000 0712 1981 2874 zlecił Piotr Wiśniewski z Gdańska.",
+    "Pacjentka Maria Zielińska, PESEL 44051401359, urodzona 14 maja 1944 r. w Poznaniu.",
+]
+
+
+def slim_dir_for(model_path: str) -> Path:
+    """Zwraca katalog modelu slim dla modelu Flair (obok oryginału, np. final-model.slim/)."""
+    path = Path(model_path)
+    return path.with_name(f"{path.stem}.slim")
+
+
+def is_slim_checkpoint(path: str) -> bool:
+    """Sprawdza, czy ścieżka wskazuje katalog modelu slim."""
+    path = Path(path)
+    return path.is_dir() and (path / SLIM_META_FILE).exists() and (path / SLIM_WEIGHTS_FILE).exists()
+
+
+def _can_store_half(name: str, tensor) -> bool:
+    """Sprawdza, czy tensor mieści się w zakresie fp16 (zaokrąglenie wartości i tak następuje)."""
+    import torch
+
+    if tensor.dtype != torch.float32 or tensor.numel() < HALF_MIN_NUMEL:
+        return False
+    if any(part in name for part in KEEP_FP32):
+        return False
+    return bool(tensor.abs().max() < torch.finfo(torch.float16).max)
+
+
+def convert_to_slim(model_path: str, output_dir: Path = None, half: bool = False) -> Path:
+    """
+    Zapisuje model Flair w formacie slim.
+
+    Args:
+        model_path: Ścieżka do modelu Flair (.pt)
+        output_dir: Katalog docelowy (domyślnie: slim_dir_for(model_path))
+        half: Czy zapisywać duże macierze wag w fp16 (stratnie - sprawdź check_parity)
+
+    Returns:
+        Path: Katalog modelu slim
+    """
+    import torch
+    from flair.models import SequenceTagger
+    from safetensors.torch import save_file
+
+    output_dir = Path(output_dir) if output_dir is not None else slim_dir_for(model_path)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    tagger = SequenceTagger.load(model_path)
+    state = tagger._get_state_dict()
+    weights = state.pop('state_dict')
+
+    tensors: Dict[str, "torch.Tensor"] = {}
+    half_names = []
+    for name, tensor in weights.items():
+        # Kopia - safetensors nie zapisuje tensorów o współdzielonej pamięci
+        tensor = tensor.detach().cpu().contiguous().clone()
+        if half and _can_store_half(name, tensor):
+            tensor = tensor.half()
+            half_names.append(name)
+        tensors[name] = tensor
+
+    save_file(tensors, str(output_dir / SLIM_WEIGHTS_FILE), metadata={'source_model': str(model_path)})
+    state['half_precision'] = half_names
+    torch.save(state, output_dir / SLIM_META_FILE)
+    return output_dir
+
+
+def _no_init_weights():
+    """Kontekst wyłączający losową inicjalizację wag transformera (wagi i tak są wczytywane)."""
+    try:
+        from transformers.modeling_utils import no_init_weights
+    except ImportError:
+        return contextlib.nullcontext()
+    return no_init_weights()
+
+
+def load_slim(slim_dir: str):
+    """
+    Wczytuje model slim jako SequenceTagger.
+
+    Wagi są wczytywane z safetensors do pamięci i kopiowane do parametrów
+    modelu. Tensory zapisane w fp16 wracają do fp32, ale z zaokrąglonymi
+    wartościami - wyniki takiego modelu mogą odbiegać od oryginału.
+
+    Args:
+        slim_dir: Katalog utworzony przez convert_to_slim
+
+    Returns:
+        SequenceTagger: Model gotowy do predict
+    """
+    import flair
+    import torch
+    from flair.models import SequenceTagger
+    from safetensors.torch import load_file
+
+    slim_dir = Path(slim_dir)
+    try:
+        state = torch.load(slim_dir / SLIM_META_FILE, map_location='cpu', weights_only=False)
+    except TypeError:
+        # Starsze wersje PyTorch nie znają weights_only
+        state = torch.load(slim_dir / SLIM_META_FILE, map_location='cpu')
+
+    tensors = load_file(str(slim_dir / SLIM_WEIGHTS_FILE), device='cpu')
+    for name in state.pop('half_precision', []):
+        tensors[name] = tensors[name].float()
+    state['state_dict'] = tensors
+
+    with _no_init_weights():
+        tagger = SequenceTagger._init_model_with_state_dict(state)
+    if 'model_card' in state:
+        tagger.model_card = state['model_card']
+    tagger.eval()
+    tagger.to(flair.device)
+    return tagger
+
+
+def check_parity(reference, candidate, texts: List[str], max_differences: int = 10) -> Dict:
+    """
+    Porównuje spany dwóch modeli (np. oryginału i modelu slim) na tych samych tekstach.
+
+    Returns:
+        Dict: texts, text_agreement (udział tekstów z identycznymi spanami),
+        reference_spans, differences - przykłady (numer tekstu, spany tylko
+        oryginału, spany tylko kandydata)
+    """
+    from anonymize import _detect_entities
+
+    def spans(tagger):
+        return [
+            {(e['start'], e['end'], e['label']) for e in entities}
+            for entities, _ in _detect_entities(texts, tagger)
+        ]
+
+    expected = spans(reference)
+    actual = spans(candidate)
+    differences = [
+        (i + 1, sorted(a - b), sorted(b - a))
+        for i, (a, b) in enumerate(zip(expected, actual)) if a != b
+    ]
+    return {
+        'texts': len(texts),
+        'text_agreement': 1.0 - len(differences) / len(texts) if texts else 1.0,
+        'reference_spans': sum(len(a) for a in expected),
+        'differences': differences[:max_differences],
+    }
+
+
+def _directory_size(path: Path) -> int:
+    """Zwraca łączny rozmiar plików (w bajtach) pliku lub katalogu."""
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+
+def main():
+    """CLI: konwersja modelu Flair do formatu slim, porównanie czasu startu i zgodności spanów."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Konwersja modelu NER do formatu slim (szybki start)")
+    parser.add_argument("-m", "--model", default="resources/model/final-model.pt", help="Model Flair (.pt)")
+    parser.add_argument("-o", "--output", help="Katalog modelu slim (domyślnie: obok modelu, *.slim/)")
+    parser.add_argument("--half", action="store_true",
+                        help="Zapisz duże macierze wag w fp16 (mniejszy plik, wyniki mogą się różnić)")
+    parser.add_argument("-t", "--texts",
+                        help="Plik z tekstami (po jednym w linii) do sprawdzenia zgodności spanów "
+                             "(domyślnie: wbudowane przykłady)")
+    args = parser.parse_args()
+
+    from flair.models import SequenceTagger
+
+    output_dir = convert_to_slim(args.model, Path(args.output) if args.output else None, half=args.half)
+    print(f"✅ Zapisano model slim: {output_dir}")
+
+    start_time = time.perf_counter()
+    reference = SequenceTagger.load(args.model)
+    full_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    slim = load_slim(output_dir)
+    slim_time = time.perf_counter() - start_time
+
+    print(f"\n📊 Start modelu:")
+    print(f"   • Pełny checkpoint: {full_time * 1000:.0f} ms ({_directory_size(Path(args.model)) / 1e6:.1f} MB)")
+    print(f"   • Slim:             {slim_time * 1000:.0f} ms ({_directory_size(output_dir) / 1e6:.1f} MB)")
+
+    if args.texts:
+        with open(args.texts, 'r', encoding='utf-8') as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = PARITY_TEXTS
+    parity = check_parity(reference, slim, texts)
+    print(f"\n📊 Zgodność spanów z oryginałem: {parity['text_agreement']:.2%} tekstów "
+          f"({parity['texts']} tekstów, {parity['reference_spans']} spanów oryginału)")
+    for line, only_reference, only_slim in parity['differences']:
+        print(f"   • tekst {line}: tylko oryginał {only_reference}, tylko slim {only_slim}")
+    if parity['differences']:
+        print("⚠️  Model slim daje inne spany niż oryginał" + (" - przekonwertuj bez --half" if args.half else ""))
+
+
+if __name__ == "__main__":
+    main()
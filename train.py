@@ -6,9 +6,15 @@ Uruchomienie:
     python train.py
 
 Plik zapisze model w `config.MODEL_DIR`.
+
+Destylacja do mniejszego modelu (płytszy transformer, mniejszy BiLSTM)
+z miękkich etykiet wytrenowanego modelu:
+    python train.py --distill --student-layers 4 --student-dir resources/model/student
+    python anonymize.py -m resources/model/student/final-model.pt -i input.txt
 """
+import copy
 import os
-from typing import Optional
+from typing import Optional, Tuple
 
 import torch
 from tqdm import tqdm
@@ -161,6 +167,215 @@ def train_model(corpus=None, epochs: int = 10, model_dir: Optional[str] = None,
     return trainer
 
 
+def _truncate_transformer(model, num_layers: int):
+    """
+    Zostawia w transformerze `num_layers` warstw równomiernie wybranych z nauczyciela.
+
+    Pierwsza i ostatnia warstwa są zawsze zachowane (inicjalizacja studenta
+    wagami nauczyciela, jak w DistilBERT).
+    """
+    encoder = getattr(model, 'encoder', None)
+    if encoder is None or not hasattr(encoder, 'layer'):
+        raise ValueError("Nieobsługiwana architektura transformera (brak encoder.layer)")
+    total = len(encoder.layer)
+    if not 1 <= num_layers <= total:
+        raise ValueError(f"Liczba warstw studenta musi być w przedziale 1-{total}, podano: {num_layers}")
+    if num_layers == 1:
+        keep = [total - 1]
+    else:
+        keep = sorted({round(i * (total - 1) / (num_layers - 1)) for i in range(num_layers)})
+    encoder.layer = torch.nn.ModuleList([encoder.layer[i] for i in keep])
+    model.config.num_hidden_layers = len(keep)
+    return keep
+
+
+def build_student(teacher: SequenceTagger, num_layers: int = 4, hidden_size: int = 256) -> SequenceTagger:
+    """
+    Tworzy mniejszy tagger z wag nauczyciela: płytszy transformer i mniejszy BiLSTM.
+
+    Args:
+        teacher: Wytrenowany SequenceTagger (HerBERT)
+        num_layers: Liczba warstw transformera studenta
+        hidden_size: Rozmiar warstwy ukrytej BiLSTM studenta
+    """
+    embeddings = copy.deepcopy(teacher.embeddings)
+    kept = _truncate_transformer(embeddings.model, num_layers)
+    print(f"   Warstwy transformera studenta: {len(kept)} (z nauczyciela: {kept})")
+
+    return SequenceTagger(
+        hidden_size=hidden_size,
+        embeddings=embeddings,
+        tag_dictionary=teacher.label_dictionary,
+        tag_type=teacher.tag_type,
+        use_crf=teacher.use_crf,
+        loss_weights=getattr(teacher, 'weight_dict', None),
+        reproject_embeddings=True,
+    )
+
+
+def _emissions(tagger: SequenceTagger, sentences) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Liczy stratę CRF taggera na zdaniach i przechwytuje jego emisje (wyjście warstwy linear).
+
+    Returns:
+        Tuple[torch.Tensor, torch.Tensor]: Średnia strata na token i emisje [zdania, tokeny, tagi]
+    """
+    captured = []
+    handle = tagger.linear.register_forward_hook(lambda module, inputs, output: captured.append(output))
+    try:
+        result = tagger.forward_loss(sentences)
+    finally:
+        handle.remove()
+    if isinstance(result, tuple):
+        loss, count = result[0], result[1]
+        loss = loss / max(count, 1)
+    else:
+        loss = result
+    return loss, captured[-1]
+
+
+def distill_model(
+    teacher_path: str,
+    student_dir: str,
+    corpus=None,
+    epochs: int = 5,
+    num_layers: int = 4,
+    hidden_size: int = 256,
+    temperature: float = 2.0,
+    alpha: float = 0.5,
+    learning_rate: float = 5e-5,
+    mini_batch_size: int = 32,
+    max_sentences: Optional[int] = None,
+    seed: int = 42
+) -> SequenceTagger:
+    """
+    Destyluje nauczyciela (HerBERT-base) do mniejszego studenta.
+
+    Strata studenta to połączenie straty CRF na etykietach korpusu oraz
+    dywergencji KL między miękkimi etykietami nauczyciela a studenta
+    (softmax emisji z temperaturą):
+        loss = (1 - alpha) * crf + alpha * T² * KL(teacher_T || student_T)
+
+    Student jest zapisywany jako zwykły SequenceTagger (final-model.pt),
+    więc anonymize.py -m ładuje go bez zmian. Obok modelu zapisywana jest
+    tabela nauczyciel vs student (F1 i opóźnienie na zbiorze testowym).
+
+    Args:
+        teacher_path: Ścieżka do modelu nauczyciela
+        student_dir: Katalog zapisu studenta
+        corpus: Opcjonalny korpus Flair (domyślnie generate_corpus)
+        epochs: Liczba epok destylacji
+        num_layers: Liczba warstw transformera studenta
+        hidden_size: Rozmiar warstwy ukrytej BiLSTM studenta
+        temperature: Temperatura miękkich etykiet
+        alpha: Waga straty destylacyjnej (0 - tylko etykiety korpusu)
+        learning_rate: Krok uczenia AdamW
+        mini_batch_size: Liczba zdań w paczce
+        max_sentences: Maksymalna liczba zdań generowanego korpusu
+        seed: Seed kolejności przykładów
+
+    Returns:
+        SequenceTagger: Najlepszy student (wg F1 na dev)
+    """
+    import json
+    import random
+    import flair
+    import torch.nn.functional as F
+    from evaluate import benchmark_taggers, print_benchmark
+
+    os.makedirs(student_dir, exist_ok=True)
+    student_path = os.path.join(student_dir, "final-model.pt")
+
+    if corpus is None:
+        print("📊 Generowanie korpusu do destylacji...")
+        corpus = generate_corpus(max_sentences=max_sentences)
+    print(f"✅ Korpus gotowy: train={len(corpus.train)}, dev={len(corpus.dev)}, test={len(corpus.test)}")
+
+    print(f"📥 Ładowanie nauczyciela z: {teacher_path}")
+    teacher = SequenceTagger.load(teacher_path)
+    teacher.to(flair.device)
+    teacher.eval()
+
+    student = build_student(teacher, num_layers, hidden_size)
+    student.to(flair.device)
+    teacher_params = sum(p.numel() for p in teacher.parameters())
+    student_params = sum(p.numel() for p in student.parameters())
+    print(f"   Parametry: nauczyciel {teacher_params/1e6:.2f}M → student {student_params/1e6:.2f}M")
+
+    optimizer = torch.optim.AdamW(student.parameters(), lr=learning_rate)
+    train_sentences = list(corpus.train)
+    rng = random.Random(seed)
+    best_f1 = -1.0
+
+    print(f"\n🚀 Destylacja ({epochs} epok, T={temperature}, alpha={alpha})...")
+    for epoch in range(1, epochs + 1):
+        student.train()
+        rng.shuffle(train_sentences)
+        total_loss = 0.0
+        batches = range(0, len(train_sentences), mini_batch_size)
+        for first in tqdm(batches, desc=f"Epoka {epoch}/{epochs}"):
+            batch = train_sentences[first:first + mini_batch_size]
+
+            with torch.no_grad():
+                _, teacher_emissions = _emissions(teacher, batch)
+            for sentence in batch:
+                sentence.clear_embeddings()
+
+            crf_loss, student_emissions = _emissions(student, batch)
+            for sentence in batch:
+                sentence.clear_embeddings()
+
+            # Maska prawdziwych tokenów (bez paddingu)
+            mask = torch.zeros(student_emissions.shape[:2], dtype=torch.bool, device=student_emissions.device)
+            for i, sentence in enumerate(batch):
+                mask[i, :len(sentence)] = True
+            kd_loss = F.kl_div(
+                F.log_softmax(student_emissions[mask] / temperature, dim=-1),
+                F.log_softmax(teacher_emissions[mask] / temperature, dim=-1),
+                log_target=True,
+                reduction='batchmean',
+            ) * temperature ** 2
+            loss = (1 - alpha) * crf_loss + alpha * kd_loss
+
+            optimizer.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(student.parameters(), 5.0)
+            optimizer.step()
+            total_loss += loss.item()
+
+        student.eval()
+        dev_f1 = student.evaluate(list(corpus.dev), gold_label_type=teacher.tag_type,
+                                  mini_batch_size=mini_batch_size).main_score
+        print(f"   Epoka {epoch}: strata {total_loss / max(len(batches), 1):.4f}, F1 dev {dev_f1:.4f}")
+        if dev_f1 > best_f1:
+            best_f1 = dev_f1
+            student.save(student_path)
+
+    print(f"✅ Zapisano studenta: {student_path} (F1 dev {best_f1:.4f})")
+
+    # Tabela nauczyciel vs student na zbiorze testowym
+    student = SequenceTagger.load(student_path)
+    test_sentences = list(corpus.test)
+    results = benchmark_taggers({'teacher': teacher, 'student': student}, test_sentences)
+    print_benchmark(results)
+
+    report_path = os.path.join(student_dir, "distillation.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'teacher': teacher_path,
+            'student': student_path,
+            'test_sentences': len(test_sentences),
+            'params': {'teacher': teacher_params, 'student': student_params},
+            'config': {
+                'num_layers': num_layers, 'hidden_size': hidden_size, 'temperature': temperature,
+                'alpha': alpha, 'epochs': epochs, 'learning_rate': learning_rate,
+            },
+            'variants': results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"✅ Zapisano raport: {report_path}")
+    return student
+
+
 if __name__ == "__main__":
     import argparse
     
@@ -169,7 +384,31 @@ if __name__ == "__main__":
     parser.add_argument("--n-per-template", type=int, default=200, help="Liczba przykładów na szablon (domyślnie: 200, ignorowane gdy --max-sentences jest ustawione)")
     parser.add_argument("--max-sentences", type=int, default=50000, help="Maksymalna liczba zdań do wygenerowania (domyślnie: 30000)")
     parser.add_argument("--model-dir", type=str, default=None, help="Katalog do zapisu modelu")
+    parser.add_argument("--distill", action="store_true", help="Destyluj wytrenowany model do mniejszego studenta")
+    parser.add_argument("--teacher", type=str, default=None,
+                        help="Model nauczyciela dla --distill (domyślnie: MODEL_DIR/final-model.pt)")
+    parser.add_argument("--student-dir", type=str, default=None,
+                        help="Katalog studenta dla --distill (domyślnie: MODEL_DIR/student)")
+    parser.add_argument("--student-layers", type=int, default=4, help="Liczba warstw transformera studenta (domyślnie: 4)")
+    parser.add_argument("--student-hidden", type=int, default=256, help="Rozmiar BiLSTM studenta (domyślnie: 256)")
+    parser.add_argument("--temperature", type=float, default=2.0, help="Temperatura miękkich etykiet (domyślnie: 2.0)")
+    parser.add_argument("--alpha", type=float, default=0.5, help="Waga straty destylacyjnej (domyślnie: 0.5)")
     args = parser.parse_args()    
+    
+    if args.distill:
+        model_dir = args.model_dir or config.MODEL_DIR
+        distill_model(
+            teacher_path=args.teacher or os.path.join(model_dir, "final-model.pt"),
+            student_dir=args.student_dir or os.path.join(model_dir, "student"),
+            epochs=args.epochs,
+            num_layers=args.student_layers,
+            hidden_size=args.student_hidden,
+            temperature=args.temperature,
+            alpha=args.alpha,
+            max_sentences=args.max_sentences,
+        )
+        raise SystemExit(0)
+    
     print("\n" + "="*60)
     print("🤖 DANE BEZ TWARZY - Trening modelu NER")
     print("="*60)
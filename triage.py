@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+Tani klasyfikator wstępny (triage): czy zdanie może zawierać dane osobowe.
+
+Większość zdań w logach nie zawiera żadnych danych osobowych, a każde płaci
+pełny koszt HerBERT-a. Klasyfikator liniowy (regresja logistyczna) na
+haszowanych cechach znakowych - n-gramy liter i kształty słów (Xx, ddd-ddd,
+x@x.x) - ocenia zdanie w ułamku milisekundy. Zdania, które z dużą pewnością
+są czyste, omijają tagger.predict.
+
+Próg decyzji wyznaczany jest z docelowej czułości (recall) na zbiorze dev:
+przy recall=0.995 co najwyżej 0.5% zdań z encjami zostanie pominiętych.
+
+Trening na korpusie z data_generator.generate_corpus (zdania dzielone
+segmenterem tak jak przy anonimizacji):
+    python triage.py --train --max-sentences 20000 --recall 0.995
+
+Użycie:
+    from triage import TriageClassifier
+
+    triage = TriageClassifier.load()
+    triage.may_contain_pii("Zebranie odbędzie się w sali nr 3.")
+
+    # W anonimizacji:
+    python anonymize.py -i input.txt --triage resources/triage/triage.pkl
+"""
+import math
+import pickle
+import random
+import zlib
+from array import array
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from segmenter import segment_text
+
+# Domyślne miejsce zapisu wytrenowanego klasyfikatora
+DEFAULT_TRIAGE_PATH = Path(__file__).parent / "resources" / "triage" / "triage.pkl"
+
+# Liczba kubełków haszowania cech
+DEFAULT_FEATURES = 1 << 18
+
+# Długości n-gramów znakowych
+NGRAM_SIZES = (3, 4)
+
+# Domyślna docelowa czułość (udział zdań z encjami przepuszczanych do modelu)
+DEFAULT_TARGET_RECALL = 0.995
+
+# Wersja formatu zapisanego stanu klasyfikatora
+TRIAGE_FORMAT = 1
+
+
+def _word_shape(word: str) -> str:
+    """Zwraca skrócony kształt słowa (np. Kowalski → Xx, 600-100-200 → d-d-d)."""
+    shape = []
+    for ch in word:
+        if ch.isupper():
+            code = 'X'
+        elif ch.isalpha():
+            code = 'x'
+        elif ch.isdigit():
+            code = 'd'
+        else:
+            code = ch
+        if not shape or shape[-1] != code:
+            shape.append(code)
+    return ''.join(shape)
+
+
+def _features(text: str, n_features: int) -> List[int]:
+    """Zwraca indeksy haszowanych cech zdania (bez powtórzeń)."""
+    lowered = f" {text.lower()} "
+    features = set()
+    for n in NGRAM_SIZES:
+        for i in range(len(lowered) - n + 1):
+            features.add(zlib.crc32(lowered[i:i + n].encode('utf-8')) % n_features)
+    previous = ''
+    for word in text.split():
+        shape = _word_shape(word)
+        features.add(zlib.crc32(f"#{shape}".encode('utf-8')) % n_features)
+        # Kształt w kontekście poprzedniego słowa (np. "ul." + Xx, "tel." + d)
+        features.add(zlib.crc32(f"#{previous}|{shape}".encode('utf-8')) % n_features)
+        previous = word.lower()
+    return list(features)
+
+
+def corpus_examples(sentences) -> List[Tuple[str, bool]]:
+    """
+    Zamienia zdania Flair z etykietami NER na przykłady (segment, czy zawiera encję).
+
+    Zdania są dzielone segmenterem tak jak przy anonimizacji, a segment jest
+    pozytywny, jeśli nachodzi na którąkolwiek encję.
+    """
+    import config
+
+    examples = []
+    for sentence in sentences:
+        text = sentence.to_original_text()
+        spans = [(span.start_position, span.end_position) for span in sentence.get_spans(config.TAG_TYPE)]
+        for start, end in segment_text(text):
+            has_pii = any(s < end and start < e for s, e in spans)
+            examples.append((text[start:end], has_pii))
+    return examples
+
+
+class TriageClassifier:
+    """
+    Regresja logistyczna na haszowanych cechach znakowych.
+
+    Obiekt zlicza sprawdzone i pominięte zdania (checked/skipped), tak jak
+    SentenceCache zlicza trafienia, żeby anonimizacja mogła raportować udział
+    zdań, które ominęły model.
+    """
+
+    def __init__(self, n_features: int = DEFAULT_FEATURES):
+        """
+        Args:
+            n_features: Liczba kubełków haszowania cech
+        """
+        self.n_features = n_features
+        self.weights = array('d', bytes(8 * n_features))
+        self.bias = 0.0
+        # Posortowane wyniki pozytywnych zdań dev - do wyznaczania progu dla dowolnej czułości
+        self.positive_scores: List[float] = []
+        self.target_recall = DEFAULT_TARGET_RECALL
+        self.threshold = 0.5
+        self.checked = 0
+        self.skipped = 0
+
+    def score(self, text: str) -> float:
+        """Zwraca prawdopodobieństwo, że zdanie zawiera dane osobowe."""
+        features = _features(text, self.n_features)
+        if not features:
+            return 0.0
+        scale = 1.0 / math.sqrt(len(features))
+        z = self.bias + scale * sum(self.weights[f] for f in features)
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+
+    def may_contain_pii(self, text: str) -> bool:
+        """Sprawdza, czy zdanie musi trafić do modelu NER."""
+        return self.score(text) >= self.threshold
+
+    def record(self, checked: int, skipped: int):
+        """Dolicza sprawdzone i pominięte zdania."""
+        self.checked += checked
+        self.skipped += skipped
+
+    def fit(
+        self,
+        examples: List[Tuple[str, bool]],
+        epochs: int = 5,
+        learning_rate: float = 0.5,
+        seed: int = 42
+    ):
+        """
+        Trenuje wagi metodą SGD na logistycznej funkcji straty.
+
+        Args:
+            examples: Pary (zdanie, czy zawiera encję)
+            epochs: Liczba przejść po danych
+            learning_rate: Początkowy krok uczenia (malejący z epokami)
+            seed: Seed kolejności przykładów
+        """
+        rng = random.Random(seed)
+        encoded = [(_features(text, self.n_features), 1.0 if label else 0.0) for text, label in examples]
+        encoded = [(features, y) for features, y in encoded if features]
+        weights = self.weights
+        for epoch in range(epochs):
+            rng.shuffle(encoded)
+            lr = learning_rate / (1 + epoch)
+            for features, y in encoded:
+                scale = 1.0 / math.sqrt(len(features))
+                z = self.bias + scale * sum(weights[f] for f in features)
+                p = 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+                gradient = lr * (y - p)
+                self.bias += gradient
+                step = gradient * scale
+                for f in features:
+                    weights[f] += step
+
+    def calibrate(self, examples: List[Tuple[str, bool]], recall: float = DEFAULT_TARGET_RECALL):
+        """Zapamiętuje wyniki pozytywnych zdań dev i ustawia próg dla zadanej czułości."""
+        self.positive_scores = sorted(self.score(text) for text, label in examples if label)
+        self.set_recall(recall)
+
+    def set_recall(self, recall: float):
+        """
+        Ustawia próg tak, by co najmniej `recall` pozytywnych zdań dev trafiało do modelu.
+
+        Raises:
+            ValueError: Gdy recall spoza przedziału (0, 1]
+        """
+        if not 0.0 < recall <= 1.0:
+            raise ValueError(f"Czułość musi być w przedziale (0, 1], podano: {recall}")
+        self.target_recall = recall
+        if self.positive_scores:
+            missed = int((1.0 - recall) * len(self.positive_scores))
+            self.threshold = self.positive_scores[missed]
+
+    def evaluate(self, examples: List[Tuple[str, bool]]) -> dict:
+        """
+        Liczy czułość i udział pomijanych zdań na przykładach testowych.
+
+        Returns:
+            dict: recall, skip_rate, positives, negatives
+        """
+        positives = kept_positives = skipped = 0
+        for text, label in examples:
+            keep = self.may_contain_pii(text)
+            if label:
+                positives += 1
+                kept_positives += keep
+            skipped += not keep
+        return {
+            'recall': kept_positives / positives if positives else 1.0,
+            'skip_rate': skipped / len(examples) if examples else 0.0,
+            'positives': positives,
+            'negatives': len(examples) - positives,
+        }
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['checked'] = 0
+        state['skipped'] = 0
+        return state
+
+    def state_dict(self) -> dict:
+        """
+        Zwraca stan klasyfikatora z samych typów wbudowanych (bez odwołania do klasy).
+
+        Pickle obiektu zapisanego z `python triage.py` wskazywałby klasę
+        `__main__.TriageClassifier`, której nie da się wczytać z innego skryptu.
+        """
+        return {
+            'format': TRIAGE_FORMAT,
+            'n_features': self.n_features,
+            'ngram_sizes': list(NGRAM_SIZES),
+            'weights': self.weights.tobytes(),
+            'bias': self.bias,
+            'positive_scores': list(self.positive_scores),
+            'target_recall': self.target_recall,
+            'threshold': self.threshold,
+        }
+
+    @classmethod
+    def from_state_dict(cls, state: dict) -> "TriageClassifier":
+        """
+        Odtwarza klasyfikator ze stanu zapisanego przez state_dict.
+
+        Raises:
+            ValueError: Gdy stan pochodzi z innej wersji formatu lub innych n-gramów cech
+        """
+        if state.get('format') != TRIAGE_FORMAT or tuple(state['ngram_sizes']) != NGRAM_SIZES:
+            raise ValueError("Klasyfikator triage zapisany w innym formacie - wytrenuj go ponownie")
+        triage = cls(state['n_features'])
+        triage.weights = array('d')
+        triage.weights.frombytes(state['weights'])
+        triage.bias = state['bias']
+        triage.positive_scores = list(state['positive_scores'])
+        triage.target_recall = state['target_recall']
+        triage.threshold = state['threshold']
+        return triage
+
+    def save(self, path: Path = DEFAULT_TRIAGE_PATH):
+        """Zapisuje stan klasyfikatora (pickle słownika state_dict)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as f:
+            pickle.dump(self.state_dict(), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_TRIAGE_PATH, recall: Optional[float] = None) -> "TriageClassifier":
+        """
+        Wczytuje zapisany klasyfikator.
+
+        Args:
+            path: Ścieżka do pliku klasyfikatora
+            recall: Opcjonalna docelowa czułość (nadpisuje tę z treningu)
+        """
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if not isinstance(state, dict) or 'weights' not in state:
+            raise ValueError(f"Plik {path} nie zawiera klasyfikatora triage")
+        triage = cls.from_state_dict(state)
+        if recall is not None:
+            triage.set_recall(recall)
+        return triage
+
+
+def train_triage(
+    max_sentences: int = 20000,
+    recall: float = DEFAULT_TARGET_RECALL,
+    epochs: int = 5,
+    output_path: Path = DEFAULT_TRIAGE_PATH
+) -> TriageClassifier:
+    """
+    Trenuje klasyfikator na korpusie syntetycznym i zapisuje go na dysk.
+
+    Korpus z generate_corpus jest dzielony jak do treningu NER: train służy
+    do uczenia, dev do wyznaczenia progu, test do raportu czułości.
+    """
+    from data_generator import generate_corpus
+
+    corpus = generate_corpus(max_sentences=max_sentences)
+    train_examples = corpus_examples(corpus.train)
+    dev_examples = corpus_examples(corpus.dev)
+    test_examples = corpus_examples(corpus.test)
+    print(f"✅ Przykłady: train={len(train_examples)}, dev={len(dev_examples)}, test={len(test_examples)}")
+
+    triage = TriageClassifier()
+    triage.fit(train_examples, epochs=epochs)
+    triage.calibrate(dev_examples, recall)
+
+    report = triage.evaluate(test_examples)
+    print(f"\n📊 Triage (test):")
+    print(f"   • Próg: {triage.threshold:.4f} (docelowa czułość {recall:.3f})")
+    print(f"   • Czułość: {report['recall']:.4f} ({report['positives']} zdań z encjami)")
+    print(f"   • Pomijanych zdań: {report['skip_rate']:.1%}")
+
+    triage.save(output_path)
+    print(f"\n✅ Zapisano klasyfikator: {output_path}")
+    return triage
+
+
+def main():
+    """CLI: trening klasyfikatora lub ocena pojedynczego zdania."""
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Klasyfikator wstępny: czy zdanie zawiera dane osobowe")
+    parser.add_argument("text", nargs="?", help="Zdanie do oceny")
+    parser.add_argument("--train", action="store_true", help="Wytrenuj klasyfikator na korpusie syntetycznym")
+    parser.add_argument("--max-sentences", type=int, default=20000, help="Liczba zdań korpusu (domyślnie: 20000)")
+    parser.add_argument("--epochs", type=int, default=5, help="Liczba epok SGD (domyślnie: 5)")
+    parser.add_argument("--recall", type=float, default=None,
+                        help=f"Docelowa czułość (trening - domyślnie: {DEFAULT_TARGET_RECALL}; "
+                             f"ocena - domyślnie: zapisana w klasyfikatorze)")
+    parser.add_argument("-o", "--output", default=str(DEFAULT_TRIAGE_PATH), help="Plik klasyfikatora")
+    args = parser.parse_args()
+
+    if args.train:
+        recall = args.recall if args.recall is not None else DEFAULT_TARGET_RECALL
+        train_triage(args.max_sentences, recall, args.epochs, Path(args.output))
+        return
+
+    if args.text:
+        text = args.text
+    elif not sys.stdin.isatty():
+        text = sys.stdin.read().strip()
+    else:
+        parser.print_help()
+        return
+
+    triage = TriageClassifier.load(args.output, args.recall)
+    probability = triage.score(text)
+    verdict = "do modelu" if probability >= triage.threshold else "pominięte (czyste)"
+    print(f"{probability:.4f} (próg {triage.threshold:.4f}) → {verdict}")
+
+
+if __name__ == "__main__":
+    main()